@@ -0,0 +1,239 @@
+import pickle
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.redis import RedisSerializer
+
+_MISSING = object()
+
+
+class CompactSerializer(RedisSerializer):
+    """
+    Highest-protocol pickle, zlib-compressed above COMPRESS_MIN_BYTES. Plain ints
+    stay unpickled so Redis INCR keeps working. Pickles (protocol 2+) start with
+    0x80 and zlib streams with 0x78, so values written by the stock serializer
+    still load.
+    """
+
+    COMPRESS_MIN_BYTES = 512
+    COMPRESS_LEVEL = 1
+
+    def dumps(self, obj):
+        if type(obj) is int:
+            return obj
+        data = pickle.dumps(obj, self.protocol)
+        if len(data) >= self.COMPRESS_MIN_BYTES:
+            compressed = zlib.compress(data, self.COMPRESS_LEVEL)
+            if len(compressed) < len(data):
+                return compressed
+        return data
+
+    def loads(self, data):
+        try:
+            return int(data)
+        except ValueError:
+            if data[:1] == b'\x78':
+                data = zlib.decompress(data)
+            return pickle.loads(data)
+
+
+class TieredCache(BaseCache):
+    """
+    Shared cache (the L2 alias: Redis, database or file) fronted by a small
+    per-process L1.
+
+    Reads are served from L1 for at most L1_TIMEOUT seconds, so a value changed
+    or deleted by another worker can be seen stale for that long; writes and
+    deletes through this process update L1 immediately. Misses are never cached
+    in L1, so a value another worker just stored is visible at once.
+
+    Concurrent L1 misses on a key in one process make a single L2 read, and
+    get_or_set() lets only one worker (across processes, via an L2 add() lock)
+    compute a missing value while the others wait for it.
+
+        'default': {
+            'BACKEND': 'ai_profile_backend.cache.TieredCache',
+            'OPTIONS': {'L2': 'shared', 'L1_TIMEOUT': 2, 'L1_MAX_ENTRIES': 1000},
+        }
+    """
+
+    LOCK_STRIPES = 64
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._l2_alias = options.get('L2', 'shared')
+        self.l1_timeout = float(options.get('L1_TIMEOUT', 2))
+        self.l1_max_entries = int(options.get('L1_MAX_ENTRIES', 1000))
+        self.fill_lock_timeout = float(options.get('FILL_LOCK_TIMEOUT', 30))
+        self.fill_wait = float(options.get('FILL_WAIT', 5))
+        self._serializer = CompactSerializer()
+        self._l1 = OrderedDict()
+        self._l1_lock = threading.Lock()
+        self._stripes = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+
+    @property
+    def l2(self):
+        return caches[self._l2_alias]
+
+    # L1: serialized payloads, so callers never share mutable objects
+
+    def _l1_get(self, l1_key):
+        with self._l1_lock:
+            entry = self._l1.get(l1_key)
+            if entry is None:
+                return _MISSING
+            expires_at, payload = entry
+            if expires_at <= time.monotonic():
+                del self._l1[l1_key]
+                return _MISSING
+            self._l1.move_to_end(l1_key)
+        return self._serializer.loads(payload)
+
+    def _l1_set(self, l1_key, value, timeout=DEFAULT_TIMEOUT):
+        ttl = self.l1_timeout
+        if timeout is not DEFAULT_TIMEOUT and timeout is not None:
+            ttl = min(ttl, timeout)
+        if ttl <= 0:
+            self._l1_delete(l1_key)
+            return
+        payload = self._serializer.dumps(value)
+        with self._l1_lock:
+            self._l1[l1_key] = (time.monotonic() + ttl, payload)
+            self._l1.move_to_end(l1_key)
+            while len(self._l1) > self.l1_max_entries:
+                self._l1.popitem(last=False)
+
+    def _l1_delete(self, l1_key):
+        with self._l1_lock:
+            self._l1.pop(l1_key, None)
+
+    def _stripe(self, l1_key):
+        return self._stripes[hash(l1_key) % self.LOCK_STRIPES]
+
+    # Cache API
+
+    def get(self, key, default=None, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        value = self._l1_get(l1_key)
+        if value is not _MISSING:
+            return value
+
+        with self._stripe(l1_key):
+            # Another thread may have filled L1 while we waited
+            value = self._l1_get(l1_key)
+            if value is not _MISSING:
+                return value
+            value = self.l2.get(key, _MISSING, version=version)
+            if value is _MISSING:
+                return default
+            self._l1_set(l1_key, value)
+            return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        self.l2.set(key, value, timeout=timeout, version=version)
+        self._l1_set(l1_key, value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        added = self.l2.add(key, value, timeout=timeout, version=version)
+        if added:
+            self._l1_set(l1_key, value, timeout)
+        else:
+            self._l1_delete(l1_key)
+        return added
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        value = self.get(key, _MISSING, version=version)
+        if value is not _MISSING:
+            return value
+        if not callable(default):
+            self.add(key, default, timeout=timeout, version=version)
+            return self.get(key, default, version=version)
+
+        lock_key = f"{key}:fill"
+        if self.l2.add(lock_key, 1, timeout=self.fill_lock_timeout, version=version):
+            try:
+                value = default()
+                if value is not None:
+                    self.set(key, value, timeout=timeout, version=version)
+                return value
+            finally:
+                self.l2.delete(lock_key, version=version)
+
+        # Someone else is computing it; wait for their result rather than stampede
+        deadline = time.monotonic() + self.fill_wait
+        delay = 0.01
+        while time.monotonic() < deadline:
+            time.sleep(delay)
+            delay = min(delay * 2, 0.2)
+            value = self.l2.get(key, _MISSING, version=version)
+            if value is not _MISSING:
+                self._l1_set(self.make_and_validate_key(key, version=version), value, timeout)
+                return value
+        value = default()
+        if value is not None:
+            self.set(key, value, timeout=timeout, version=version)
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._l1_delete(self.make_and_validate_key(key, version=version))
+        return self.l2.touch(key, timeout=timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._l1_delete(self.make_and_validate_key(key, version=version))
+        return self.l2.delete(key, version=version)
+
+    def has_key(self, key, version=None):
+        if self._l1_get(self.make_and_validate_key(key, version=version)) is not _MISSING:
+            return True
+        return self.l2.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        # Counters live in L2 only, where the increment is atomic
+        self._l1_delete(self.make_and_validate_key(key, version=version))
+        return self.l2.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        self._l1_delete(self.make_and_validate_key(key, version=version))
+        return self.l2.decr(key, delta, version=version)
+
+    def get_many(self, keys, version=None):
+        found, missing = {}, []
+        for key in keys:
+            value = self._l1_get(self.make_and_validate_key(key, version=version))
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing:
+            fetched = self.l2.get_many(missing, version=version)
+            for key, value in fetched.items():
+                self._l1_set(self.make_and_validate_key(key, version=version), value)
+            found.update(fetched)
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.l2.set_many(data, timeout=timeout, version=version)
+        for key, value in data.items():
+            if key not in failed:
+                self._l1_set(self.make_and_validate_key(key, version=version), value, timeout)
+        return failed
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self._l1_delete(self.make_and_validate_key(key, version=version))
+        self.l2.delete_many(keys, version=version)
+
+    def clear(self):
+        with self._l1_lock:
+            self._l1.clear()
+        self.l2.clear()
+
+    def close(self, **kwargs):
+        self.l2.close(**kwargs)
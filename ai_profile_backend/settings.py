@@ -153,6 +153,10 @@ REST_FRAMEWORK = {
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
     ],
+    # Proxies in front of the app; the client IP used for rate limiting is read from
+    # X-Forwarded-For accordingly. 0 (no proxy) uses REMOTE_ADDR, so a client can't
+    # pick its own IP with a forged header; set 1 behind the Heroku router.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', 0)),
 }
 
 # CORS Configuration
@@ -167,19 +171,232 @@ CORS_ALLOW_ALL_ORIGINS = DEBUG
 
 # OpenAI Configuration
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL') or None  # e.g. a local mock LLM for benchmarks
+OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', 2))
+
+# Local rule-based filter compiler: the LLM is only called below this confidence.
+# Shadow mode always calls the LLM and logs where the two disagree.
+AI_LOCAL_CONFIDENCE_THRESHOLD = float(os.getenv('AI_LOCAL_CONFIDENCE_THRESHOLD', 0.85))
+AI_FILTER_SHADOW_MODE = os.getenv('AI_FILTER_SHADOW_MODE', 'False') == 'True'
+
+# Coalesce identical concurrent filter requests into one LLM call. Followers wait at
+# most AI_SINGLEFLIGHT_TIMEOUT seconds; distributed mode also coalesces across
+# workers through a lock in the shared ai_results cache.
+AI_SINGLEFLIGHT_TIMEOUT = float(os.getenv('AI_SINGLEFLIGHT_TIMEOUT', 30))
+AI_SINGLEFLIGHT_DISTRIBUTED = os.getenv('AI_SINGLEFLIGHT_DISTRIBUTED', 'False') == 'True'
+AI_SINGLEFLIGHT_POLL_INTERVAL = float(os.getenv('AI_SINGLEFLIGHT_POLL_INTERVAL', 0.1))
+
+# Counters bumped on request paths (single-flight, prompt tokens) are summed per
+# process and written to the shared cache this often; 0 writes them inline
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', 5))
+
+# Serve the AI endpoints with async views. Only useful under ASGI (uvicorn workers),
+# so it stays off by default and the Procfile's ASGI web process turns it on
+AI_ASYNC_VIEWS = os.getenv('AI_ASYNC_VIEWS', 'False') == 'True'
+
+# Chatbot catalog retrieval: prompt tokens spent on catalog rows per message, and how
+# often each worker checks for a newer catalog snapshot
+CHATBOT_CONTEXT_TOKEN_BUDGET = int(os.getenv('CHATBOT_CONTEXT_TOKEN_BUDGET', 1500))
+CATALOG_VERSION_CHECK_SECONDS = int(os.getenv('CATALOG_VERSION_CHECK_SECONDS', 60))
+
+# Course samples handed to the AI suggestion / recommendation endpoints: size, and how
+# long the whole-catalog sample is cached (keys carry the catalog version)
+COURSE_SAMPLE_SIZE = int(os.getenv('COURSE_SAMPLE_SIZE', 100))
+COURSE_SAMPLE_TTL = int(os.getenv('COURSE_SAMPLE_TTL', 86400))
+
+# In-memory course index (profiles.services.course_index) each worker filters samples
+# with: rows fetched per round trip while building it, and whether web workers build
+# it in the background at startup rather than on the first request
+COURSE_INDEX_CHUNK_SIZE = int(os.getenv('COURSE_INDEX_CHUNK_SIZE', 10000))
+COURSE_INDEX_WARM_ON_START = os.getenv('COURSE_INDEX_WARM_ON_START', 'True') == 'True'
+
+# Partner catalog ingest (ingest_catalog command and the admin import endpoint).
+# Uploads are spooled to the database in CATALOG_IMPORT_CHUNK_BYTES rows, since the
+# catalog worker shares no disk with the web dynos.
+CATALOG_INGEST_BATCH_SIZE = int(os.getenv('CATALOG_INGEST_BATCH_SIZE', 2000))
+CATALOG_IMPORT_CHUNK_BYTES = int(os.getenv('CATALOG_IMPORT_CHUNK_BYTES', 4 * 1024 * 1024))
+CATALOG_IMPORT_QUEUE = os.getenv('CATALOG_IMPORT_QUEUE', 'catalog')
+CATALOG_IMPORT_STATUS_TTL = int(os.getenv('CATALOG_IMPORT_STATUS_TTL', 86400))
+
+# Exchange rates (FxRate table): where update_fx_rates fetches them (a JSON API answering
+# {"base_code": ..., "rates": {...}}), how often each worker checks for new rates, and
+# the currency student budgets are entered in (lakhs of it)
+FX_RATES_URL = os.getenv('FX_RATES_URL', 'https://open.er-api.com/v6/latest/USD')
+FX_RATES_SOURCE = os.getenv('FX_RATES_SOURCE', 'open.er-api.com')
+FX_RATES_CHECK_SECONDS = int(os.getenv('FX_RATES_CHECK_SECONDS', 300))
+STUDENT_BUDGET_CURRENCY = os.getenv('STUDENT_BUDGET_CURRENCY', 'INR')
+
+# Prompt token budgets per endpoint (completion tokens not included)
+CHATBOT_PROMPT_TOKEN_BUDGET = int(os.getenv('CHATBOT_PROMPT_TOKEN_BUDGET', 3000))
+AI_FILTER_PROMPT_TOKEN_BUDGET = int(os.getenv('AI_FILTER_PROMPT_TOKEN_BUDGET', 2000))
 
 # Twilio Configuration
 TWILIO_ACCOUNT_SID = os.getenv('TWILIO_ACCOUNT_SID')
 TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN')
 TWILIO_PHONE_NUMBER = os.getenv('TWILIO_PHONE_NUMBER')  # SMS number
 TWILIO_WHATSAPP_NUMBER = os.getenv('TWILIO_WHATSAPP_NUMBER')  # WhatsApp-enabled number
+TWILIO_API_BASE_URL = os.getenv('TWILIO_API_BASE_URL') or None  # e.g. a local mock Twilio for load tests
+# One pooled client per process; size the pool to the threads that send concurrently
+TWILIO_HTTP_POOL_SIZE = int(os.getenv('TWILIO_HTTP_POOL_SIZE', 16))
+TWILIO_HTTP_CONNECT_TIMEOUT = float(os.getenv('TWILIO_HTTP_CONNECT_TIMEOUT', 3.05))
+TWILIO_HTTP_READ_TIMEOUT = float(os.getenv('TWILIO_HTTP_READ_TIMEOUT', 10))
+TWILIO_HTTP_KEEPALIVE = os.getenv('TWILIO_HTTP_KEEPALIVE', 'True') == 'True'
+# Connection/latency counters are buffered per process and written this often (0: every request)
+TWILIO_HTTP_METRICS_FLUSH_SECONDS = float(os.getenv('TWILIO_HTTP_METRICS_FLUSH_SECONDS', 10))
 
 # Redis Configuration
-# REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+REDIS_URL = os.getenv('REDIS_URL')
+
+# Cache Configuration
+# AI filter results must be visible to every gunicorn worker, so they never live
+# in per-process memory. Redis evicts via its maxmemory-policy (use allkeys-lru);
+# the file-based fallback is bounded by MAX_ENTRIES.
+AI_FILTER_CACHE_ALIAS = 'ai_results'
+AI_FILTER_CACHE_TTL = int(os.getenv('AI_FILTER_CACHE_TTL', 6 * 60 * 60))
+AI_FILTER_CACHE_MAX_ENTRIES = int(os.getenv('AI_FILTER_CACHE_MAX_ENTRIES', 5000))
+
+# Pickle + zlib for larger payloads; plain ints stay raw so INCR works
+CACHE_SERIALIZER = 'ai_profile_backend.cache.CompactSerializer'
+
+# Without Redis the shared cache falls back to the database ('db', needs
+# `manage.py createcachetable`) or to files on this host ('file')
+CACHE_FALLBACK = os.getenv('CACHE_FALLBACK', 'db')
+
+CACHES = {
+    # In-flight signup state (initiate -> verify) and other app state. It must be
+    # shared by every worker, so it lives in 'shared' behind a short in-process L1.
+    'default': {
+        'BACKEND': 'ai_profile_backend.cache.TieredCache',
+        'OPTIONS': {
+            'L2': 'shared',
+            'L1_TIMEOUT': float(os.getenv('CACHE_L1_TIMEOUT', 2)),
+            'L1_MAX_ENTRIES': int(os.getenv('CACHE_L1_MAX_ENTRIES', 1000)),
+        },
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'shared',
+        'OPTIONS': {'serializer': CACHE_SERIALIZER},
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('CACHE_DIR', '/tmp/ai_profile_cache'),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    } if CACHE_FALLBACK == 'file' else {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_cache',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    AI_FILTER_CACHE_ALIAS: {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'ai_results',
+        'TIMEOUT': AI_FILTER_CACHE_TTL,
+        'OPTIONS': {'serializer': CACHE_SERIALIZER},
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('AI_FILTER_CACHE_DIR', '/tmp/ai_profile_filter_cache'),
+        'TIMEOUT': AI_FILTER_CACHE_TTL,
+        'OPTIONS': {
+            'MAX_ENTRIES': AI_FILTER_CACHE_MAX_ENTRIES,
+        },
+    },
+    # Live OTP codes for OTP_STORE_BACKEND=cache and rate-limit counters; must be
+    # shared by every worker
+    'otp': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'otp',
+        'OPTIONS': {'serializer': CACHE_SERIALIZER},
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('OTP_CACHE_DIR', '/tmp/ai_profile_otp_cache'),
+        'OPTIONS': {
+            # Culling would randomly drop live codes, so keep it well above peak signups
+            'MAX_ENTRIES': 100000,
+        },
+    },
+}
+
+# Profile detail read-through cache (invalidated on every profile write)
+PROFILE_CACHE_TTL = int(os.getenv('PROFILE_CACHE_TTL', 300))
+PROFILE_CACHE_MISS_TTL = int(os.getenv('PROFILE_CACHE_MISS_TTL', 30))
 
 # OTP Settings
 OTP_EXPIRE_MINUTES = int(os.getenv('OTP_EXPIRE_MINUTES', 5))
-OTP_RATE_LIMIT = int(os.getenv('OTP_RATE_LIMIT', 3))
+OTP_RATE_LIMIT = int(os.getenv('OTP_RATE_LIMIT', 3))  # per phone per hour, 0 disables
+OTP_IP_RATE_LIMIT = int(os.getenv('OTP_IP_RATE_LIMIT', 20))  # per client IP per hour, 0 disables
+
+# Rate-limit counters must be shared by every worker, so they live on the 'otp'
+# alias (Redis when REDIS_URL is set), never in the database
+RATE_LIMIT_CACHE_ALIAS = 'otp'
+
+# Where live OTPs are kept: 'redis' (atomic verify, needs REDIS_URL), 'cache' (the
+# 'otp' cache alias; needs an atomic add(), so not the file-based fallback) or 'db'
+# (phone_otps table only, the original behaviour).
+# With redis/cache, phone_otps rows are audit-only and written in batches every
+# OTP_AUDIT_FLUSH_SECONDS (0 writes them inline).
+OTP_STORE_BACKEND = os.getenv('OTP_STORE_BACKEND', 'redis' if REDIS_URL else 'db')
+OTP_CACHE_ALIAS = 'otp'
+OTP_AUDIT_BATCH_SIZE = int(os.getenv('OTP_AUDIT_BATCH_SIZE', 200))
+OTP_AUDIT_FLUSH_SECONDS = float(os.getenv('OTP_AUDIT_FLUSH_SECONDS', 1.0))
+
+# OTP delivery runs on Celery. Without a broker (no CELERY_BROKER_URL or REDIS_URL)
+# tasks run eagerly in the request, which is also what tests use with memory://.
+CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', REDIS_URL or 'memory://')
+CELERY_TASK_ALWAYS_EAGER = os.getenv(
+    'CELERY_TASK_ALWAYS_EAGER', 'True' if CELERY_BROKER_URL.startswith('memory://') else 'False'
+) == 'True'
+CELERY_TASK_IGNORE_RESULT = True  # delivery state is kept in the 'otp' cache instead
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
+
+OTP_DELIVERY_QUEUE = os.getenv('OTP_DELIVERY_QUEUE', 'otp')
+OTP_DEAD_LETTER_QUEUE = os.getenv('OTP_DEAD_LETTER_QUEUE', 'otp_dead_letter')
+OTP_DELIVERY_MAX_RETRIES = int(os.getenv('OTP_DELIVERY_MAX_RETRIES', 4))
+OTP_DELIVERY_BACKOFF_SECONDS = float(os.getenv('OTP_DELIVERY_BACKOFF_SECONDS', 2.0))
+OTP_DELIVERY_BACKOFF_MAX_SECONDS = float(os.getenv('OTP_DELIVERY_BACKOFF_MAX_SECONDS', 30.0))
+OTP_DELIVERY_STATUS_GRACE_SECONDS = 300
+
+# phone_otps retention: rows expired more than OTP_RETENTION_HOURS ago are purged
+# in batches of OTP_PURGE_BATCH_SIZE with OTP_PURGE_PAUSE_SECONDS between batches
+OTP_RETENTION_HOURS = float(os.getenv('OTP_RETENTION_HOURS', 24))
+OTP_PURGE_BATCH_SIZE = int(os.getenv('OTP_PURGE_BATCH_SIZE', 5000))
+OTP_PURGE_PAUSE_SECONDS = float(os.getenv('OTP_PURGE_PAUSE_SECONDS', 0.5))
+OTP_PARTITION_PREMAKE_DAYS = int(os.getenv('OTP_PARTITION_PREMAKE_DAYS', 7))  # PostgreSQL partitioning only
+
+# Workers only consume named queues (see Procfile), so nothing may go to the default
+# 'celery' queue; the purge pauses between batches, so it shares the OTP workers
+CELERY_TASK_ROUTES = {
+    'profiles.tasks.purge_expired_otps_task': {'queue': OTP_DELIVERY_QUEUE},
+}
+
+CELERY_BEAT_SCHEDULE = {
+    'purge-expired-otps': {
+        'task': 'profiles.tasks.purge_expired_otps_task',
+        'schedule': float(os.getenv('OTP_PURGE_INTERVAL_SECONDS', 60 * 60)),
+        'options': {'queue': OTP_DELIVERY_QUEUE},
+    },
+    'update-fx-rates': {
+        'task': 'profiles.tasks.update_fx_rates_task',
+        'schedule': float(os.getenv('FX_RATES_UPDATE_INTERVAL_SECONDS', 24 * 60 * 60)),
+        'options': {'queue': CATALOG_IMPORT_QUEUE},
+    },
+}
+
+# Channels in default order of preference. The first is sent at once; the next one
+# only if no delivery is confirmed within OTP_HEDGE_DELAY_SECONDS (or the first fails).
+# Once a country calling code has OTP_CHANNEL_MIN_SAMPLES outcomes per channel,
+# the order follows their recent delivery rate and latency instead. WhatsApp needs
+# TWILIO_WHATSAPP_NUMBER (an approved sender) and is only a backup by default.
+OTP_DELIVERY_CHANNELS = [c.strip() for c in os.getenv('OTP_DELIVERY_CHANNELS', 'sms,whatsapp').split(',') if c.strip()]
+OTP_HEDGE_DELAY_SECONDS = float(os.getenv('OTP_HEDGE_DELAY_SECONDS', 2.0))
+# How long a sent message's status is polled for a delivery confirmation (not at all
+# when tasks run eagerly, as that would hold up the initiate request)
+OTP_DELIVERY_CONFIRM_SECONDS = float(os.getenv('OTP_DELIVERY_CONFIRM_SECONDS', 15.0))
+OTP_DELIVERY_POLL_SECONDS = float(os.getenv('OTP_DELIVERY_POLL_SECONDS', 0.5))
+OTP_CHANNEL_MIN_SAMPLES = int(os.getenv('OTP_CHANNEL_MIN_SAMPLES', 20))
+OTP_HEDGE_MAX_WORKERS = int(os.getenv('OTP_HEDGE_MAX_WORKERS', 32))
 
 # Security Settings
 SECURE_BROWSER_XSS_FILTER = True
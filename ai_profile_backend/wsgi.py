@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ai_profile_backend.settings')
 
 application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.COURSE_INDEX_WARM_ON_START:
+    from profiles.services.course_index import course_index  # noqa: E402
+    course_index.warm()
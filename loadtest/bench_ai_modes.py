@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Compare the sync (gunicorn + WSGI) and async (gunicorn + uvicorn workers + ASGI)
+deployments of the AI endpoints against a local mock LLM.
+
+Reports requests/sec and p50/p99 latency per mode. No network access or OpenAI
+key is needed; the result cache is disabled so every request reaches the LLM.
+
+Usage:
+    python -m loadtest.bench_ai_modes --requests 400 --concurrency 100 --workers 2
+    python -m loadtest.bench_ai_modes --endpoint process-filters --modes async
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from loadtest.common import free_port, percentile, wait_until_ready
+from loadtest.mock_llm import make_server
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+CHAT_PAYLOAD = {
+    "message": "Which course should I pick for computer science in Canada?",
+    "context": {"userName": "Bench"},
+    "conversationHistory": [],
+}
+
+FILTERS_PAYLOAD = {
+    "countries": ["USA", "Canada"],
+    "degree": "Postgraduate",
+    "fields": ["IT & Computer Science"],
+    "intakes": ["Fall 2026"],
+    "completedDegree": "B.Tech",
+    "cgpa": 8.1,
+    "gradYear": "2024",
+    "budget": [30],
+    "courseSample": [
+        {"country_name": "United States", "level": "Masters", "duration": "2 Years",
+         "intake": "Fall 2026", "course_title": "MS Computer Science", "annual_fee_usd": 42000},
+        {"country_name": "Canada", "level": "Masters", "duration": "1 Year",
+         "intake": "Fall 2026", "course_title": "MSc Data Science", "annual_fee_usd": 28000},
+        {"country_name": "Canada", "level": "Bachelors", "duration": "4 Years",
+         "intake": "Spring 2026", "course_title": "BSc Software Engineering", "annual_fee_usd": 21000},
+    ],
+}
+
+ENDPOINTS = {
+    'chatbot': ('/api/profile/chatbot/query/', CHAT_PAYLOAD),
+    'process-filters': ('/api/profile/process-filters/', FILTERS_PAYLOAD),
+}
+
+MODES = {
+    'sync': {
+        'app': 'ai_profile_backend.wsgi:application',
+        'worker_args': ['--worker-class', 'sync'],
+        'async_views': 'False',
+    },
+    'async': {
+        'app': 'ai_profile_backend.asgi:application',
+        'worker_args': ['--worker-class', 'uvicorn.workers.UvicornWorker'],
+        'async_views': 'True',
+    },
+}
+
+
+def start_app_server(mode, port, workers, llm_url, db_path):
+    config = MODES[mode]
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{db_path}",
+        OPENAI_API_KEY='mock-key',
+        OPENAI_BASE_URL=llm_url,
+        OPENAI_MAX_RETRIES='0',
+        AI_ASYNC_VIEWS=config['async_views'],
+        AI_FILTER_CACHE_TTL='0',
+    )
+    command = [
+        sys.executable, '-m', 'gunicorn', config['app'],
+        '--bind', f'127.0.0.1:{port}',
+        '--workers', str(workers),
+        '--timeout', '120',
+        '--log-level', 'warning',
+        *config['worker_args'],
+    ]
+    return subprocess.Popen(command, cwd=BASE_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def run_load(url, payload, total_requests, concurrency):
+    body = json.dumps(payload).encode('utf-8')
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one_request(_):
+        nonlocal errors
+        request = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=120) as response:
+                response.read()
+                ok = response.status == 200
+        except (urllib.error.URLError, ConnectionError, OSError):
+            ok = False
+        elapsed = time.perf_counter() - started
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one_request, range(total_requests)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': total_requests,
+        'errors': errors,
+        'rps': round(len(latencies) / wall, 2) if wall else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark sync vs async AI endpoints')
+    parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), default='chatbot')
+    parser.add_argument('--modes', nargs='+', choices=sorted(MODES), default=['sync', 'async'])
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--llm-latency-ms', type=float, default=800.0)
+    parser.add_argument('--llm-jitter-ms', type=float, default=200.0)
+    args = parser.parse_args()
+
+    llm_port = free_port()
+    llm_server = make_server(port=llm_port, latency_ms=args.llm_latency_ms, jitter_ms=args.llm_jitter_ms)
+    threading.Thread(target=llm_server.serve_forever, daemon=True).start()
+    llm_url = f"http://127.0.0.1:{llm_port}/v1"
+
+    path, payload = ENDPOINTS[args.endpoint]
+    results = {}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'bench.sqlite3')
+        for mode in args.modes:
+            port = free_port()
+            server = start_app_server(mode, port, args.workers, llm_url, db_path)
+            try:
+                wait_until_ready(f"http://127.0.0.1:{port}/")
+                results[mode] = run_load(f"http://127.0.0.1:{port}{path}", payload,
+                                         args.requests, args.concurrency)
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+
+    llm_server.shutdown()
+
+    print(f"\nEndpoint: {path}  workers={args.workers}  concurrency={args.concurrency}  "
+          f"LLM latency={args.llm_latency_ms}±{args.llm_jitter_ms}ms")
+    print(f"{'mode':<8}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for mode, result in results.items():
+        print(f"{mode:<8}{result['requests']:>10}{result['errors']:>8}{result['rps']:>10}"
+              f"{result['p50_ms']:>10}{result['p99_ms']:>10}")
+
+
+if __name__ == '__main__':
+    main()
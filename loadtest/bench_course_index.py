@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Measure the in-memory course index (profiles.services.course_index).
+
+Builds a CourseIndex over a synthetic catalog of --courses rows shaped like
+Course.objects.values_list() output (countries, levels, intakes, durations,
+USD fees, normalized titles) and reports build time, memory held by the index
+arrays, and the latency of filter_mask() and top_k() for typical
+process-filters JSON, from a single facet to the multi-country, multi-intake,
+duration-range and budget combination the AI endpoints send. No database is
+touched: rows are generated in memory and the index is built from them directly.
+
+Usage:
+    python -m loadtest.bench_course_index --courses 300000
+    python -m loadtest.bench_course_index --courses 1000000 --repeat 500 --k 60
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+COUNTRIES = ("United States", "United Kingdom", "Canada", "Australia", "Germany", "Ireland",
+             "New Zealand", "Singapore", "France", "Netherlands", "Sweden", "Japan")
+LEVELS = (("Undergraduate", "Bachelors"), ("Postgraduate", "Masters"), ("Doctorate", "PhD"))
+SUBJECTS = ("Computer Science", "Data Science", "Mechanical Engineering", "Business Analytics",
+            "Psychology", "Public Health", "Finance", "Artificial Intelligence", "Marketing",
+            "Civil Engineering", "Biotechnology", "International Relations")
+DEGREES = ("MSc", "MS", "MEng", "MBA", "BSc", "BA", "PhD", "MA")
+SEASONS = ("fall", "spring", "summer", "winter")
+DURATIONS = (12, 18, 24, 36, 48)
+
+SCENARIOS = {
+    'country': ({'countries': ["USA"]}, ''),
+    'level + duration': ({'level': "Masters", 'duration': "2 Years"}, ''),
+    'budget': ({'maxBudgetUSD': 30000}, ''),
+    'keywords': ({'course': "Computer Science"}, ''),
+    'combined': ({
+        'countries': ["USA", "UK", "Canada", "Germany"],
+        'level': "Masters",
+        'intakes': ["Fall 2026", "Spring 2027"],
+        'minDurationMonths': 12,
+        'maxDurationMonths': 24,
+        'maxBudgetUSD': 45000,
+    }, 'data science'),
+}
+
+
+def setup_django():
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DATABASE_URL', 'sqlite://:memory:')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ai_profile_backend.settings')
+    import django
+    django.setup()
+
+
+def make_rows(count, seed):
+    from profiles.services.catalog_normalize import normalize_name, title_search_text
+    from profiles.utils import uuid7
+
+    rng = random.Random(seed)
+    titles = [f"{degree} {subject}" for degree in DEGREES for subject in SUBJECTS]
+    title_search = {title: title_search_text(title) for title in titles}
+    rows = []
+    for _ in range(count):
+        level, level_name = rng.choice(LEVELS)
+        title = rng.choice(titles)
+        fee = None if rng.random() < 0.05 else round(rng.uniform(4000, 80000), 2)
+        rows.append((
+            uuid7(),
+            rng.randrange(1, len(COUNTRIES) + 1),
+            level,
+            level_name,
+            rng.choice(SEASONS),
+            rng.choice((2025, 2026, 2027)),
+            rng.choice(DURATIONS),
+            fee,
+            title_search[title],
+        ))
+    countries = {normalize_name(name): pk for pk, name in enumerate(COUNTRIES, start=1)}
+    return rows, countries
+
+
+def index_bytes(index):
+    arrays = [index.ids, index.fee_usd, index.duration_months, index.price_band, index.jitter,
+              *index.columns.values(), *index.duration_bitmaps.values(), *index.postings]
+    arrays += [bitmap for bitmaps in index.bitmaps.values() for bitmap in bitmaps]
+    return sum(array.nbytes for array in arrays)
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1 if len(samples) > 1 else 0]
+
+
+def run(courses, repeat, k, seed):
+    from profiles.services.course_index import CourseIndex
+
+    rows, countries = make_rows(courses, seed)
+    index = CourseIndex(1, rows, countries)
+    print(f"Built index over {len(index)} courses in {index.build_seconds:.2f}s, "
+          f"{index_bytes(index) / 1024 / 1024:.1f} MB of arrays", flush=True)
+
+    results = {}
+    for name, (filters, query) in SCENARIOS.items():
+        matches = index.count(filters)
+        filter_ms = timed(lambda: index.filter_mask(filters), repeat)
+        top_k_ms = timed(lambda: index.top_k(filters, k, query=query, budget_usd=40000), repeat)
+        results[name] = {'matches': matches, 'filter': filter_ms, 'top_k': top_k_ms}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark in-memory course index filtering')
+    parser.add_argument('--courses', type=int, default=300_000)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--k', type=int, default=40, help='top-k size (COURSE_SAMPLE_SIZE)')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    setup_django()
+    results = run(args.courses, args.repeat, args.k, args.seed)
+
+    print(f"\ncourses={args.courses}  repeat={args.repeat}  k={args.k}  (median / p99 ms)")
+    print(f"{'filters':<18}{'matches':>10}{'filter':>18}{'top-k':>18}")
+    for name, result in results.items():
+        print(f"{name:<18}{result['matches']:>10}"
+              f"{'%.3f / %.3f' % result['filter']:>18}{'%.3f / %.3f' % result['top_k']:>18}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Helpers shared by the load-test mocks and runners.
+"""
+
+import random
+import socket
+import time
+import urllib.error
+import urllib.request
+
+
+class LatencyModel:
+    """
+    Samples a response delay in seconds.
+
+    Specs are "<kind>:<params>" with milliseconds, e.g.
+        fixed:200             always 200 ms
+        normal:800:200        mean 800 ms, standard deviation 200 ms
+        lognormal:600:0.6     median 600 ms, sigma 0.6 (long right tail, like real LLMs)
+        uniform:100:400       anywhere between 100 and 400 ms
+    """
+
+    KINDS = ('fixed', 'normal', 'lognormal', 'uniform')
+
+    def __init__(self, kind='fixed', a=0.0, b=0.0):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown latency distribution '{kind}', expected one of {self.KINDS}")
+        self.kind = kind
+        self.a = float(a)
+        self.b = float(b)
+
+    @classmethod
+    def parse(cls, spec):
+        kind, *params = str(spec).split(':')
+        if kind.replace('.', '', 1).isdigit():
+            return cls('fixed', float(kind))
+        return cls(kind, *(float(p) for p in params))
+
+    def sample_ms(self):
+        if self.kind == 'fixed':
+            value = self.a
+        elif self.kind == 'normal':
+            value = random.gauss(self.a, self.b) if self.b else self.a
+        elif self.kind == 'lognormal':
+            value = random.lognormvariate(0, self.b) * self.a if self.a else 0.0
+        else:
+            value = random.uniform(self.a, self.b)
+        return max(0.0, value)
+
+    def sample(self):
+        return self.sample_ms() / 1000.0
+
+    def __repr__(self):
+        return f"{self.kind}:{self.a:g}" + (f":{self.b:g}" if self.kind != 'fixed' else '')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def wait_until_ready(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return
+        except urllib.error.HTTPError:
+            # Any HTTP answer (even a 404) means the server is up
+            return
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not become ready within {timeout}s")
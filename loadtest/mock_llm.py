@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI chat completions API.
+
+Point the backend at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1 so
+benchmarks measure our own request handling instead of OpenAI's latency.
+
+Usage:
+    python -m loadtest.mock_llm --port 8090 --latency-ms 800 --jitter-ms 200
+    python -m loadtest.mock_llm --latency lognormal:700:0.5 --error-rate 0.02
+
+Requests with "stream": true get OpenAI-style chunked SSE; the latency is then the
+time to first token and --token-delay-ms the gap between tokens. --error-rate makes
+that fraction of requests fail with an OpenAI-shaped 429 or 500.
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from loadtest.common import LatencyModel
+
+FILTERS_RESPONSE = {
+    "countries": ["United States"],
+    "level": "Masters",
+    "course": "Computer IT Software",
+    "duration": "2 Years",
+    "intakes": ["Fall 2026"],
+    "maxBudgetUSD": 36000,
+    "searchQuery": "Computer Science",
+}
+
+CHAT_RESPONSE = (
+    "Great question! 🎓 Based on our database, the United States and Canada both have "
+    "strong Computer Science programs within your budget. Try the AI Profile Evaluator "
+    "for a personalised shortlist."
+)
+
+
+ERRORS = [
+    (429, {"error": {"message": "Rate limit reached for requests", "type": "requests",
+                     "code": "rate_limit_exceeded"}}),
+    (500, {"error": {"message": "The server had an error while processing your request.",
+                     "type": "server_error", "code": None}}),
+]
+
+
+class MockLLMConfig:
+    def __init__(self, latency_ms=800.0, jitter_ms=200.0, token_delay_ms=20.0, latency=None, error_rate=0.0):
+        self.latency = latency or LatencyModel('normal', latency_ms, jitter_ms)
+        self.token_delay_ms = token_delay_ms
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+
+    def sample_latency(self):
+        return self.latency.sample()
+
+    def sample_error(self):
+        if self.error_rate and random.random() < self.error_rate:
+            with self.lock:
+                self.errors += 1
+            return random.choice(ERRORS)
+        return None
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    config = MockLLMConfig()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, completion_id, model, content):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        def chunk(delta, finish_reason=None):
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+
+        try:
+            chunk({"role": "assistant", "content": ""})
+            for token in re.findall(r'\S+\s*', content):
+                chunk({"content": token})
+                time.sleep(self.config.token_delay_ms / 1000.0)
+            chunk({}, finish_reason="stop")
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # Client cancelled the stream
+            pass
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        with self.config.lock:
+            self.config.requests += 1
+
+        time.sleep(self.config.sample_latency())
+
+        error = self.config.sample_error()
+        if error is not None:
+            self._send_json(*error)
+            return
+
+        wants_json = (request.get('response_format') or {}).get('type') == 'json_object'
+        content = json.dumps(FILTERS_RESPONSE) if wants_json else CHAT_RESPONSE
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model = request.get('model', 'gpt-4o-mini')
+
+        if request.get('stream'):
+            self._send_stream(completion_id, model, content)
+            return
+
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+
+def make_server(host='127.0.0.1', port=8090, latency_ms=800.0, jitter_ms=200.0, token_delay_ms=20.0,
+                latency=None, error_rate=0.0):
+    handler = type('ConfiguredMockLLMHandler', (MockLLMHandler,), {
+        'config': MockLLMConfig(latency_ms, jitter_ms, token_delay_ms, latency=latency, error_rate=error_rate),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mock OpenAI chat completions server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--latency-ms', type=float, default=800.0)
+    parser.add_argument('--jitter-ms', type=float, default=200.0)
+    parser.add_argument('--latency', type=LatencyModel.parse, default=None,
+                        help='Latency distribution, e.g. lognormal:700:0.5 (overrides --latency-ms/--jitter-ms)')
+    parser.add_argument('--token-delay-ms', type=float, default=20.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency_ms, args.jitter_ms, args.token_delay_ms,
+                         latency=args.latency, error_rate=args.error_rate)
+    print(f"Mock LLM listening on http://{args.host}:{args.port}/v1 "
+          f"(latency {server.RequestHandlerClass.config.latency}, error rate {args.error_rate})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Twilio Messages API (SMS and WhatsApp).
+
+Point the backend at it with TWILIO_API_BASE_URL=http://127.0.0.1:<port> and any
+non-empty TWILIO_ACCOUNT_SID / TWILIO_AUTH_TOKEN / TWILIO_PHONE_NUMBER. Every
+accepted message is kept in an outbox so load tests can read OTP codes back:
+
+    GET /_mock/outbox/<phone>   -> last message sent to that number
+
+Fetching a message (GET .../Messages/<sid>.json) reports it as delivered.
+
+Usage:
+    python -m loadtest.mock_twilio --port 8091 --latency lognormal:250:0.4 --error-rate 0.01
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote
+
+from loadtest.common import LatencyModel
+
+MESSAGES_PATH = re.compile(r'^/2010-04-01/Accounts/(?P<account>[^/]+)/Messages\.json$')
+MESSAGE_PATH = re.compile(r'^/2010-04-01/Accounts/(?P<account>[^/]+)/Messages/(?P<sid>[^/]+)\.json$')
+OTP_PATTERN = re.compile(r'\b(\d{6})\b')
+
+ERRORS = [
+    (429, {"code": 20429, "message": "Too Many Requests", "more_info": "https://www.twilio.com/docs/errors/20429",
+           "status": 429}),
+    (503, {"code": 20503, "message": "Service Unavailable", "more_info": "https://www.twilio.com/docs/errors/20503",
+           "status": 503}),
+]
+
+
+def normalize_number(number):
+    return (number or '').replace('whatsapp:', '').strip()
+
+
+class MockTwilioConfig:
+    def __init__(self, latency=None, error_rate=0.0, outbox_size=100000):
+        self.latency = latency or LatencyModel('fixed', 0)
+        self.error_rate = error_rate
+        self.outbox_size = outbox_size
+        self.outbox = {}
+        self.messages = {}
+        self.requests = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+
+    def sample_error(self):
+        if self.error_rate and random.random() < self.error_rate:
+            with self.lock:
+                self.errors += 1
+            return random.choice(ERRORS)
+        return None
+
+    def record(self, message):
+        with self.lock:
+            if len(self.outbox) >= self.outbox_size:
+                self.outbox.pop(next(iter(self.outbox)))
+            if len(self.messages) >= self.outbox_size:
+                self.messages.pop(next(iter(self.messages)))
+            self.outbox[normalize_number(message['to'])] = message
+            self.messages[message['sid']] = message
+
+    def fetch(self, sid):
+        """A sent message as Twilio reports it once delivered"""
+        with self.lock:
+            message = self.messages.get(sid)
+        return None if message is None else dict(message, status='delivered')
+
+    def last_message(self, number):
+        with self.lock:
+            return self.outbox.get(normalize_number(number))
+
+    def last_otp(self, number):
+        message = self.last_message(number)
+        if message is None:
+            return None
+        match = OTP_PATTERN.search(message['body'])
+        return match.group(1) if match else None
+
+
+class MockTwilioHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    config = MockTwilioConfig()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.startswith('/_mock/outbox/'):
+            message = self.config.last_message(unquote(self.path[len('/_mock/outbox/'):]))
+            if message is None:
+                self._send_json(404, {"message": "No message for that number"})
+            else:
+                self._send_json(200, message)
+            return
+        match = MESSAGE_PATH.match(self.path)
+        message = self.config.fetch(match.group('sid')) if match else None
+        if message is not None:
+            self._send_json(200, message)
+            return
+        self._send_json(404, {"code": 20404, "message": "The requested resource was not found", "status": 404})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        form = {key: values[-1] for key, values in parse_qs(self.rfile.read(length).decode('utf-8')).items()}
+
+        match = MESSAGES_PATH.match(self.path)
+        if not match:
+            self._send_json(404, {"code": 20404, "message": "The requested resource was not found", "status": 404})
+            return
+
+        with self.config.lock:
+            self.config.requests += 1
+
+        time.sleep(self.config.latency.sample())
+
+        error = self.config.sample_error()
+        if error is not None:
+            self._send_json(*error)
+            return
+
+        if not form.get('To') or not form.get('Body'):
+            self._send_json(400, {"code": 21604, "message": "A 'To' phone number and 'Body' are required.",
+                                  "status": 400})
+            return
+
+        sid = f"SM{uuid.uuid4().hex}"
+        account = match.group('account')
+        now = formatdate(usegmt=True)
+        message = {
+            "sid": sid,
+            "account_sid": account,
+            "to": form['To'],
+            "from": form.get('From'),
+            "body": form['Body'],
+            "status": "queued",
+            "direction": "outbound-api",
+            "num_segments": "1",
+            "date_created": now,
+            "date_updated": now,
+            "api_version": "2010-04-01",
+            "uri": f"/2010-04-01/Accounts/{account}/Messages/{sid}.json",
+        }
+        self.config.record(message)
+        self._send_json(201, message)
+
+
+def make_server(host='127.0.0.1', port=8091, latency=None, error_rate=0.0):
+    handler = type('ConfiguredMockTwilioHandler', (MockTwilioHandler,), {
+        'config': MockTwilioConfig(latency, error_rate),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mock Twilio Messages API server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8091)
+    parser.add_argument('--latency', type=LatencyModel.parse, default=LatencyModel('fixed', 0))
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency, args.error_rate)
+    print(f"Mock Twilio listening on http://{args.host}:{args.port} "
+          f"(latency {args.latency}, error rate {args.error_rate})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Offline load test of the whole API against local OpenAI and Twilio stand-ins.
+
+Starts the mock LLM and mock Twilio servers, migrates a throwaway SQLite database
+(or uses --database-url), serves the app with gunicorn, then runs virtual users
+through the scripted scenarios in loadtest/scenarios.py:
+
+    otp      initiate -> verify (OTP read back from the Twilio outbox) -> detail
+    filters  process-filters with a pool of quiz answers
+    chat     three-turn chatbot conversation
+
+and reports throughput, error rate and p50/p95/p99 per endpoint. Needs no network.
+
+Usage:
+    python -m loadtest.run_load --users 30 --duration 60
+    python -m loadtest.run_load --scenarios filters chat --mode async --llm-latency lognormal:700:0.5 \\
+        --llm-error-rate 0.02 --json results.json
+
+Signup state lives in the shared default cache (the database without REDIS_URL),
+so the OTP flow works with any number of workers.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from loadtest import mock_llm, mock_twilio
+from loadtest.bench_ai_modes import MODES
+from loadtest.common import LatencyModel, free_port, wait_until_ready
+from loadtest.scenarios import SCENARIOS, Recorder, Session
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+MOCK_TWILIO_SID = 'AC' + '0' * 32
+
+
+def start_mocks(args):
+    llm_port, twilio_port = free_port(), free_port()
+    llm = mock_llm.make_server(port=llm_port, latency=args.llm_latency, error_rate=args.llm_error_rate,
+                               token_delay_ms=args.llm_token_delay_ms)
+    twilio = mock_twilio.make_server(port=twilio_port, latency=args.twilio_latency,
+                                     error_rate=args.twilio_error_rate)
+    for server in (llm, twilio):
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    return llm, twilio
+
+
+def app_env(args, tmp_dir, llm, twilio):
+    env = dict(
+        os.environ,
+        DATABASE_URL=args.database_url or f"sqlite:///{os.path.join(tmp_dir, 'loadtest.sqlite3')}",
+        OPENAI_API_KEY='mock-key',
+        OPENAI_BASE_URL=f"http://127.0.0.1:{llm.server_port}/v1",
+        TWILIO_ACCOUNT_SID=MOCK_TWILIO_SID,
+        TWILIO_AUTH_TOKEN='mock-token',
+        TWILIO_PHONE_NUMBER='+15005550006',
+        TWILIO_WHATSAPP_NUMBER='+14155238886',
+        TWILIO_API_BASE_URL=f"http://127.0.0.1:{twilio.server_port}",
+        AI_ASYNC_VIEWS=MODES[args.mode]['async_views'],
+        AI_FILTER_CACHE_DIR=os.path.join(tmp_dir, 'ai_cache'),
+        OTP_CACHE_DIR=os.path.join(tmp_dir, 'otp_cache'),
+        CACHE_DIR=os.path.join(tmp_dir, 'cache'),
+    )
+    if not args.keep_rate_limits:
+        # Every virtual user shares 127.0.0.1, so the per-IP budget would throttle the run
+        env['OTP_IP_RATE_LIMIT'] = '0'
+    if args.openai_max_retries is not None:
+        env['OPENAI_MAX_RETRIES'] = str(args.openai_max_retries)
+    if args.no_result_cache:
+        env['AI_FILTER_CACHE_TTL'] = '0'
+    return env
+
+
+def prepare_database(env, catalog):
+    subprocess.run([sys.executable, 'manage.py', 'migrate', '--noinput', '-v', '0'],
+                   cwd=BASE_DIR, env=env, check=True)
+    subprocess.run([sys.executable, 'manage.py', 'createcachetable'], cwd=BASE_DIR, env=env, check=True)
+    if catalog:
+        subprocess.run([sys.executable, 'manage.py', 'load_catalog_snapshot', catalog],
+                       cwd=BASE_DIR, env=env, check=True)
+
+
+def start_app(args, env, port):
+    config = MODES[args.mode]
+    worker_args = config['worker_args']
+    if args.mode == 'sync':
+        worker_args = ['--worker-class', 'gthread', '--threads', str(args.threads)]
+    command = [
+        sys.executable, '-m', 'gunicorn', config['app'],
+        '--bind', f'127.0.0.1:{port}',
+        '--workers', str(args.workers),
+        '--timeout', '120',
+        '--log-level', 'warning',
+        *worker_args,
+    ]
+    return subprocess.Popen(command, cwd=BASE_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL)
+
+
+def run_users(base_url, args, twilio):
+    recorder = Recorder()
+    options = {'twilio': twilio.RequestHandlerClass.config, 'distinct_profiles': args.distinct_profiles}
+    scenarios = [SCENARIOS[name](options) for name in args.scenarios]
+    deadline = time.monotonic() + args.duration
+
+    def user(index):
+        session = Session(base_url, recorder)
+        scenario = scenarios[index % len(scenarios)]
+        iterations = 0
+        while time.monotonic() < deadline and (not args.iterations or iterations < args.iterations):
+            scenario.run(session)
+            iterations += 1
+            if args.think_ms:
+                time.sleep(args.think_ms / 1000.0)
+
+    threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(args.users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    recorder.finish()
+    return recorder.summary()
+
+
+def print_report(summary, args, llm, twilio):
+    llm_config = llm.RequestHandlerClass.config
+    twilio_config = twilio.RequestHandlerClass.config
+
+    print(f"\nmode={args.mode} workers={args.workers} users={args.users} duration={summary['wall_seconds']}s "
+          f"scenarios={','.join(args.scenarios)}")
+    print(f"LLM latency {llm_config.latency} error rate {args.llm_error_rate}; "
+          f"Twilio latency {twilio_config.latency} error rate {args.twilio_error_rate}")
+    print(f"{'endpoint':<18}{'requests':>9}{'errors':>8}{'err %':>8}{'req/s':>9}"
+          f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for endpoint, row in summary['endpoints'].items():
+        print(f"{endpoint:<18}{row['requests']:>9}{row['errors']:>8}{row['error_pct']:>8}{row['rps']:>9}"
+              f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}{row['max_ms']:>10}")
+    print(f"\nmock LLM: {llm_config.requests} calls ({llm_config.errors} injected errors); "
+          f"mock Twilio: {twilio_config.requests} messages ({twilio_config.errors} injected errors)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline load test with mock OpenAI and Twilio')
+    parser.add_argument('--scenarios', nargs='+', choices=sorted(SCENARIOS), default=sorted(SCENARIOS))
+    parser.add_argument('--users', type=int, default=20, help='concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds to run')
+    parser.add_argument('--iterations', type=int, default=0, help='stop each user after N scenario runs')
+    parser.add_argument('--think-ms', type=float, default=0.0, help='pause between scenario runs')
+    parser.add_argument('--mode', choices=sorted(MODES), default='sync')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=16, help='threads per sync worker')
+    parser.add_argument('--database-url', help='defaults to a throwaway SQLite file')
+    parser.add_argument('--catalog', help='publish this catalog snapshot JSON before the run')
+    parser.add_argument('--distinct-profiles', type=int, default=50,
+                        help='size of the quiz-answer pool for the filters scenario')
+    parser.add_argument('--no-result-cache', action='store_true', help='disable the AI filter result cache')
+    parser.add_argument('--openai-max-retries', type=int)
+    parser.add_argument('--keep-rate-limits', action='store_true',
+                        help='keep the per-IP OTP rate limit (all virtual users share one IP)')
+    parser.add_argument('--llm-latency', type=LatencyModel.parse, default=LatencyModel('lognormal', 700, 0.4))
+    parser.add_argument('--llm-token-delay-ms', type=float, default=20.0)
+    parser.add_argument('--llm-error-rate', type=float, default=0.0)
+    parser.add_argument('--twilio-latency', type=LatencyModel.parse, default=LatencyModel('lognormal', 250, 0.3))
+    parser.add_argument('--twilio-error-rate', type=float, default=0.0)
+    parser.add_argument('--json', help='also write the results to this file')
+    parser.add_argument('--verbose', action='store_true', help='show gunicorn stderr')
+    args = parser.parse_args()
+
+    llm, twilio = start_mocks(args)
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            env = app_env(args, tmp_dir, llm, twilio)
+            prepare_database(env, args.catalog)
+
+            port = free_port()
+            server = start_app(args, env, port)
+            try:
+                wait_until_ready(f"http://127.0.0.1:{port}/")
+                summary = run_users(f"http://127.0.0.1:{port}", args, twilio)
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+    finally:
+        llm.shutdown()
+        twilio.shutdown()
+
+    print_report(summary, args, llm, twilio)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as handle:
+            json.dump(summary, handle, indent=2)
+
+
+if __name__ == '__main__':
+    main()
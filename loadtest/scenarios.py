@@ -0,0 +1,231 @@
+"""
+Scripted user journeys for loadtest.run_load.
+
+Each scenario drives one virtual user through a realistic sequence of API calls
+and records every call under an endpoint name via the shared Recorder.
+"""
+
+import itertools
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+from loadtest.common import percentile
+
+COUNTRIES = ["USA", "Canada", "UK", "Germany", "Australia", "Ireland", "New Zealand", "Netherlands"]
+FIELDS = ["IT & Computer Science", "Business & Management", "Engineering", "Data Science",
+          "Artificial Intelligence", "Healthcare & Medicine", "Finance & Accounting"]
+DEGREES = ["Postgraduate", "Undergraduate"]
+INTAKES = ["Fall 2026", "Spring 2027", "Summer 2026"]
+
+COURSE_SAMPLE = [
+    {"country_name": country, "level": level, "duration": duration, "intake": intake,
+     "course_title": title, "annual_fee_usd": fee}
+    for country, level, duration, intake, title, fee in [
+        ("United States", "Masters", "2 Years", "Fall 2026", "MS Computer Science", 42000),
+        ("United States", "Bachelors", "4 Years", "Fall 2026", "BS Business Administration", 38000),
+        ("Canada", "Masters", "1 Year", "Fall 2026", "MSc Data Science", 28000),
+        ("Canada", "Bachelors", "4 Years", "Spring 2027", "BSc Software Engineering", 21000),
+        ("United Kingdom", "Masters", "1 Year", "Fall 2026", "MSc Artificial Intelligence", 31000),
+        ("United Kingdom", "Masters", "1 Year", "Spring 2027", "MBA Finance", 36000),
+        ("Germany", "Masters", "2 Years", "Summer 2026", "MSc Mechanical Engineering", 3000),
+        ("Australia", "Bachelors", "3 Years", "Fall 2026", "Bachelor of Nursing", 30000),
+        ("Ireland", "Masters", "1 Year", "Fall 2026", "MSc Finance", 24000),
+        ("Netherlands", "Masters", "1 Year", "Fall 2026", "MSc Business Analytics", 19000),
+    ]
+]
+
+CHAT_CONTEXT = {
+    "userName": "Load Tester",
+    "countries": [{"country_name": c, "average_tuition_fees": "$25,000", "annual_cost_of_living": "$15,000",
+                   "employability": "90%", "universities_count": 40} for c in
+                  ["United States", "Canada", "United Kingdom", "Germany", "Australia"]],
+    "courses": [dict(course, university_name="Sample University", tuition_fees=course["annual_fee_usd"],
+                     currency="USD", ielts_score=6.5) for course in COURSE_SAMPLE],
+}
+
+CHAT_SCRIPTS = [
+    ["Hi! I want to study abroad next year.",
+     "Which course should I pick for computer science in Canada?",
+     "What about the fees and intake for that?"],
+    ["Tell me about the UK",
+     "Can you help me find a masters in finance?",
+     "Is there something cheaper in Ireland?"],
+    ["I'm looking for data science programs",
+     "Which countries have the best employability?",
+     "Suggest course options under $30,000"],
+]
+
+
+class Recorder:
+    """Thread-safe per-endpoint latency and error bookkeeping"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record(self, endpoint, elapsed, status, ok):
+        with self.lock:
+            self.statuses[endpoint][status] += 1
+            if ok:
+                self.latencies[endpoint].append(elapsed)
+            else:
+                self.errors[endpoint] += 1
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    def summary(self):
+        wall = (self.finished or time.perf_counter()) - self.started
+        rows = {}
+        for endpoint in sorted(set(self.latencies) | set(self.errors)):
+            latencies = sorted(self.latencies[endpoint])
+            total = len(latencies) + self.errors[endpoint]
+            rows[endpoint] = {
+                'requests': total,
+                'errors': self.errors[endpoint],
+                'error_pct': round(100 * self.errors[endpoint] / total, 2) if total else 0.0,
+                'rps': round(total / wall, 2) if wall else 0.0,
+                'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+                'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+                'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+                'max_ms': round(latencies[-1] * 1000, 1) if latencies else 0.0,
+                'statuses': dict(self.statuses[endpoint]),
+            }
+        return {'wall_seconds': round(wall, 2), 'endpoints': rows}
+
+
+class Session:
+    """Minimal JSON HTTP client that records every call"""
+
+    def __init__(self, base_url, recorder, timeout=120):
+        self.base_url = base_url.rstrip('/')
+        self.recorder = recorder
+        self.timeout = timeout
+
+    def request(self, endpoint, method, path, payload=None, expect=(200,)):
+        body = json.dumps(payload).encode('utf-8') if payload is not None else None
+        request = urllib.request.Request(f"{self.base_url}{path}", data=body, method=method,
+                                         headers={'Content-Type': 'application/json'})
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                status, raw = response.status, response.read()
+        except urllib.error.HTTPError as e:
+            status, raw = e.code, e.read()
+        except (urllib.error.URLError, ConnectionError, OSError):
+            status, raw = 0, b''
+        elapsed = time.perf_counter() - started
+
+        ok = status in expect
+        self.recorder.record(endpoint, elapsed, status, ok)
+        try:
+            data = json.loads(raw) if raw else None
+        except ValueError:
+            data = None
+        return ok, data
+
+    def get(self, endpoint, path, **kwargs):
+        return self.request(endpoint, 'GET', path, **kwargs)
+
+    def post(self, endpoint, path, payload, **kwargs):
+        return self.request(endpoint, 'POST', path, payload, **kwargs)
+
+
+class Scenario:
+    name = ''
+
+    def __init__(self, options):
+        self.options = options
+
+    def run(self, session):
+        raise NotImplementedError
+
+
+class OTPFlowScenario(Scenario):
+    """initiate -> read the OTP from the mock Twilio outbox -> verify -> detail"""
+
+    name = 'otp'
+    _phones = itertools.count(1)
+
+    def run(self, session):
+        n = next(self._phones)
+        phone = f"+91{9000000000 + n}"
+        ok, _ = session.post('initiate', '/api/profile/initiate/', {
+            "name": "Load Tester",
+            "email": f"load{n}@example.com",
+            "phone": phone,
+        })
+        if not ok:
+            return
+
+        otp = self.options['twilio'].last_otp(phone)
+        if otp is None:
+            # The API answered 200, but no SMS reached Twilio (e.g. an injected Twilio error)
+            session.recorder.record('otp-delivery', 0.0, 0, False)
+            return
+        session.recorder.record('otp-delivery', 0.0, 200, True)
+
+        ok, _ = session.post('verify', '/api/profile/verify/', {"phone": phone, "otp": otp}, expect=(201,))
+        if not ok:
+            return
+        session.get('detail', f"/api/profile/detail/{phone}/")
+
+
+class ProcessFiltersScenario(Scenario):
+    """Quiz submissions drawn from a fixed pool, so repeats exercise caching and coalescing"""
+
+    name = 'filters'
+
+    def __init__(self, options):
+        super().__init__(options)
+        rng = random.Random(options.get('seed', 7))
+        self.profiles = [
+            {
+                "countries": rng.sample(COUNTRIES, rng.randint(1, 3)),
+                "degree": rng.choice(DEGREES),
+                "fields": rng.sample(FIELDS, rng.randint(1, 2)),
+                "intakes": [rng.choice(INTAKES)],
+                "completedDegree": "B.Tech",
+                "cgpa": round(rng.uniform(6.0, 9.8), 1),
+                "gradYear": "2024",
+                "budget": [rng.choice([15, 25, 30, 40, 60])],
+                "courseSample": COURSE_SAMPLE,
+            }
+            for _ in range(max(1, options.get('distinct_profiles', 50)))
+        ]
+
+    def run(self, session):
+        session.post('process-filters', '/api/profile/process-filters/', random.choice(self.profiles))
+
+
+class ChatScenario(Scenario):
+    """Three-turn conversation carrying the growing history"""
+
+    name = 'chat'
+
+    def run(self, session):
+        history = []
+        for message in random.choice(CHAT_SCRIPTS):
+            ok, data = session.post('chatbot', '/api/profile/chatbot/query/', {
+                "message": message,
+                "context": CHAT_CONTEXT,
+                "conversationHistory": history,
+            })
+            if not ok or not data:
+                return
+            history = history + [
+                {"role": "user", "content": message},
+                {"role": "assistant", "content": data.get('response', '')},
+            ]
+
+
+SCENARIOS = {scenario.name: scenario for scenario in (OTPFlowScenario, ProcessFiltersScenario, ChatScenario)}
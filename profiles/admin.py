@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import StudentProfile, PhoneOTP
+from .models import StudentProfile, PhoneOTP, CatalogSnapshot, Country, University, Course, CourseCatalogVersion, FxRate
+from .services.fx import fx_rates
 
 
 @admin.register(StudentProfile)
@@ -71,3 +72,159 @@ class PhoneOTPAdmin(admin.ModelAdmin):
 
     def has_change_permission(self, request, obj=None):
         return False  # Prevent editing OTPs manually
+
+
+@admin.register(CatalogSnapshot)
+class CatalogSnapshotAdmin(admin.ModelAdmin):
+    list_display = (
+        "version",
+        "row_count",
+        "created_at",
+    )
+
+    readonly_fields = (
+        "version",
+        "countries",
+        "universities",
+        "courses",
+        "created_at",
+    )
+
+    ordering = ("-version",)
+
+    def has_add_permission(self, request):
+        return False  # Snapshots are published with the load_catalog_snapshot command
+
+
+@admin.register(Country)
+class CountryAdmin(admin.ModelAdmin):
+    list_display = (
+        "name",
+        "code",
+    )
+
+    search_fields = ("name", "code")
+
+    ordering = ("name",)
+
+
+@admin.register(University)
+class UniversityAdmin(admin.ModelAdmin):
+    list_display = (
+        "name",
+        "country",
+        "location",
+        "world_rank",
+    )
+
+    list_filter = ("country",)
+
+    search_fields = ("name", "location")
+
+    list_select_related = ("country",)
+
+    ordering = ("name",)
+
+
+@admin.register(Course)
+class CourseAdmin(admin.ModelAdmin):
+    list_display = (
+        "course_title",
+        "university",
+        "country",
+        "level",
+        "duration_months",
+        "intake_season",
+        "intake_year",
+        "annual_fee_usd",
+    )
+
+    list_filter = (
+        "level",
+        "intake_season",
+        "country",
+    )
+
+    search_fields = (
+        "course_id",
+        "course_title",
+    )
+
+    readonly_fields = (
+        "country",
+        "level",
+        "annual_fee_usd",
+        "duration_months",
+        "intake_season",
+        "intake_year",
+        "title_search",
+        "created_at",
+        "updated_at",
+    )
+
+    list_select_related = ("university", "country")
+
+    raw_id_fields = ("university",)
+
+    ordering = ("course_title",)
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        CourseCatalogVersion.bump(note=f"admin: {'changed' if change else 'added'} {obj.course_id}")
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        CourseCatalogVersion.bump(note=f"admin: deleted {obj.course_id}")
+
+    def delete_queryset(self, request, queryset):
+        count = queryset.count()
+        super().delete_queryset(request, queryset)
+        CourseCatalogVersion.bump(note=f"admin: deleted {count} courses")
+
+
+@admin.register(CourseCatalogVersion)
+class CourseCatalogVersionAdmin(admin.ModelAdmin):
+    list_display = (
+        "version",
+        "course_count",
+        "note",
+        "created_at",
+    )
+
+    readonly_fields = (
+        "version",
+        "course_count",
+        "note",
+        "created_at",
+    )
+
+    ordering = ("-version",)
+
+    def has_add_permission(self, request):
+        return False  # Versions are recorded by catalog ingest and course edits
+
+
+@admin.register(FxRate)
+class FxRateAdmin(admin.ModelAdmin):
+    list_display = (
+        "currency",
+        "usd_per_unit",
+        "source",
+        "updated_at",
+    )
+
+    search_fields = ("currency",)
+    readonly_fields = ("updated_at",)
+
+    # Stored fees are repriced by update_fx_rates; here workers only reload the rates
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        fx_rates.forget()
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        fx_rates.forget()
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        fx_rates.forget()
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from profiles.services.catalog_ingest import FORMATS, IngestError, ingest_catalog
+
+
+class Command(BaseCommand):
+    help = 'Stream a partner course catalog (CSV, NDJSON or JSON, optionally .gz) into the course tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='catalog file to import')
+        parser.add_argument('--format', choices=FORMATS, help='file format (default: from the file extension)')
+        parser.add_argument('--batch-size', type=int, help='courses per upsert (default CATALOG_INGEST_BATCH_SIZE)')
+        parser.add_argument('--dry-run', action='store_true', help='parse and normalize only, write nothing')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            with open(path, 'rb') as stream:
+                result = ingest_catalog(
+                    stream,
+                    fmt=options['format'],
+                    name=path,
+                    batch_size=options['batch_size'],
+                    dry_run=options['dry_run'],
+                    log=self.stdout.write,
+                )
+        except OSError as e:
+            raise CommandError(f"Cannot read {path}: {e}")
+        except IngestError as e:
+            raise CommandError(str(e))
+
+        for error in result.errors:
+            self.stderr.write(f"Rejected {error}")
+        if result.unconverted_fees:
+            self.stdout.write(self.style.WARNING(
+                f"{result.unconverted_fees} courses have no FX rate for their currency and no USD fee"
+            ))
+        verb = 'Validated' if options['dry_run'] else 'Upserted'
+        count = result.rows_read - result.rejected if options['dry_run'] else result.upserted
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {count} of {result.rows_read} rows ({result.rejected} rejected) "
+            f"in {result.seconds}s, {result.rows_per_sec} rows/s"
+            + (f"; catalog is now v{result.version}" if result.version else '')
+        ))
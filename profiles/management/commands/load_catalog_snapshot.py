@@ -0,0 +1,36 @@
+import json
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+from profiles.models import CatalogSnapshot
+from profiles.services.catalog_retrieval import ACTIVE_VERSION_CACHE_KEY, SECTIONS
+
+
+class Command(BaseCommand):
+    help = 'Publish a new chatbot catalog snapshot from a JSON file with countries, universities and courses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='JSON file: {"countries": [...], "universities": [...], "courses": [...]}')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], encoding='utf-8') as handle:
+                data = json.load(handle)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read catalog file: {e}")
+
+        if not isinstance(data, dict) or not any(isinstance(data.get(s), list) for s in SECTIONS):
+            raise CommandError(f"Catalog file must be an object with list fields: {', '.join(SECTIONS)}")
+
+        snapshot = CatalogSnapshot.publish(
+            countries=data.get('countries') or [],
+            universities=data.get('universities') or [],
+            courses=data.get('courses') or [],
+        )
+        cache.delete(ACTIVE_VERSION_CACHE_KEY)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Published catalog v{snapshot.version}: {len(snapshot.countries)} countries, "
+            f"{len(snapshot.universities)} universities, {len(snapshot.courses)} courses"
+        ))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from profiles.services.otp_retention import convert_to_partitioned, ensure_partitions, is_partitioned, list_partitions
+
+
+class Command(BaseCommand):
+    help = ('PostgreSQL only: convert phone_otps into daily range partitions by created_at, '
+            'or create upcoming partitions on an already partitioned table')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true',
+                            help='rebuild phone_otps as a partitioned table (takes an exclusive lock while copying)')
+        parser.add_argument('--days-ahead', type=int, help='partitions to premake (default OTP_PARTITION_PREMAKE_DAYS)')
+
+    def handle(self, *args, **options):
+        try:
+            if options['convert']:
+                convert_to_partitioned(options['days_ahead'], log=self.stdout.write)
+            elif not is_partitioned():
+                raise CommandError("phone_otps is not partitioned; run with --convert (PostgreSQL only)")
+            else:
+                created = ensure_partitions(options['days_ahead'])
+                self.stdout.write(f"Created partitions: {', '.join(created) or 'none'}")
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(f"phone_otps partitions: {', '.join(list_partitions())}"))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from profiles.models import PhoneOTP
+from profiles.services.otp_retention import purge_expired_otps, retention_cutoff
+
+
+class Command(BaseCommand):
+    help = 'Delete phone_otps rows past retention in bounded batches (also run hourly by Celery beat)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='rows per DELETE (default OTP_PURGE_BATCH_SIZE)')
+        parser.add_argument('--pause', type=float, help='seconds between batches (default OTP_PURGE_PAUSE_SECONDS)')
+        parser.add_argument('--retention-hours', type=float,
+                            help='keep rows that expired less than this long ago (default OTP_RETENTION_HOURS)')
+        parser.add_argument('--max-batches', type=int, help='stop after this many batches')
+        parser.add_argument('--dry-run', action='store_true', help='only count the rows that would be deleted')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            cutoff = retention_cutoff(options['retention_hours'])
+            count = PhoneOTP.objects.filter(expires_at__lt=cutoff).count()
+            self.stdout.write(f"{count} rows expired before {cutoff.isoformat()} would be deleted")
+            return
+
+        result = purge_expired_otps(
+            batch_size=options['batch_size'],
+            pause_seconds=options['pause'],
+            retention_hours=options['retention_hours'],
+            max_batches=options['max_batches'],
+            log=self.stdout.write,
+        )
+        if result.created_partitions:
+            self.stdout.write(f"Created partitions: {', '.join(result.created_partitions)}")
+        if result.dropped_partitions:
+            self.stdout.write(f"Dropped partitions: {', '.join(result.dropped_partitions)}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {result.deleted} rows in {result.batches} batches ({result.seconds}s)"
+        ))
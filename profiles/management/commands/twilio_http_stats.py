@@ -0,0 +1,12 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from profiles.services.messaging_client import twilio_http_stats
+
+
+class Command(BaseCommand):
+    help = 'Show Twilio HTTP connection reuse and latency counters shared by all workers'
+
+    def handle(self, *args, **options):
+        self.stdout.write(json.dumps(twilio_http_stats(), indent=2))
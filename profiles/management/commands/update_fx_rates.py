@@ -0,0 +1,54 @@
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+
+from profiles.services.fx import FxRateError, fetch_rates, refresh_fx_rates
+
+
+class Command(BaseCommand):
+    help = 'Fetch exchange rates into the FxRate table and reprice non-USD courses (also run daily by Celery beat)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='rates API to fetch from (default FX_RATES_URL)')
+        parser.add_argument('--set', action='append', default=[], metavar='CUR=USD_PER_UNIT',
+                            help='store a rate by hand instead of fetching, e.g. --set INR=0.012 (repeatable)')
+        parser.add_argument('--no-reprice', action='store_true', help='only store the rates')
+        parser.add_argument('--dry-run', action='store_true', help='print the fetched rates without storing them')
+
+    def handle(self, *args, **options):
+        rates = self.parse_rates(options['set']) if options['set'] else None
+        try:
+            if options['dry_run']:
+                for currency, rate in sorted((rates or fetch_rates(options['url'])).items()):
+                    self.stdout.write(f"{currency} = {rate} USD")
+                return
+            result = refresh_fx_rates(
+                url=options['url'],
+                rates=rates,
+                source='manual' if rates else None,
+                reprice=not options['no_reprice'],
+            )
+        except FxRateError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f"Stored {result['saved']} rates")
+        if result['version']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Repriced {result['repriced']} courses; catalog is now v{result['version']}"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS("No course fee changed"))
+
+    @staticmethod
+    def parse_rates(values):
+        rates = {}
+        for value in values:
+            currency, _, rate = value.partition('=')
+            try:
+                rate = Decimal(rate)
+            except InvalidOperation:
+                rate = None
+            if len(currency.strip()) != 3 or rate is None or not rate.is_finite() or rate <= 0:
+                raise CommandError(f"Expected CUR=USD_PER_UNIT, got {value!r}")
+            rates[currency.strip().upper()] = rate
+        return rates
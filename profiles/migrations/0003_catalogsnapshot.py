@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:10
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0002_remove_studentprofile_student_pro_is_veri_fc35f2_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogSnapshot',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('version', models.PositiveIntegerField(unique=True)),
+                ('countries', models.JSONField(default=list)),
+                ('universities', models.JSONField(default=list)),
+                ('courses', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'catalog_snapshots',
+                'ordering': ['-version'],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0003_catalogsnapshot'),
+    ]
+
+    operations = [
+        # Build the composite index before dropping the one it supersedes
+        migrations.AddIndex(
+            model_name='phoneotp',
+            index=models.Index(fields=['phone', 'otp', 'is_used', 'created_at'], name='phone_otps_phone_277e2d_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='phoneotp',
+            name='phone_otps_phone_55f92c_idx',
+        ),
+    ]
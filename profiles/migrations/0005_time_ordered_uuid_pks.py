@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:32
+
+import profiles.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    New rows get time-ordered UUIDv7 ids. The default is applied in Python, so the
+    column type and existing (uuid4) ids are untouched and no table is rewritten.
+    """
+
+    dependencies = [
+        ('profiles', '0004_phoneotp_lookup_index'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='phoneotp',
+                    name='id',
+                    field=models.UUIDField(default=profiles.utils.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='studentprofile',
+                    name='id',
+                    field=models.UUIDField(default=profiles.utils.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+            ],
+        ),
+    ]
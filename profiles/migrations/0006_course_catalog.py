@@ -0,0 +1,95 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:37
+
+import django.db.models.deletion
+import profiles.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0005_time_ordered_uuid_pks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Country',
+            fields=[
+                ('id', models.UUIDField(default=profiles.utils.uuid7, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('name_normalized', models.CharField(editable=False, max_length=100, unique=True)),
+                ('code', models.CharField(blank=True, max_length=2)),
+            ],
+            options={
+                'verbose_name_plural': 'countries',
+                'db_table': 'countries',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='University',
+            fields=[
+                ('id', models.UUIDField(default=profiles.utils.uuid7, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255)),
+                ('name_normalized', models.CharField(editable=False, max_length=255)),
+                ('location', models.CharField(blank=True, max_length=255)),
+                ('world_rank', models.PositiveIntegerField(blank=True, null=True)),
+                ('country', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='universities', to='profiles.country')),
+            ],
+            options={
+                'verbose_name_plural': 'universities',
+                'db_table': 'universities',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Course',
+            fields=[
+                ('id', models.UUIDField(default=profiles.utils.uuid7, editable=False, primary_key=True, serialize=False)),
+                ('course_id', models.CharField(max_length=64, unique=True)),
+                ('course_title', models.CharField(max_length=255)),
+                ('level_name', models.CharField(blank=True, max_length=100)),
+                ('duration', models.CharField(blank=True, max_length=50)),
+                ('intake', models.CharField(blank=True, max_length=100)),
+                ('tuition_fees', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('currency', models.CharField(blank=True, max_length=3)),
+                ('level', models.CharField(blank=True, choices=[('Undergraduate', 'Undergraduate'), ('Postgraduate', 'Postgraduate'), ('Doctorate', 'Doctorate'), ('Diploma', 'Diploma')], max_length=20)),
+                ('duration_months', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('intake_season', models.CharField(blank=True, choices=[('spring', 'Spring'), ('summer', 'Summer'), ('fall', 'Fall'), ('winter', 'Winter')], max_length=10)),
+                ('intake_year', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('annual_fee_usd', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('title_search', models.CharField(blank=True, editable=False, max_length=512)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('country', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='courses', to='profiles.country')),
+                ('university', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='courses', to='profiles.university')),
+            ],
+            options={
+                'db_table': 'courses',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='university',
+            constraint=models.UniqueConstraint(fields=('country', 'name_normalized'), name='universities_country_name_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['country', 'level', 'annual_fee_usd', 'id'], name='courses_country_level_fee'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['level', 'annual_fee_usd', 'id'], name='courses_level_fee'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['annual_fee_usd', 'id'], name='courses_fee'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['intake_season', 'intake_year'], name='courses_intake'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['duration_months'], name='courses_duration'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:39
+
+import profiles.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0006_course_catalog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseCatalogVersion',
+            fields=[
+                ('id', models.UUIDField(default=profiles.utils.uuid7, editable=False, primary_key=True, serialize=False)),
+                ('version', models.PositiveIntegerField(unique=True)),
+                ('course_count', models.PositiveIntegerField(default=0)),
+                ('note', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'course_catalog_versions',
+                'ordering': ['-version'],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:44
+
+import profiles.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0007_course_catalog_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FxRate',
+            fields=[
+                ('id', models.UUIDField(default=profiles.utils.uuid7, editable=False, primary_key=True, serialize=False)),
+                ('currency', models.CharField(max_length=3, unique=True)),
+                ('usd_per_unit', models.DecimalField(decimal_places=10, max_digits=20)),
+                ('source', models.CharField(blank=True, max_length=50)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'fx_rates',
+                'ordering': ['currency'],
+            },
+        ),
+    ]
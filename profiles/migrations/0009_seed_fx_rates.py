@@ -0,0 +1,38 @@
+from decimal import Decimal
+
+from django.db import migrations
+
+# Baseline US dollars per unit so budgets and fees convert before the first
+# update_fx_rates run; INR keeps the 83 INR/USD the app used to hard-code
+SEED_RATES = {
+    'INR': Decimal('1') / Decimal('83'),
+    'GBP': Decimal('1.27'),
+    'EUR': Decimal('1.08'),
+    'CAD': Decimal('0.73'),
+    'AUD': Decimal('0.66'),
+    'NZD': Decimal('0.60'),
+    'SGD': Decimal('0.74'),
+    'AED': Decimal('0.2723'),
+    'CHF': Decimal('1.12'),
+    'JPY': Decimal('0.0067'),
+}
+
+
+def seed_rates(apps, schema_editor):
+    FxRate = apps.get_model('profiles', 'FxRate')
+    for currency, rate in SEED_RATES.items():
+        FxRate.objects.get_or_create(
+            currency=currency,
+            defaults={'usd_per_unit': rate.quantize(Decimal('1e-10')), 'source': 'seed'},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0008_fx_rates'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_rates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:09
+
+import profiles.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0009_seed_fx_rates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogImportChunk',
+            fields=[
+                ('id', models.UUIDField(default=profiles.utils.uuid7, editable=False, primary_key=True, serialize=False)),
+                ('job_id', models.CharField(max_length=32)),
+                ('seq', models.PositiveIntegerField()),
+                ('data', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'catalog_import_chunks',
+                'constraints': [models.UniqueConstraint(fields=('job_id', 'seq'), name='catalog_import_chunk_seq')],
+            },
+        ),
+    ]
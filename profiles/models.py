@@ -1,13 +1,20 @@
 import uuid
 from decimal import Decimal
+from typing import Optional
 from django.db import models
 from django.core.validators import RegexValidator, EmailValidator, MinValueValidator, MaxValueValidator
 from django.utils import timezone
 from django.conf import settings
 
+from .services.catalog_normalize import (
+    LEVEL_CHOICES, SEASON_CHOICES, canonical_level, duration_label, duration_months, intake_label, normalize_name,
+    parse_intake, title_search_text,
+)
+from .utils import uuid7
+
 
 class PhoneOTP(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     phone = models.CharField(max_length=20)
     otp = models.CharField(max_length=6)
     expires_at = models.DateTimeField()
@@ -17,7 +24,10 @@ class PhoneOTP(models.Model):
     class Meta:
         db_table = 'phone_otps'
         indexes = [
-            models.Index(fields=['phone']),
+            # Matches issue/verify lookups (phone, otp, is_used) and their created_at
+            # ordering; its phone prefix also serves the old phone-only index's queries
+            models.Index(fields=['phone', 'otp', 'is_used', 'created_at']),
+            # Retention purges scan by expiry
             models.Index(fields=['expires_at']),
         ]
 
@@ -52,7 +62,7 @@ class PhoneOTP(models.Model):
 
 
 class StudentProfile(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
 
     name = models.CharField(max_length=255)
     email = models.EmailField()
@@ -82,3 +92,279 @@ class StudentProfile(models.Model):
     def __str__(self):
         return f"{self.name} ({self.phone})"
 
+    @classmethod
+    def upsert_verified(cls, phone, name, email):
+        """
+        Create or update the verified profile for a phone in one statement
+        (INSERT ... ON CONFLICT (phone) DO UPDATE, ON DUPLICATE KEY UPDATE on MySQL).
+        bulk_create sends no post_save, so the cached detail is invalidated here.
+        """
+        from django.db import connections, router
+        from .services.profile_cache import invalidate_profile
+        using = router.db_for_write(cls)
+        profile = cls(phone=phone, name=name, email=email, is_verified=True)
+        # MySQL can't name the conflict target; phone is the only unique key besides the pk
+        unique_fields = ['phone'] if connections[using].features.supports_update_conflicts_with_target else None
+        cls.objects.using(using).bulk_create(
+            [profile],
+            update_conflicts=True,
+            unique_fields=unique_fields,
+            update_fields=['name', 'email', 'is_verified', 'updated_at'],
+        )
+        invalidate_profile(phone)
+        return profile
+
+
+
+class CatalogSnapshot(models.Model):
+    """
+    Versioned copy of the country / university / course catalog the chatbot
+    retrieves from. The highest version is the active one.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    version = models.PositiveIntegerField(unique=True)
+    countries = models.JSONField(default=list)
+    universities = models.JSONField(default=list)
+    courses = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'catalog_snapshots'
+        ordering = ['-version']
+
+    def __str__(self):
+        return f"Catalog v{self.version}"
+
+    @property
+    def row_count(self):
+        return len(self.countries) + len(self.universities) + len(self.courses)
+
+    @classmethod
+    def publish(cls, countries, universities, courses):
+        """Store a new snapshot as the next version"""
+        from django.db import transaction
+        with transaction.atomic():
+            latest = cls.objects.select_for_update().order_by('-version').first()
+            return cls.objects.create(
+                version=(latest.version + 1) if latest else 1,
+                countries=countries,
+                universities=universities,
+                courses=courses,
+            )
+
+
+class Country(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    name = models.CharField(max_length=100, unique=True)
+    # casefolded, whitespace-collapsed name used for lookups
+    name_normalized = models.CharField(max_length=100, unique=True, editable=False)
+    code = models.CharField(max_length=2, blank=True)
+
+    class Meta:
+        db_table = 'countries'
+        ordering = ['name']
+        verbose_name_plural = 'countries'
+
+    def __str__(self):
+        return self.name
+
+    def save(self, *args, **kwargs):
+        self.name_normalized = normalize_name(self.name)
+        super().save(*args, **kwargs)
+
+
+class University(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    name = models.CharField(max_length=255)
+    name_normalized = models.CharField(max_length=255, editable=False)
+    country = models.ForeignKey(Country, on_delete=models.PROTECT, related_name='universities')
+    location = models.CharField(max_length=255, blank=True)
+    world_rank = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'universities'
+        ordering = ['name']
+        verbose_name_plural = 'universities'
+        constraints = [
+            models.UniqueConstraint(fields=['country', 'name_normalized'], name='universities_country_name_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.country_id})"
+
+    def save(self, *args, **kwargs):
+        self.name_normalized = normalize_name(self.name)
+        super().save(*args, **kwargs)
+
+
+# Keys of the course dicts the AI services and the frontend work with
+COURSE_ROW_FIELDS = ('course_id', 'course_title', 'level_name', 'level', 'duration', 'duration_months',
+                     'intake', 'intake_season', 'intake_year', 'tuition_fees', 'currency', 'annual_fee_usd')
+
+
+class CourseQuerySet(models.QuerySet):
+    def rows(self, *fields):
+        """Flat course dicts with university_name / country_name, without loading model instances"""
+        return self.values(
+            *fields,
+            *COURSE_ROW_FIELDS,
+            university_name=models.F('university__name'),
+            country_name=models.F('country__name'),
+        )
+
+
+class Course(models.Model):
+    """
+    One programme from a partner catalog. The partner's level_name and fee
+    (tuition_fees + currency) are kept for display; duration and intake are
+    rewritten to canonical labels ('2 Years', 'Fall 2026') when they parse. The
+    normalized columns next to them are what filters and indexes use.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    course_id = models.CharField(max_length=64, unique=True)
+    course_title = models.CharField(max_length=255)
+    university = models.ForeignKey(University, on_delete=models.CASCADE, related_name='courses')
+    # Denormalized from university so country filters and indexes need no join
+    country = models.ForeignKey(Country, on_delete=models.PROTECT, related_name='courses')
+
+    level_name = models.CharField(max_length=100, blank=True)
+    duration = models.CharField(max_length=50, blank=True)
+    intake = models.CharField(max_length=100, blank=True)
+    tuition_fees = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    currency = models.CharField(max_length=3, blank=True)
+
+    level = models.CharField(max_length=20, choices=LEVEL_CHOICES, blank=True)
+    duration_months = models.PositiveSmallIntegerField(null=True, blank=True)
+    intake_season = models.CharField(max_length=10, choices=SEASON_CHOICES, blank=True)
+    intake_year = models.PositiveSmallIntegerField(null=True, blank=True)
+    annual_fee_usd = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    title_search = models.CharField(max_length=512, blank=True, editable=False)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = CourseQuerySet.as_manager()
+
+    class Meta:
+        db_table = 'courses'
+        indexes = [
+            # Search filters by country and/or level under a fee ceiling and pages by
+            # (annual_fee_usd, id), so each of these serves a filter plus its keyset order
+            models.Index(fields=['country', 'level', 'annual_fee_usd', 'id'], name='courses_country_level_fee'),
+            models.Index(fields=['level', 'annual_fee_usd', 'id'], name='courses_level_fee'),
+            models.Index(fields=['annual_fee_usd', 'id'], name='courses_fee'),
+            models.Index(fields=['intake_season', 'intake_year'], name='courses_intake'),
+            models.Index(fields=['duration_months'], name='courses_duration'),
+        ]
+
+    def __str__(self):
+        return f"{self.course_title} ({self.course_id})"
+
+    @property
+    def university_name(self):
+        return self.university.name
+
+    @property
+    def country_name(self):
+        return self.country.name
+
+    def normalize(self):
+        """Fill the normalized columns from the partner's strings"""
+        self.level = canonical_level(self.level_name)
+        self.duration_months = duration_months(self.duration)
+        if self.duration_months:
+            self.duration = duration_label(self.duration_months)
+        self.intake_season, self.intake_year = parse_intake(self.intake)
+        if self.intake_season:
+            self.intake = intake_label(self.intake_season, self.intake_year)
+        self.title_search = title_search_text(self.course_title)
+        self.annual_fee_usd = self.fee_in_usd()
+        # Derived, never edited: follows the university wherever it moves
+        if self.university_id is not None:
+            self.country_id = self.university.country_id
+
+    def fee_in_usd(self) -> Optional[Decimal]:
+        """tuition_fees in USD at the stored FX rate (None without a fee or a rate)"""
+        if self.tuition_fees is None:
+            return None
+        if self.currency.upper() == 'USD':
+            return Decimal(self.tuition_fees)
+        from .services.fx import fx_table
+
+        fee = fx_table().convert(self.tuition_fees, self.currency)
+        return None if fee is None else Decimal(f"{fee:.2f}")
+
+    def save(self, *args, **kwargs):
+        self.normalize()
+        super().save(*args, **kwargs)
+
+
+class CourseCatalogVersion(models.Model):
+    """
+    One row per change to the Course tables (an ingest, an admin edit). The
+    highest version is current; caches derived from the catalog are keyed on it.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    version = models.PositiveIntegerField(unique=True)
+    course_count = models.PositiveIntegerField(default=0)
+    note = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'course_catalog_versions'
+        ordering = ['-version']
+
+    def __str__(self):
+        return f"Course catalog v{self.version}"
+
+    @classmethod
+    def bump(cls, note=''):
+        """Record a new version, and stop caches from serving the previous one"""
+        from django.db import transaction
+        from .services.course_catalog import forget_active_version
+        with transaction.atomic():
+            latest = cls.objects.select_for_update().order_by('-version').first()
+            entry = cls.objects.create(
+                version=(latest.version + 1) if latest else 1,
+                course_count=Course.objects.count(),
+                note=note[:255],
+            )
+        forget_active_version()
+        return entry
+
+
+class FxRate(models.Model):
+    """US dollars per unit of a currency, used to put every course fee in USD"""
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    currency = models.CharField(max_length=3, unique=True)
+    usd_per_unit = models.DecimalField(max_digits=20, decimal_places=10)
+    source = models.CharField(max_length=50, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'fx_rates'
+        ordering = ['currency']
+
+    def __str__(self):
+        return f"{self.currency} = {self.usd_per_unit} USD"
+
+
+class CatalogImportChunk(models.Model):
+    """
+    One piece of an uploaded catalog waiting for the catalog worker. Uploads are
+    spooled to the database because web and worker dynos share no disk.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    job_id = models.CharField(max_length=32)
+    seq = models.PositiveIntegerField()
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'catalog_import_chunks'
+        constraints = [
+            models.UniqueConstraint(fields=['job_id', 'seq'], name='catalog_import_chunk_seq'),
+        ]
+
+    def __str__(self):
+        return f"{self.job_id}#{self.seq}"
@@ -0,0 +1,23 @@
+# profiles/renderers.py
+
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets DRF negotiate `Accept: text/event-stream` for the streaming chatbot.
+
+    Successful streams bypass rendering (they are StreamingHttpResponses); this only
+    renders error payloads, as a single SSE `error` event, so EventSource clients
+    get something they can parse instead of a 406.
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return f"event: error\ndata: {json.dumps(data)}\n\n".encode(self.charset)
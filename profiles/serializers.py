@@ -437,6 +437,49 @@ class CourseSuggestionSerializer(serializers.Serializer):
         return None
 
 
+class CourseSearchSerializer(serializers.Serializer):
+    """Serializer for catalog search with the filters returned by process-filters"""
+    filters = serializers.DictField(
+        required=False,
+        default=dict,
+        error_messages={
+            'not_a_dict': 'Filters must be an object.'
+        }
+    )
+    limit = serializers.IntegerField(
+        default=20,
+        min_value=1,
+        max_value=100,
+        error_messages={
+            'min_value': 'Limit must be at least 1.',
+            'max_value': 'Limit cannot exceed 100.'
+        }
+    )
+    cursor = serializers.CharField(
+        max_length=200,
+        required=False,
+        allow_blank=True,
+        help_text="nextCursor from the previous page"
+    )
+
+
+
+class CatalogImportSerializer(serializers.Serializer):
+    """Serializer for a partner catalog upload (CSV, NDJSON or JSON, optionally gzipped)"""
+    file = serializers.FileField(
+        required=True,
+        allow_empty_file=False,
+        error_messages={
+            'required': 'A catalog file is required.',
+            'empty': 'The catalog file is empty.'
+        }
+    )
+    format = serializers.ChoiceField(
+        choices=['csv', 'ndjson', 'json'],
+        required=False,
+        help_text="File format; taken from the file extension when omitted"
+    )
+
 class CourseSelectionSerializer(serializers.Serializer):
     """Serializer for course selection from suggestions"""
     course_id = serializers.CharField(
@@ -2,35 +2,39 @@
 
 import json
 import logging
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from openai import OpenAI
-from typing import Dict, List, Any
+from typing import Dict, Iterable, List, Any, Optional
+
+from .catalog_normalize import LEVEL_MAPPINGS, canonical_level, duration_label, duration_months
+from .filter_cache import FilterResultCache
+from .facets import get_facet_summary
+from .filter_compiler import LocalFilterCompiler, diff_filters
+from .fx import fx_table
+from .matching import get_matcher
+from .metrics import BufferedMetrics
+from .openai_client import client, get_async_client
+from .prompt_budget import TOKENS_PER_MESSAGE, TOKENS_PER_REPLY, AssembledPrompt, PromptAssembler
+from .singleflight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+# Shared by every CourseFilterAI in the process, keyed on the result cache key
+filter_flight = SingleFlight('ai_filters')
+
+# Student budgets are entered in lakhs (100,000s) of STUDENT_BUDGET_CURRENCY
+LAKH = 100000
+
+FILTER_SYSTEM_PROMPT = ("You return ONLY valid JSON. No markdown, no explanation. Use the exact mappings provided. "
+                        "Ensure all returned values exist in the available data.")
 
 
 class CourseFilterAI:
     def __init__(self):
         self.model = "gpt-4o-mini"
 
-        # Enhanced predefined mappings for better accuracy
-        self.level_mappings = {
-            "Undergraduate": ["Bachelor", "Bachelors", "Undergraduate", "UG"],
-            "Postgraduate": ["Master", "Masters", "Postgraduate", "PG", "Graduate"],
-            "Doctorate": ["PhD", "Doctorate", "Doctoral", "Doctor of Philosophy"],
-            "Diploma": ["Diploma", "Certificate", "Certification"]
-        }
-
-        # Enhanced duration mappings
-        self.duration_mappings = {
-            "1 Year": ["1 Year", "12 months", "1 year"],
-            "2 Years": ["2 Years", "24 months", "2 year"],
-            "3 Years": ["3 Years", "36 months", "3 year"],
-            "4 Years": ["4 Years", "48 months", "4 year"],
-            "5 Years": ["5 Years", "60 months", "5 year"]
-        }
+        # Shared with catalog ingest and search so both sides agree on levels
+        self.level_mappings = LEVEL_MAPPINGS
 
         self.field_keywords = {
             "IT & Computer Science": ["computer", "it", "software", "programming", "coding", "artificial", "ai",
@@ -51,326 +55,440 @@ class CourseFilterAI:
             "Economics & Finance": ["economics", "finance", "accounting", "banking", "investment"]
         }
 
-    def find_best_match(self, target: str, options: List[str], threshold: float = 0.6) -> str:
+        self.compiler = LocalFilterCompiler(self.level_mappings, self.field_keywords)
+
+    def find_best_match(self, target: str, options: Iterable[str], threshold: float = 0.0) -> str:
         """
-        Find the best matching option from a list of options
+        Find the best matching option from a list of options.
+
+        Matching runs against a precompiled FacetMatcher (exact, alias and token
+        index lookups, ranked by similarity) that is built once per vocabulary.
+        Any shared token counts as a match unless a higher threshold is given.
         """
         if not target or not options:
             return ""
 
-        target_lower = target.lower()
-
-        # First try exact match (case-insensitive)
-        for option in options:
-            if option.lower() == target_lower:
-                return option
-
-        # Try partial match
-        for option in options:
-            if target_lower in option.lower() or option.lower() in target_lower:
-                return option
-
-        # Try keyword matching
-        for option in options:
-            option_words = option.lower().split()
-            target_words = target_lower.split()
+        return get_matcher(options).best(target, min_score=threshold)
 
-            # Check if any words match
-            for t_word in target_words:
-                for o_word in option_words:
-                    if t_word == o_word:
-                        return option
-
-        return ""
-
-    def map_ai_to_data_level(self, ai_level: str, available_levels: List[str]) -> str:
+    def map_ai_to_data_level(self, ai_level: str, available_levels: Iterable[str]) -> str:
         """
-        Map AI level to actual data level with improved logic
+        Map AI level to actual data level. Course levels are canonicalized at
+        ingest, so a recognised level resolves directly; fuzzy matching is only
+        the fallback for values outside LEVEL_MAPPINGS.
         """
-        logger.info(f"Mapping AI level '{ai_level}' to available levels: {available_levels}")
+        level = canonical_level(ai_level)
+        if level and level in available_levels:
+            return level
 
-        # Get all possible mappings for the AI level
-        possible_levels = self.level_mappings.get(ai_level, [ai_level])
-
-        # Find exact matches first
-        for level in possible_levels:
-            if level in available_levels:
-                logger.info(f"Exact match found: {level}")
-                return level
+        logger.info(f"Mapping AI level '{ai_level}' to available levels: {available_levels}")
+        possible_levels = self.level_mappings.get(level, [ai_level])
 
-        # Find partial matches
-        for level in possible_levels:
-            best_match = self.find_best_match(level, available_levels)
-            if best_match:
-                logger.info(f"Partial match found: {ai_level} -> {best_match}")
-                return best_match
+        # Find partial matches, keeping the highest-ranked candidate across all synonyms
+        matcher = get_matcher(available_levels)
+        ranked = [match for level in possible_levels for match in matcher.rank(level, limit=1)]
+        if ranked:
+            best_match = max(ranked)[1]
+            logger.info(f"Partial match found: {ai_level} -> {best_match}")
+            return best_match
 
         # If no match found, return the original AI level
         logger.warning(f"No match found for level '{ai_level}', returning original")
         return ai_level
 
-    def map_ai_to_data_duration(self, ai_duration: str, available_durations: List[str]) -> str:
+    def map_ai_to_data_duration(self, ai_duration: str, available_durations: Iterable[str]) -> str:
         """
-        Map AI duration to actual data duration with improved logic
+        Map AI duration to actual data duration. Course durations are stored as
+        canonical labels ('2 Years', '18 Months'), so any parseable duration
+        resolves by its length in months; fuzzy matching is the fallback.
         """
-        logger.info(f"Mapping AI duration '{ai_duration}' to available durations: {available_durations}")
-
-        # Get all possible mappings for the AI duration
-        possible_durations = self.duration_mappings.get(ai_duration, [ai_duration])
+        months = duration_months(ai_duration)
+        if months and duration_label(months) in available_durations:
+            return duration_label(months)
 
-        # Find exact matches first
-        for duration in possible_durations:
-            if duration in available_durations:
-                logger.info(f"Exact match found: {duration}")
-                return duration
-
-        # Find partial matches
-        for duration in possible_durations:
-            best_match = self.find_best_match(duration, available_durations)
-            if best_match:
-                logger.info(f"Partial match found: {ai_duration} -> {best_match}")
-                return best_match
+        logger.info(f"Mapping AI duration '{ai_duration}' to available durations: {available_durations}")
+        best_match = get_matcher(available_durations).best(ai_duration)
+        if best_match:
+            logger.info(f"Partial match found: {ai_duration} -> {best_match}")
+            return best_match
 
         # If no match found, return the original AI duration
         logger.warning(f"No match found for duration '{ai_duration}', returning original")
         return ai_duration
 
+    @staticmethod
+    def budget_to_usd(budget_lakhs) -> Optional[float]:
+        """A student budget (lakhs of STUDENT_BUDGET_CURRENCY) in USD, or None without a rate"""
+        currency = settings.STUDENT_BUDGET_CURRENCY
+        budget_usd = fx_table().convert(float(budget_lakhs or 0) * LAKH, currency)
+        if budget_usd is None:
+            logger.error(f"No FX rate for {currency}; run update_fx_rates")
+        return budget_usd
+
     def process_student_profile(self, profile_data: Dict[str, Any], course_sample: List[Dict[str, Any]]) -> Dict[
         str, Any]:
         """
         Process student profile and generate intelligent course filters
         """
         try:
-            # Extract unique values from course sample with better normalization
-            countries_in_data = list(set([
-                c.get('country_name', '').strip()
-                for c in course_sample
-                if c.get('country_name')
-            ]))
-
-            levels_in_data = list(set([
-                c.get('level', '').strip()
-                for c in course_sample
-                if c.get('level')
-            ]))
-
-            durations_in_data = list(set([
-                c.get('duration', '').strip()
-                for c in course_sample
-                if c.get('duration')
-            ]))
-
-            intakes_in_data = list(set([
-                c.get('intake', '').strip()
-                for c in course_sample
-                if c.get('intake')
-            ]))
-
-            # Sample course titles with more variety
-            course_titles_sample = [
-                c.get('course_title', '').strip()
-                for c in course_sample[:20]
-                if c.get('course_title')
-            ]
-
-            # Get price ranges from the data
-            prices_in_data = [
-                float(c.get('annual_fee_usd', 0))
-                for c in course_sample
-                if c.get('annual_fee_usd') and c.get('annual_fee_usd') != ''
-            ]
-            min_price = min(prices_in_data) if prices_in_data else 0
-            max_price = max(prices_in_data) if prices_in_data else 50000
-
-            # Convert budget from INR to USD with more flexibility
-            budget_inr = profile_data.get('budget', [0])[0] * 100000  # Convert lakhs to rupees
-            budget_usd = round(budget_inr / 83, -3)  # Convert to USD and round to nearest 1000
-
-            # Make sure budget is reasonable but more flexible
-            budget_usd = max(1000, budget_usd)  # Minimum $1000
-            budget_usd = min(100000, budget_usd)  # Increased cap to $100,000 for more options
-
-            # In ai_service.py, update the prompt to be more flexible:
-
-            prompt = f"""You are an expert at matching student preferences to course data.
-
-            STUDENT PROFILE:
-            - Countries Wanted: {', '.join(profile_data.get('countries', []))}
-            - Target Degree: {profile_data.get('degree', '')}
-            - Field Interests: {', '.join(profile_data.get('fields', []))}
-            - Preferred Intakes: {', '.join(profile_data.get('intakes', []))}
-            - Completed Degree: {profile_data.get('completedDegree', '')}
-            - CGPA: {profile_data.get('cgpa', 0)}/10
-            - Budget: ₹{profile_data.get('budget', [0])[0]} Lakhs/year (approximately ${budget_usd})
-
-            ACTUAL COURSE DATA:
-            Available Countries: {', '.join(countries_in_data)}
-            Available Levels: {', '.join(levels_in_data)}
-            Available Durations: {', '.join(durations_in_data)}
-            Available Intakes: {', '.join(intakes_in_data)}
-            Price Range: ${min_price} - ${max_price} USD per year
-            Sample Course Titles: {', '.join(course_titles_sample[:10])}
-
-            INSTRUCTIONS:
-
-            1. **countries**: Return array of countries from student preferences that BEST MATCH available countries
-            - Use fuzzy matching if exact match not found
-            - Example: Student wants "USA" → return ["United States"] if that's in data
-            - MUST be array, not string
-            - If no matches, return empty array
-
-            2. **level**: Map student's degree to BEST MATCH in available levels
-            - "Postgraduate" → "Master" or "Masters"
-            - "Undergraduate" → "Bachelor" or "Bachelors"
-            - Use exact match if available, otherwise use closest match
-
-            3. **course**: Generate 2-3 relevant keywords from field interests AS A SINGLE STRING
-            - For "IT & Computer Science": return "Computer IT Software" (NOT an array)
-            - For "Business & Management": return "Business Management MBA" (NOT an array)
-            - These will be used for partial matching in course titles
-
-            4. **duration**: Select a duration that's within the reasonable range for the degree
-            - For Undergraduate: look for durations between 3-4 years
-            - For Postgraduate: look for durations between 1-2 years
-            - Return just the number with "Years" (e.g., "3 Years", "1.5 Years")
-
-            5. **intakes**: Return array of student's preferred intakes that BEST MATCH available intakes
-            - Be more flexible with matching - "Fall 2026" could match "Fall 2026", "September 2026", or just "Fall"
-            - If no exact matches, try to match just the season (Fall, Spring, etc.)
-            - MUST be array
-
-            6. **maxBudgetUSD**: Use the calculated budget (${budget_usd})
-            - Increase by 20% if needed based on price range in data to provide more options
-            - Round to nearest 1000
-
-            7. **searchQuery**: Combine 2-3 most relevant keywords from field interests
-            - For "IT & Computer Science": "Computer Science"
-            - For "Artificial Intelligence": "AI Machine Learning"
-            - For "Business & Management": "Business Management"
-
-            IMPORTANT: Be flexible with matching to ensure results are found. If a filter is too restrictive and would return 0 results, relax it slightly.
-
-            RETURN ONLY THIS JSON (no markdown):
-            {{
-            "countries": ["array of country names"],
-            "level": "exact level from available levels",
-            "course": "single string with space-separated keywords",
-            "duration": "duration in years (e.g., '3 Years')",
-            "intakes": ["array of intake names"],
-            "maxBudgetUSD": {budget_usd * 1.2},
-            "searchQuery": "2-3 relevant search terms"
-            }}"""
-
-            logger.info("Calling OpenAI API...")
-            logger.info(f"Student wants countries: {profile_data.get('countries')}")
-            logger.info(f"Student wants intakes: {profile_data.get('intakes')}")
-            logger.info(f"Budget: ₹{profile_data.get('budget', [0])[0]}L (${budget_usd})")
-
-            response = client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You return ONLY valid JSON. No markdown, no explanation. Use the exact mappings provided. Ensure all returned values exist in the available data."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.1,  # Lower temperature for more consistent results
-                response_format={"type": "json_object"}
+            context = self._prepare_filter_request(profile_data, course_sample)
+
+            local_result = self.compile_local_filters(profile_data, context)
+            if local_result is not None:
+                return local_result
+
+            cached_result = context['result_cache'].get(context['cache_key'])
+            if cached_result is not None:
+                self._log_shadow_comparison(context, cached_result)
+                return cached_result
+
+            # Identical profiles submitted at the same moment share one LLM call
+            result = filter_flight.do(
+                context['cache_key'],
+                lambda: self._finalize_filter_response(
+                    client.chat.completions.create(**context['request']), profile_data, context
+                ),
             )
+            self._log_shadow_comparison(context, result)
+            return result
+
+        except Exception as e:
+            logger.error(f"Error in AI service: {str(e)}")
+            import traceback
+            logger.error(traceback.format_exc())
+
+            # Fallback to basic filters if AI fails
+            return self._fallback_filters(profile_data, course_sample)
+
+    async def aprocess_student_profile(self, profile_data: Dict[str, Any],
+                                       course_sample: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Async variant of process_student_profile for ASGI deployments; the LLM call
+        does not hold a worker thread while it is in flight
+        """
+        try:
+            # Facets and budget conversion read the FX table (ORM), so they run off the event loop
+            context, local_result = await sync_to_async(self._prepare_local_filters, thread_sensitive=False)(
+                profile_data, course_sample
+            )
+            if local_result is not None:
+                return local_result
+
+            cached_result = await context['result_cache'].aget(context['cache_key'])
+            if cached_result is not None:
+                self._log_shadow_comparison(context, cached_result)
+                return cached_result
+
+            async def call_llm():
+                response = await get_async_client().chat.completions.create(**context['request'])
+                return await sync_to_async(self._finalize_filter_response, thread_sensitive=False)(
+                    response, profile_data, context
+                )
+
+            result = await filter_flight.ado(context['cache_key'], call_llm)
+            self._log_shadow_comparison(context, result)
+            return result
+
+        except Exception as e:
+            logger.error(f"Error in async AI service: {str(e)}")
+            import traceback
+            logger.error(traceback.format_exc())
+
+            # Fallback to basic filters if AI fails
+            return await sync_to_async(self._fallback_filters, thread_sensitive=False)(profile_data, course_sample)
+
+    def _prepare_local_filters(self, profile_data: Dict[str, Any], course_sample: List[Dict[str, Any]]):
+        context = self._prepare_filter_request(profile_data, course_sample)
+        return context, self.compile_local_filters(profile_data, context)
 
-            response_text = response.choices[0].message.content.strip()
-            logger.info(f"OpenAI response: {response_text}")
+    def compile_local_filters(self, profile_data: Dict[str, Any], context: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Run the rule-based compiler and return its result when it is confident enough
+        to skip the LLM. In shadow mode the LLM is always called and compared instead.
+        """
+        compiled = self.compiler.compile(profile_data, context)
+        context['local_filters'] = compiled
+        logger.info(f"Local filters (confidence {compiled['confidence']}): {compiled['filters']}")
+
+        if settings.AI_FILTER_SHADOW_MODE:
+            return None
 
-            filters = json.loads(response_text)
-            logger.info(f"Parsed filters: {filters}")
+        if compiled['confidence'] < settings.AI_LOCAL_CONFIDENCE_THRESHOLD:
+            logger.info(f"Local confidence below {settings.AI_LOCAL_CONFIDENCE_THRESHOLD}, using LLM")
+            return None
+
+        return {
+            'success': True,
+            'filters': compiled['filters'],
+            'source': 'rules',
+            'confidence': compiled['confidence']
+        }
+
+    def _log_shadow_comparison(self, context: Dict[str, Any], result: Dict[str, Any]):
+        """
+        Log where the local compiler disagrees with the LLM so the threshold can be tuned
+        """
+        if not settings.AI_FILTER_SHADOW_MODE or 'local_filters' not in context:
+            return
+
+        compiled = context['local_filters']
+        differences = diff_filters(compiled['filters'], result.get('filters', {}))
+        # Also called on the event loop by aprocess_student_profile
+        metrics = BufferedMetrics(settings.AI_FILTER_CACHE_ALIAS, prefix='filter_compiler')
+        metrics.incr('shadow_comparisons')
+
+        if differences:
+            metrics.incr('shadow_disagreements')
+            mismatches = {key: {'local': local, 'llm': llm} for key, (local, llm) in differences.items()}
+            logger.warning(
+                f"Shadow mismatch (local confidence {compiled['confidence']}, "
+                f"scores {compiled['scores']}): {mismatches}"
+            )
+        else:
+            logger.info(f"Shadow match (local confidence {compiled['confidence']})")
+
+    def _prepare_filter_request(self, profile_data: Dict[str, Any], course_sample: List[Dict[str, Any]]) -> Dict[
+        str, Any]:
+        """
+        Extract the facet vocabulary, resolve the cache key and build the OpenAI request
+        """
+        # Single pass over the sample, shared with the fallback path and cached by content hash
+        facets = get_facet_summary(course_sample)
+
+        countries_in_data = facets.values('countries')
+        levels_in_data = facets.values('levels')
+        durations_in_data = facets.values('durations')
+        intakes_in_data = facets.values('intakes')
+        course_titles_sample = facets.titles
+        min_price = facets.min_price
+        max_price = facets.max_price
+
+        # Convert budget to USD at the stored rate, rounded to the nearest 1000
+        budget_usd = self.budget_to_usd(profile_data.get('budget', [0])[0])
+        budget_usd = round(budget_usd, -3) if budget_usd is not None else 100000
+
+        # Make sure budget is reasonable but more flexible
+        budget_usd = max(1000, budget_usd)  # Minimum $1000
+        budget_usd = min(100000, budget_usd)  # Increased cap to $100,000 for more options
+
+        # Identical profiles against the same facet vocabulary share one LLM result
+        result_cache = FilterResultCache()
+        cache_key = result_cache.make_key(profile_data, budget_usd, facets.vocabulary_hash)
+
+        # Facet vocabularies and title samples are fitted into the prompt token budget,
+        # most common values first
+        assembler = PromptAssembler(settings.AI_FILTER_PROMPT_TOKEN_BUDGET, 'process_filters', self.model)
+        assembler.reserve(FILTER_SYSTEM_PROMPT, tokens=2 * TOKENS_PER_MESSAGE + TOKENS_PER_REPLY)
+        assembler.reserve(self._filter_prompt(profile_data, budget_usd, facets, AssembledPrompt(0, 0)))
+        assembler.add_section('countries', countries_in_data, priority=1, separator=', ')
+        assembler.add_section('levels', levels_in_data, priority=2, separator=', ')
+        assembler.add_section('intakes', intakes_in_data, priority=3, separator=', ')
+        assembler.add_section('durations', durations_in_data, priority=4, separator=', ')
+        assembler.add_section('titles', course_titles_sample, priority=5, separator=', ')
+        sections = assembler.assemble()
+
+        prompt = self._filter_prompt(profile_data, budget_usd, facets, sections)
+        messages = [
+            {
+                "role": "system",
+                "content": FILTER_SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+        assembler.record(messages, sections)
 
-            # Post-processing and validation
-            # Ensure countries is an array
-            if isinstance(filters.get('countries'), str):
-                filters['countries'] = [filters['countries']] if filters['countries'] else []
+        logger.info("Calling OpenAI API...")
+        logger.info(f"Student wants countries: {profile_data.get('countries')}")
+        logger.info(f"Student wants intakes: {profile_data.get('intakes')}")
+        logger.info(f"Budget: {profile_data.get('budget', [0])[0]}L {settings.STUDENT_BUDGET_CURRENCY} (${budget_usd})")
 
-            # Ensure intakes is an array
-            if isinstance(filters.get('intakes'), str):
-                filters['intakes'] = [filters['intakes']] if filters['intakes'] else []
+        return {
+            'facets': facets,
+            'matchers': facets.matchers,
+            'min_price': min_price,
+            'max_price': max_price,
+            'budget_usd': budget_usd,
+            'result_cache': result_cache,
+            'cache_key': cache_key,
+            'request': {
+                'model': self.model,
+                'messages': messages,
+                'temperature': 0.1,  # Lower temperature for more consistent results
+                'response_format': {"type": "json_object"}
+            },
+        }
 
-            # Validate and improve country matching
-            if filters.get('countries'):
-                validated_countries = []
-                for country in filters['countries']:
-                    best_match = self.find_best_match(country, countries_in_data)
+    @staticmethod
+    def _filter_prompt(profile_data: Dict[str, Any], budget_usd: float, facets, sections: AssembledPrompt) -> str:
+        return f"""You are an expert at matching student preferences to course data.
+
+        STUDENT PROFILE:
+        - Countries Wanted: {', '.join(profile_data.get('countries', []))}
+        - Target Degree: {profile_data.get('degree', '')}
+        - Field Interests: {', '.join(profile_data.get('fields', []))}
+        - Preferred Intakes: {', '.join(profile_data.get('intakes', []))}
+        - Completed Degree: {profile_data.get('completedDegree', '')}
+        - CGPA: {profile_data.get('cgpa', 0)}/10
+        - Budget: {profile_data.get('budget', [0])[0]} Lakhs {settings.STUDENT_BUDGET_CURRENCY}/year (approximately ${budget_usd})
+
+        ACTUAL COURSE DATA:
+        Available Countries: {sections.text('countries')}
+        Available Levels: {sections.text('levels')}
+        Available Durations: {sections.text('durations')}
+        Available Intakes: {sections.text('intakes')}
+        Price Range: ${facets.min_price} - ${facets.max_price} USD per year (median ${facets.price_stats['p50'] or 'n/a'})
+        Sample Course Titles: {sections.text('titles')}
+
+        INSTRUCTIONS:
+
+        1. **countries**: Return array of countries from student preferences that BEST MATCH available countries
+        - Use fuzzy matching if exact match not found
+        - Example: Student wants "USA" → return ["United States"] if that's in data
+        - MUST be array, not string
+        - If no matches, return empty array
+
+        2. **level**: Map student's degree to BEST MATCH in available levels
+        - "Postgraduate" → "Master" or "Masters"
+        - "Undergraduate" → "Bachelor" or "Bachelors"
+        - Use exact match if available, otherwise use closest match
+
+        3. **course**: Generate 2-3 relevant keywords from field interests AS A SINGLE STRING
+        - For "IT & Computer Science": return "Computer IT Software" (NOT an array)
+        - For "Business & Management": return "Business Management MBA" (NOT an array)
+        - These will be used for partial matching in course titles
+
+        4. **duration**: Select a duration that's within the reasonable range for the degree
+        - For Undergraduate: look for durations between 3-4 years
+        - For Postgraduate: look for durations between 1-2 years
+        - Return just the number with "Years" (e.g., "3 Years", "1.5 Years")
+
+        5. **intakes**: Return array of student's preferred intakes that BEST MATCH available intakes
+        - Be more flexible with matching - "Fall 2026" could match "Fall 2026", "September 2026", or just "Fall"
+        - If no exact matches, try to match just the season (Fall, Spring, etc.)
+        - MUST be array
+
+        6. **maxBudgetUSD**: Use the calculated budget (${budget_usd})
+        - Increase by 20% if needed based on price range in data to provide more options
+        - Round to nearest 1000
+
+        7. **searchQuery**: Combine 2-3 most relevant keywords from field interests
+        - For "IT & Computer Science": "Computer Science"
+        - For "Artificial Intelligence": "AI Machine Learning"
+        - For "Business & Management": "Business Management"
+
+        IMPORTANT: Be flexible with matching to ensure results are found. If a filter is too restrictive and would return 0 results, relax it slightly.
+
+        RETURN ONLY THIS JSON (no markdown):
+        {{
+        "countries": ["array of country names"],
+        "level": "exact level from available levels",
+        "course": "single string with space-separated keywords",
+        "duration": "duration in years (e.g., '3 Years')",
+        "intakes": ["array of intake names"],
+        "maxBudgetUSD": {budget_usd * 1.2},
+        "searchQuery": "2-3 relevant search terms"
+        }}"""
+
+    def _finalize_filter_response(self, response, profile_data: Dict[str, Any], context: Dict[str, Any]) -> Dict[
+        str, Any]:
+        """
+        Parse the OpenAI response, validate it against the facet vocabulary and cache the result
+        """
+        countries_matcher = context['matchers']['countries']
+        levels_matcher = context['matchers']['levels']
+        durations_matcher = context['matchers']['durations']
+        intakes_matcher = context['matchers']['intakes']
+        min_price = context['min_price']
+        max_price = context['max_price']
+        budget_usd = context['budget_usd']
+
+        response_text = response.choices[0].message.content.strip()
+        logger.info(f"OpenAI response: {response_text}")
+
+        filters = json.loads(response_text)
+        logger.info(f"Parsed filters: {filters}")
+
+        # Post-processing and validation
+        # Ensure countries is an array
+        if isinstance(filters.get('countries'), str):
+            filters['countries'] = [filters['countries']] if filters['countries'] else []
+
+        # Ensure intakes is an array
+        if isinstance(filters.get('intakes'), str):
+            filters['intakes'] = [filters['intakes']] if filters['intakes'] else []
+
+        # Validate and improve country matching
+        if filters.get('countries'):
+            validated_countries = []
+            for country in filters['countries']:
+                best_match = countries_matcher.best(country)
+                if best_match:
+                    validated_countries.append(best_match)
+
+            # If no valid countries found, try with original preferences
+            if not validated_countries and profile_data.get('countries'):
+                for country in profile_data['countries']:
+                    best_match = countries_matcher.best(country)
                     if best_match:
                         validated_countries.append(best_match)
 
-                # If no valid countries found, try with original preferences
-                if not validated_countries and profile_data.get('countries'):
-                    for country in profile_data['countries']:
-                        best_match = self.find_best_match(country, countries_in_data)
-                        if best_match:
-                            validated_countries.append(best_match)
-
-                filters['countries'] = validated_countries
-
-            # Validate and improve level matching using the new mapping function
-            if filters.get('level'):
-                mapped_level = self.map_ai_to_data_level(filters['level'], levels_in_data)
-                if mapped_level != filters['level']:
-                    logger.info(f"Level mapped: {filters['level']} -> {mapped_level}")
-                    filters['level'] = mapped_level
-
-            # Validate and improve duration matching using the new mapping function
-            if filters.get('duration'):
-                mapped_duration = self.map_ai_to_data_duration(filters['duration'], durations_in_data)
-                if mapped_duration != filters['duration']:
-                    logger.info(f"Duration mapped: {filters['duration']} -> {mapped_duration}")
-                    filters['duration'] = mapped_duration
-
-            # Validate and improve intake matching
-            if filters.get('intakes'):
-                validated_intakes = []
-                for intake in filters['intakes']:
-                    best_match = self.find_best_match(intake, intakes_in_data)
+            filters['countries'] = validated_countries
+
+        # Validate and improve level matching using the new mapping function
+        if filters.get('level'):
+            mapped_level = self.map_ai_to_data_level(filters['level'], levels_matcher)
+            if mapped_level != filters['level']:
+                logger.info(f"Level mapped: {filters['level']} -> {mapped_level}")
+                filters['level'] = mapped_level
+
+        # Validate and improve duration matching using the new mapping function
+        if filters.get('duration'):
+            mapped_duration = self.map_ai_to_data_duration(filters['duration'], durations_matcher)
+            if mapped_duration != filters['duration']:
+                logger.info(f"Duration mapped: {filters['duration']} -> {mapped_duration}")
+                filters['duration'] = mapped_duration
+
+        # Validate and improve intake matching
+        if filters.get('intakes'):
+            validated_intakes = []
+            for intake in filters['intakes']:
+                best_match = intakes_matcher.best(intake)
+                if best_match:
+                    validated_intakes.append(best_match)
+
+            # If no valid intakes found, try with original preferences
+            if not validated_intakes and profile_data.get('intakes'):
+                for intake in profile_data['intakes']:
+                    best_match = intakes_matcher.best(intake)
                     if best_match:
                         validated_intakes.append(best_match)
 
-                # If no valid intakes found, try with original preferences
-                if not validated_intakes and profile_data.get('intakes'):
-                    for intake in profile_data['intakes']:
-                        best_match = self.find_best_match(intake, intakes_in_data)
-                        if best_match:
-                            validated_intakes.append(best_match)
-
-                filters['intakes'] = validated_intakes
-
-            # Ensure maxBudgetUSD is reasonable with increased flexibility
-            if filters.get('maxBudgetUSD'):
-                try:
-                    budget = float(filters['maxBudgetUSD'])
-                    # Adjust budget if it's outside the price range
-                    if budget < min_price:
-                        filters['maxBudgetUSD'] = min_price * 1.5  # 50% above minimum for more options
-                    elif budget > max_price:
-                        filters['maxBudgetUSD'] = max_price * 1.2  # 20% above maximum if needed
-                except (ValueError, TypeError):
-                    filters['maxBudgetUSD'] = budget_usd * 1.2  # Default to 20% above calculated
-
-            logger.info(f"Final filters after validation: {filters}")
-
-            return {
-                'success': True,
-                'filters': filters
-            }
+            filters['intakes'] = validated_intakes
 
-        except Exception as e:
-            logger.error(f"Error in AI service: {str(e)}")
-            import traceback
-            logger.error(traceback.format_exc())
+        # Ensure maxBudgetUSD is reasonable with increased flexibility
+        if filters.get('maxBudgetUSD'):
+            try:
+                budget = float(filters['maxBudgetUSD'])
+                # Adjust budget if it's outside the price range
+                if budget < min_price:
+                    filters['maxBudgetUSD'] = min_price * 1.5  # 50% above minimum for more options
+                elif budget > max_price:
+                    filters['maxBudgetUSD'] = max_price * 1.2  # 20% above maximum if needed
+            except (ValueError, TypeError):
+                filters['maxBudgetUSD'] = budget_usd * 1.2  # Default to 20% above calculated
 
-            # Fallback to basic filters if AI fails
-            return self._fallback_filters(profile_data, course_sample)
+        logger.info(f"Final filters after validation: {filters}")
+
+        result = {
+            'success': True,
+            'filters': filters,
+            'source': 'llm'
+        }
+        context['result_cache'].set(context['cache_key'], result)
+
+        return result
 
     def _fallback_filters(self, profile_data: Dict[str, Any], course_sample: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
@@ -378,60 +496,34 @@ class CourseFilterAI:
         """
         logger.info("Using fallback filter generation")
 
-        # Extract unique values from course sample
-        countries_in_data = list(set([
-            c.get('country_name', '').strip()
-            for c in course_sample
-            if c.get('country_name')
-        ]))
-
-        levels_in_data = list(set([
-            c.get('level', '').strip()
-            for c in course_sample
-            if c.get('level')
-        ]))
-
-        intakes_in_data = list(set([
-            c.get('intake', '').strip()
-            for c in course_sample
-            if c.get('intake')
-        ]))
-
-        # Enhanced basic mappings
-        student_degree = profile_data.get('degree', '')
-        level = ""
-
-        if student_degree == "Postgraduate":
-            # Look for Master or Masters
-            for l in levels_in_data:
-                if "master" in l.lower():
-                    level = l
-                    break
-        elif student_degree == "Undergraduate":
-            # Look for Bachelor or Bachelors
-            for l in levels_in_data:
-                if "bachelor" in l.lower():
-                    level = l
-                    break
+        # Reuse the single-pass facet summary (usually already cached by the AI path)
+        facets = get_facet_summary(course_sample)
+        levels_in_data = facets.values('levels')
+
+        # Course levels are canonical since ingest, so the student's degree maps straight onto them
+        level = canonical_level(profile_data.get('degree', ''))
+        if level not in levels_in_data:
+            level = ""
 
         # Country matching
+        countries_matcher = facets.matchers['countries']
         countries = []
         for country in profile_data.get('countries', []):
-            match = self.find_best_match(country, countries_in_data)
+            match = countries_matcher.best(country)
             if match:
                 countries.append(match)
 
         # Intake matching
+        intakes_matcher = facets.matchers['intakes']
         intakes = []
         for intake in profile_data.get('intakes', []):
-            match = self.find_best_match(intake, intakes_in_data)
+            match = intakes_matcher.best(intake)
             if match:
                 intakes.append(match)
 
         # Budget conversion with more flexibility
-        budget_inr = profile_data.get('budget', [20])[0] * 100000
-        budget_usd = round(budget_inr / 83, -3)
-        budget_usd = budget_usd * 1.3  # Add 30% flexibility
+        budget_usd = self.budget_to_usd(profile_data.get('budget', [20])[0])
+        budget_usd = round(budget_usd, -3) * 1.3 if budget_usd is not None else None  # Add 30% flexibility
 
         # Field keywords
         fields = profile_data.get('fields', [])
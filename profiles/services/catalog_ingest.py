@@ -0,0 +1,471 @@
+# profiles/services/catalog_ingest.py
+
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from decimal import Decimal
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router, transaction
+
+from ..models import CatalogImportChunk, Country, Course, CourseCatalogVersion, University
+from .catalog_normalize import canonical_country, normalize_name, parse_fee
+from .fx import FxTable, fx_table, to_decimals
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('csv', 'ndjson', 'json')
+
+# Column names partners use -> Course field
+FIELD_ALIASES = {
+    'course_id': ('course_id', 'id', 'courseid', 'programme_id', 'program_id'),
+    'course_title': ('course_title', 'title', 'course_name', 'course', 'programme', 'program'),
+    'university_name': ('university_name', 'university', 'institution'),
+    'country_name': ('country_name', 'country'),
+    'location': ('location', 'city', 'university_location'),
+    'level_name': ('level', 'level_name', 'degree_level', 'study_level'),
+    'duration': ('duration', 'course_duration'),
+    'intake': ('intake', 'intakes', 'start_date'),
+    'tuition_fees': ('tuition_fees', 'tuition_fee', 'annual_fee', 'fees', 'fee', 'tuition'),
+    'currency': ('currency', 'fee_currency'),
+    'annual_fee_usd': ('annual_fee_usd', 'fee_usd'),
+}
+
+REQUIRED_FIELDS = ('course_id', 'course_title', 'university_name', 'country_name')
+
+# Course columns an upsert overwrites (everything but the key, id and created_at)
+UPSERT_FIELDS = ['course_title', 'university', 'country', 'level_name', 'duration', 'intake', 'tuition_fees',
+                 'currency', 'level', 'duration_months', 'intake_season', 'intake_year', 'annual_fee_usd',
+                 'title_search', 'updated_at']
+
+MAX_REPORTED_ERRORS = 20
+CENTS = Decimal('0.01')
+JSON_CHUNK_SIZE = 1 << 16
+JSON_COURSES_KEY = re.compile(r'"courses"\s*:\s*\[')
+# 'Course ID', 'course-id' -> 'course_id'
+HEADER_SEPARATORS = re.compile(r'[\s\-]+')
+
+
+class IngestError(ValueError):
+    pass
+
+
+class RecordError(ValueError):
+    pass
+
+
+@dataclass
+class IngestResult:
+    rows_read: int = 0
+    upserted: int = 0
+    rejected: int = 0
+    unconverted_fees: int = 0
+    countries_created: int = 0
+    universities_created: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+    rows_per_sec: float = 0.0
+    version: Optional[int] = None
+    errors: List[str] = field(default_factory=list)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+# ── Streaming readers ──────────────────────────────────────────────────────
+
+def detect_format(name: str) -> str:
+    name = name.lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    for suffix, fmt in (('.csv', 'csv'), ('.ndjson', 'ndjson'), ('.jsonl', 'ndjson'), ('.json', 'json')):
+        if name.endswith(suffix):
+            return fmt
+    raise IngestError(f"Cannot tell the format of {name!r}; pass one of: {', '.join(FORMATS)}")
+
+
+def open_text(stream: IO[bytes], name: str = '') -> IO[str]:
+    """Text view of a binary upload or file, transparently gunzipped"""
+    if name.lower().endswith('.gz'):
+        stream = gzip.GzipFile(fileobj=stream, mode='rb')
+    return io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+
+def iter_csv(text: IO[str]) -> Iterator[Dict[str, Any]]:
+    yield from csv.DictReader(text)
+
+
+def iter_ndjson(text: IO[str]) -> Iterator[Dict[str, Any]]:
+    for number, line in enumerate(text, start=1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                raise IngestError(f"Line {number} is not valid JSON: {e}")
+
+
+def iter_json_array(text: IO[str], chunk_size: int = JSON_CHUNK_SIZE) -> Iterator[Any]:
+    """
+    Elements of a JSON array of course objects (or of the "courses" array of a
+    top-level object) decoded one at a time, holding only about a chunk in memory
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, eof = '', 0, False
+
+    def fill():
+        nonlocal buffer, position, eof
+        chunk = text.read(chunk_size)
+        eof = not chunk
+        buffer, position = buffer[position:] + chunk, 0
+
+    while True:
+        fill()
+        stripped = buffer.lstrip()
+        if stripped.startswith('['):
+            position = buffer.index('[') + 1
+            break
+        match = JSON_COURSES_KEY.search(buffer)
+        if match:
+            position = match.end()
+            break
+        if eof:
+            raise IngestError('JSON catalog must be an array of courses or an object with a "courses" array')
+        if stripped and not stripped.startswith('{'):
+            raise IngestError('JSON catalog must be an array of courses or an object with a "courses" array')
+        # Keep a tail in case the key straddles two chunks
+        position = max(0, len(buffer) - 64)
+
+    while True:
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position < len(buffer) or eof:
+                break
+            fill()
+        if position >= len(buffer):
+            raise IngestError('JSON catalog ended before its courses array was closed')
+        if buffer[position] == ']':
+            return
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as e:
+            if eof:
+                raise IngestError(f"Invalid JSON in catalog: {e}")
+            fill()
+            continue
+        if end == len(buffer) and not eof:
+            # A number or literal may continue in the next chunk
+            fill()
+            continue
+        yield value
+        position = end
+        if position > chunk_size:
+            buffer, position = buffer[position:], 0
+
+
+READERS = {
+    'csv': iter_csv,
+    'ndjson': iter_ndjson,
+    'json': iter_json_array,
+}
+
+
+# ── Normalization ──────────────────────────────────────────────────────────
+
+class CourseRecordNormalizer:
+    """
+    Turns one partner record into Course field values: aliases resolved, fees
+    parsed. Fees are put in USD a batch at a time by convert_fees(); level,
+    duration and intake are normalized by Course.normalize() once the row is built.
+    """
+
+    @staticmethod
+    def _pick(record: Dict[str, Any], field_name: str) -> Any:
+        for alias in FIELD_ALIASES[field_name]:
+            value = record.get(alias)
+            if value not in (None, ''):
+                return value
+        return None
+
+    def normalize(self, record: Any) -> Dict[str, Any]:
+        """Field values of one record; raises RecordError"""
+        if not isinstance(record, dict):
+            raise RecordError("record is not an object")
+        record = {HEADER_SEPARATORS.sub('_', str(key).strip().lower()): value
+                  for key, value in record.items() if key is not None}
+
+        values = {name: self._pick(record, name) for name in FIELD_ALIASES}
+        missing = [name for name in REQUIRED_FIELDS if values[name] in (None, '')]
+        if missing:
+            raise RecordError(f"missing {', '.join(missing)}")
+
+        for name in ('course_id', 'course_title', 'university_name', 'country_name', 'location',
+                     'level_name', 'duration', 'intake'):
+            value = values[name]
+            if isinstance(value, list):
+                # JSON catalogs may list several intakes; the first one is indexed
+                value = ', '.join(str(item) for item in value)
+            values[name] = str(value or '').strip()
+        values['country_name'] = canonical_country(values['country_name'])
+
+        tuition, currency = parse_fee(values['tuition_fees'], values['currency'] or '')
+        values['tuition_fees'] = tuition.quantize(CENTS) if tuition is not None else None
+        values['currency'] = currency[:3]
+
+        fee_usd, _ = parse_fee(values['annual_fee_usd'], 'USD')
+        values['annual_fee_usd'] = fee_usd.quantize(CENTS) if fee_usd is not None else None
+        return values
+
+
+def convert_fees(records: List[Dict[str, Any]], table: FxTable) -> int:
+    """
+    Fill annual_fee_usd of a batch from tuition_fees + currency with one
+    vectorized conversion; partner-supplied USD fees are kept. Returns how many
+    fees are left without a USD value for want of a rate.
+    """
+    pending = [r for r in records if r['annual_fee_usd'] is None and r['tuition_fees'] is not None]
+    if pending:
+        fees = to_decimals(table.to_usd([r['tuition_fees'] for r in pending], [r['currency'] for r in pending]))
+        for record, fee in zip(pending, fees):
+            record['annual_fee_usd'] = fee
+    return sum(1 for r in pending if r['annual_fee_usd'] is None)
+
+
+# ── Writing ────────────────────────────────────────────────────────────────
+
+class CatalogWriter:
+    """
+    Upserts normalized records in batches: countries and universities are
+    created on first sight (ids remembered for the rest of the run), then the
+    batch's courses go in as one INSERT ... ON CONFLICT (course_id) DO UPDATE.
+    """
+
+    def __init__(self, result: IngestResult):
+        self.result = result
+        self.using = router.db_for_write(Course)
+        features = connections[self.using].features
+        # MySQL can't name the conflict target; course_id is the only unique key besides the pk
+        self.unique_fields = ['course_id'] if features.supports_update_conflicts_with_target else None
+        self.country_ids: Dict[str, uuid.UUID] = {}
+        self.university_ids: Dict[Tuple[uuid.UUID, str], uuid.UUID] = {}
+
+    def _country_ids(self, names: Dict[str, str]):
+        missing = {key: name for key, name in names.items() if key not in self.country_ids}
+        if not missing:
+            return
+        existing = dict(Country.objects.using(self.using).filter(name_normalized__in=missing)
+                        .values_list('name_normalized', 'id'))
+        new = [Country(name=name, name_normalized=key) for key, name in missing.items() if key not in existing]
+        if new:
+            Country.objects.using(self.using).bulk_create(new, ignore_conflicts=True)
+            self.result.countries_created += len(new)
+            existing.update(Country.objects.using(self.using).filter(name_normalized__in=[c.name_normalized for c in new])
+                            .values_list('name_normalized', 'id'))
+        self.country_ids.update(existing)
+
+    def _university_ids(self, universities: Dict[Tuple[uuid.UUID, str], Tuple[str, str]]):
+        missing = {key: value for key, value in universities.items() if key not in self.university_ids}
+        if not missing:
+            return
+        lookup = University.objects.using(self.using).filter(
+            country_id__in={country_id for country_id, _ in missing},
+            name_normalized__in={name for _, name in missing},
+        )
+        found = {(country_id, name): pk for pk, country_id, name in lookup.values_list('id', 'country_id', 'name_normalized')}
+        new = [University(name=name, name_normalized=key[1], country_id=key[0], location=location)
+               for key, (name, location) in missing.items() if key not in found]
+        if new:
+            University.objects.using(self.using).bulk_create(new, ignore_conflicts=True)
+            self.result.universities_created += len(new)
+            found.update({(country_id, name): pk for pk, country_id, name in lookup.values_list(
+                'id', 'country_id', 'name_normalized')})
+        self.university_ids.update({key: pk for key, pk in found.items() if key in missing})
+
+    def write(self, records: List[Dict[str, Any]]):
+        # A course repeated within one batch would hit the same row twice in one statement
+        records = list({record['course_id']: record for record in records}.values())
+
+        with transaction.atomic(using=self.using):
+            self._country_ids({normalize_name(r['country_name']): r['country_name'] for r in records})
+            universities = {}
+            for record in records:
+                record['country_id'] = self.country_ids[normalize_name(record['country_name'])]
+                key = (record['country_id'], normalize_name(record['university_name']))
+                universities.setdefault(key, (record['university_name'], record['location']))
+                record['university_key'] = key
+            self._university_ids(universities)
+
+            courses = []
+            for record in records:
+                course = Course(
+                    course_id=record['course_id'][:64],
+                    course_title=record['course_title'][:255],
+                    university_id=self.university_ids[record['university_key']],
+                    country_id=record['country_id'],
+                    level_name=record['level_name'][:100],
+                    duration=record['duration'][:50],
+                    intake=record['intake'][:100],
+                    tuition_fees=record['tuition_fees'],
+                    currency=record['currency'],
+                    annual_fee_usd=record['annual_fee_usd'],
+                )
+                course.normalize()
+                courses.append(course)
+
+            Course.objects.using(self.using).bulk_create(
+                courses,
+                update_conflicts=True,
+                unique_fields=self.unique_fields,
+                update_fields=UPSERT_FIELDS,
+            )
+        self.result.upserted += len(courses)
+        self.result.batches += 1
+
+
+def ingest_catalog(stream: IO[bytes], fmt: Optional[str] = None, name: str = '', batch_size: Optional[int] = None,
+                   dry_run: bool = False, log: Callable[[str], None] = logger.info) -> IngestResult:
+    """
+    Stream a partner catalog (CSV, NDJSON or a JSON array; optionally .gz) into
+    the Course tables. Records are parsed one at a time and upserted in batches
+    of batch_size, so memory stays flat whatever the file size. Invalid records
+    are counted and skipped. A non-dry run ends by bumping the course catalog
+    version, which retires every cache derived from the previous one.
+    """
+    fmt = fmt or detect_format(name)
+    if fmt not in READERS:
+        raise IngestError(f"Unknown format {fmt!r}; expected one of: {', '.join(FORMATS)}")
+    batch_size = batch_size or settings.CATALOG_INGEST_BATCH_SIZE
+
+    result = IngestResult()
+    normalizer = CourseRecordNormalizer()
+    table = fx_table()
+    writer = None if dry_run else CatalogWriter(result)
+    started = time.monotonic()
+    batch = []
+
+    def flush():
+        result.unconverted_fees += convert_fees(batch, table)
+        if writer is not None and batch:
+            writer.write(batch)
+            elapsed = time.monotonic() - started
+            log(f"Upserted {result.upserted} courses ({result.rows_read / elapsed:.0f} rows/s)")
+        batch.clear()
+
+    for record in READERS[fmt](open_text(stream, name)):
+        result.rows_read += 1
+        try:
+            values = normalizer.normalize(record)
+        except RecordError as e:
+            result.rejected += 1
+            if len(result.errors) < MAX_REPORTED_ERRORS:
+                result.errors.append(f"record {result.rows_read}: {e}")
+            continue
+        batch.append(values)
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    result.seconds = round(time.monotonic() - started, 2)
+    result.rows_per_sec = round(result.rows_read / result.seconds) if result.seconds else float(result.rows_read)
+    if writer is not None and result.upserted:
+        result.version = CourseCatalogVersion.bump(note=f"ingest {name or fmt}: {result.upserted} courses").version
+    return result
+
+
+# ── Import jobs (admin upload endpoint) ────────────────────────────────────
+
+def _job_key(job_id: str) -> str:
+    return f"catalog_import:{job_id}"
+
+
+def create_import_job(name: str) -> str:
+    job_id = uuid.uuid4().hex
+    cache.set(_job_key(job_id), {'status': 'queued', 'file': name, 'result': None, 'error': None},
+              settings.CATALOG_IMPORT_STATUS_TTL)
+    return job_id
+
+
+def update_import_job(job_id: str, status: str, **fields):
+    record = cache.get(_job_key(job_id)) or {}
+    record.update(fields, status=status)
+    cache.set(_job_key(job_id), record, settings.CATALOG_IMPORT_STATUS_TTL)
+
+
+def get_import_job(job_id: str) -> Optional[Dict[str, Any]]:
+    return cache.get(_job_key(job_id))
+
+
+class SpooledUpload(io.RawIOBase):
+    """Binary stream over a spooled upload's CatalogImportChunk rows, one chunk in memory at a time"""
+
+    def __init__(self, job_id: str):
+        super().__init__()
+        self.job_id = job_id
+        self.seq = 0
+        self.chunk = b''
+        self.offset = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while self.offset >= len(self.chunk):
+            data = (CatalogImportChunk.objects.filter(job_id=self.job_id, seq=self.seq)
+                    .values_list('data', flat=True).first())
+            if data is None:
+                return 0
+            self.chunk, self.offset, self.seq = bytes(data), 0, self.seq + 1
+        size = min(len(buffer), len(self.chunk) - self.offset)
+        buffer[:size] = self.chunk[self.offset:self.offset + size]
+        self.offset += size
+        return size
+
+
+def spool_upload(job_id: str, upload) -> int:
+    """Store an upload as CATALOG_IMPORT_CHUNK_BYTES rows; returns its size"""
+    size = 0
+    for seq, data in enumerate(upload.chunks(settings.CATALOG_IMPORT_CHUNK_BYTES)):
+        CatalogImportChunk.objects.create(job_id=job_id, seq=seq, data=data)
+        size += len(data)
+    return size
+
+
+def open_spooled_upload(job_id: str) -> IO[bytes]:
+    return io.BufferedReader(SpooledUpload(job_id))
+
+
+def discard_spooled_upload(job_id: str):
+    CatalogImportChunk.objects.filter(job_id=job_id).delete()
+
+
+def enqueue_catalog_import(upload, fmt: Optional[str] = None) -> str:
+    """
+    Spool an uploaded catalog to the database (see CatalogImportChunk) and hand
+    it to the catalog worker; returns the job id. Raises IngestError if the
+    format is unknown.
+    """
+    from ..tasks import ingest_catalog_task
+
+    name = os.path.basename(upload.name or 'catalog')
+    fmt = fmt or detect_format(name)
+    if fmt not in READERS:
+        raise IngestError(f"Unknown format {fmt!r}; expected one of: {', '.join(FORMATS)}")
+
+    job_id = create_import_job(name)
+    spool_upload(job_id, upload)
+    try:
+        ingest_catalog_task.apply_async(args=(job_id, fmt, name), queue=settings.CATALOG_IMPORT_QUEUE)
+    except Exception as e:
+        logger.error(f"Failed to enqueue catalog import {job_id} ({name}): {e}")
+        update_import_job(job_id, 'failed', error='Could not queue the import')
+        discard_spooled_upload(job_id)
+    return job_id
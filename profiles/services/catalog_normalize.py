@@ -0,0 +1,169 @@
+# profiles/services/catalog_normalize.py
+
+import re
+from decimal import Decimal, InvalidOperation
+from typing import Optional, Tuple
+
+from .filter_compiler import parse_duration_months
+from .matching import DEFAULT_ALIASES, normalize_text, tokenize
+
+# Canonical study level -> the spellings courses and students use for it
+LEVEL_MAPPINGS = {
+    "Undergraduate": ["Bachelor", "Bachelors", "Undergraduate", "UG"],
+    "Postgraduate": ["Master", "Masters", "Postgraduate", "PG", "Graduate"],
+    "Doctorate": ["PhD", "Doctorate", "Doctoral", "Doctor of Philosophy"],
+    "Diploma": ["Diploma", "Certificate", "Certification"]
+}
+
+# Degree abbreviations seen in partner catalogs ("MSc Data Science", "B.Tech")
+LEVEL_ABBREVIATIONS = {
+    "Undergraduate": ["ba", "bs", "bsc", "beng", "btech", "bba", "bcom", "bachelor"],
+    "Postgraduate": ["ma", "ms", "msc", "meng", "mtech", "mba", "mres", "llm", "pgdip", "master"],
+    "Doctorate": ["phd", "dphil", "edd", "doctor"],
+    "Diploma": ["diploma", "certificate", "cert"],
+}
+
+LEVEL_CHOICES = [(level, level) for level in LEVEL_MAPPINGS]
+
+SEASONS = ('spring', 'summer', 'fall', 'winter')
+SEASON_CHOICES = [(season, season.title()) for season in SEASONS]
+
+# Season an intake starting in each month is advertised as
+SEASON_MONTHS = {
+    'spring': ('january', 'february', 'march', 'april'),
+    'summer': ('may', 'june', 'july'),
+    'fall': ('august', 'september', 'october'),
+    'winter': ('november', 'december'),
+}
+
+# Full month names and their usual abbreviations ('jan', 'sept')
+MONTH_SEASONS = {
+    month[:length]: season
+    for season, months in SEASON_MONTHS.items() for month in months for length in (3, len(month))
+}
+MONTH_SEASONS['sept'] = 'fall'
+
+SEASON_ALIASES = {'autumn': 'fall'}
+
+YEAR_PATTERN = re.compile(r'\b(20\d{2})\b')
+AMOUNT_PATTERN = re.compile(r'\d[\d,.]*')
+
+# Currency symbols partners put in fee strings when they leave the currency column empty
+CURRENCY_SYMBOLS = {'$': 'USD', '£': 'GBP', '€': 'EUR', '₹': 'INR', '¥': 'JPY'}
+CURRENCY_CODE_PATTERN = re.compile(r'\b([A-Z]{3})\b')
+WORD_PATTERN = re.compile(r'[a-z]+')
+
+_LEVEL_LOOKUP = {normalize_text(s): level for level, synonyms in LEVEL_MAPPINGS.items() for s in synonyms + [level]}
+
+
+def normalize_name(value: str) -> str:
+    """Comparison key for country and university names"""
+    return normalize_text(value)
+
+
+def country_candidates(value: str) -> list:
+    """Normalized names a student's country may refer to ("USA" -> united states, ...)"""
+    normalized = normalize_name(value)
+    return [normalized] + [normalize_name(target) for target in DEFAULT_ALIASES.get(normalized, ())]
+
+
+def canonical_country(value: str) -> str:
+    """Catalog spelling of a country name: 'UK' -> 'United Kingdom'; other names unchanged"""
+    value = (value or '').strip()
+    targets = DEFAULT_ALIASES.get(normalize_name(value))
+    return targets[0] if targets else value
+
+
+def canonical_level(value: str) -> str:
+    """Map 'Masters', 'PG', 'MSc Computing' or 'Postgraduate' to a LEVEL_MAPPINGS key, or ''"""
+    normalized = normalize_text(value)
+    if not normalized:
+        return ""
+    if normalized in _LEVEL_LOOKUP:
+        return _LEVEL_LOOKUP[normalized]
+
+    words = normalized.replace('.', '').split()
+    for level, abbreviations in LEVEL_ABBREVIATIONS.items():
+        for word in words:
+            if word in abbreviations or any(word.startswith(a) for a in abbreviations if len(a) > 4):
+                return level
+    return ""
+
+
+def duration_months(value: str) -> Optional[int]:
+    months = parse_duration_months(value)
+    return int(round(months)) if months else None
+
+
+def duration_label(months: int) -> str:
+    """Canonical duration string: 12 -> '1 Year', 24 -> '2 Years', 18 -> '1.5 Years', 9 -> '9 Months'"""
+    if months < 12 or months % 6:
+        return f"{months} Month{'s' if months != 1 else ''}"
+    years = months / 12
+    return f"{years:g} Year{'s' if years != 1 else ''}"
+
+
+def intake_label(season: str, year: Optional[int]) -> str:
+    """Canonical intake string: ('fall', 2026) -> 'Fall 2026'"""
+    return " ".join(part for part in (season.title(), str(year) if year else '') if part)
+
+
+def parse_fee(value, currency: str = '') -> Tuple[Optional[Decimal], str]:
+    """
+    Amount and ISO currency of a fee such as 42000, '42,000', '$42,000' or
+    '42000 GBP'; an explicit currency argument wins over symbols in the value
+    """
+    currency = (currency or '').strip().upper()
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        amount = Decimal(str(value))
+    else:
+        text = str(value or '').strip()
+        match = AMOUNT_PATTERN.search(text)
+        if not match:
+            return None, currency
+        amount = _parse_amount(match.group(0).rstrip('.,'))
+        if amount is None:
+            return None, currency
+        if not currency:
+            code = CURRENCY_CODE_PATTERN.search(text.upper())
+            symbol = next((s for s in CURRENCY_SYMBOLS if s in text), None)
+            currency = code.group(1) if code else CURRENCY_SYMBOLS.get(symbol, '')
+    if not amount.is_finite() or amount < 0:
+        return None, currency
+    return amount, currency
+
+
+def _parse_amount(text: str) -> Optional[Decimal]:
+    """'42,000' / '42,000.50' / '42.000,50' / '9500,5': the last separator followed by 1-2 digits is the decimal point"""
+    whole, separator, fraction = max(text.rpartition(','), text.rpartition('.'), key=lambda part: len(part[0]))
+    if not (separator and 1 <= len(fraction) <= 2):
+        whole, fraction = text, ''
+    digits = whole.replace(',', '').replace('.', '')
+    try:
+        return Decimal(f"{digits}.{fraction}" if fraction else digits)
+    except InvalidOperation:
+        return None
+
+
+def parse_intake(value: str) -> Tuple[str, Optional[int]]:
+    """Split an intake such as 'Fall 2026', 'September 2026' or 'Jan' into (season, year)"""
+    text = (value or '').casefold()
+    year_match = YEAR_PATTERN.search(text)
+    year = int(year_match.group(1)) if year_match else None
+
+    for word in WORD_PATTERN.findall(text):
+        word = SEASON_ALIASES.get(word, word)
+        if word in SEASONS:
+            return word, year
+        if word in MONTH_SEASONS:
+            return MONTH_SEASONS[word], year
+    return "", year
+
+
+def title_search_text(title: str) -> str:
+    """
+    Space-padded token string of a course title, so keyword filters can match
+    whole words (' it ') or word prefixes (' comput') with a plain LIKE
+    """
+    tokens = tokenize(title)
+    return f" {' '.join(tokens)} " if tokens else ""
@@ -0,0 +1,257 @@
+# profiles/services/catalog_retrieval.py
+
+import logging
+import math
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from .matching import DEFAULT_ALIASES, normalize_text, tokenize
+from .prompt_budget import count_tokens
+
+logger = logging.getLogger(__name__)
+
+SECTIONS = ('countries', 'universities', 'courses')
+
+# Row fields that are searched, per catalog section
+SEARCH_FIELDS = {
+    'countries': ('country_name',),
+    'universities': ('university_name', 'country_name', 'location'),
+    'courses': ('course_title', 'university_name', 'country_name', 'level', 'intake'),
+}
+
+# Weight of earlier user turns relative to the current message
+HISTORY_WEIGHT = 0.5
+HISTORY_TURNS = 2
+
+# Rows shown when the message matches nothing (e.g. "hi"), per section
+BROWSE_ROWS = {'countries': 10, 'universities': 5, 'courses': 5}
+
+ACTIVE_VERSION_CACHE_KEY = 'catalog_snapshot:active_version'
+
+
+# ── Row formatting (shared with the chatbot prompt) ────────────────────────
+
+def format_country(c: Dict[str, Any]) -> str:
+    name     = c.get('country_name', '')
+    avg_fee  = c.get('average_tuition_fees', '')
+    living   = c.get('annual_cost_of_living', '')
+    employ   = c.get('employability', '')
+    uni_cnt  = c.get('universities_count', '')
+    if not name:
+        return ''
+    return (
+        f"- {name}: avg tuition {avg_fee}, living cost {living}, "
+        f"employability {employ}, {uni_cnt} universities"
+    )
+
+
+def format_university(u: Dict[str, Any]) -> str:
+    name     = u.get('university_name', '')
+    country  = u.get('country_name', '')
+    location = u.get('location', '')
+    avg_fee  = u.get('average_tuition_fees', '')
+    employ   = u.get('employability', '')
+    rankings = u.get('rankings', {})
+    world_r  = rankings.get('world', '') if isinstance(rankings, dict) else ''
+    schol    = u.get('scholarships_available', '')
+    programs = u.get('programs_count', '')
+    if not name:
+        return ''
+    return (
+        f"- {name} ({country}, {location}): avg fee {avg_fee}, "
+        f"employability {employ}, world rank #{world_r}, "
+        f"{programs} programs, scholarships: {schol}"
+    )
+
+
+def format_course(c: Dict[str, Any]) -> str:
+    title    = c.get('course_title', '')
+    uni      = c.get('university_name', '')
+    country  = c.get('country_name', '')
+    level    = c.get('level', '')
+    duration = c.get('duration', '')
+    fee      = c.get('tuition_fees', '')
+    currency = c.get('currency', '')
+    intake   = c.get('intake', '')
+    ielts    = c.get('ielts_score', '')
+    if not title:
+        return ''
+    return (
+        f"- {title} | {uni}, {country} | {level} | {duration} | "
+        f"{currency} {fee} | Intake: {intake} | IELTS: {ielts}"
+    )
+
+
+ROW_FORMATTERS = {
+    'countries': format_country,
+    'universities': format_university,
+    'courses': format_course,
+}
+
+
+# ── Index ──────────────────────────────────────────────────────────────────
+
+def _alias_tokens(text: str) -> List[str]:
+    """Expand phrases students type ("uk", "pg") into the catalog's own vocabulary"""
+    normalized = normalize_text(text)
+    words = normalized.split()
+    expanded = []
+    for size in (1, 2):
+        for start in range(len(words) - size + 1):
+            phrase = " ".join(words[start:start + size]).strip('?,.!')
+            for target in DEFAULT_ALIASES.get(phrase, ()):
+                expanded.extend(tokenize(target))
+    return expanded
+
+
+class CatalogIndex:
+    """
+    TF-IDF index over one catalog snapshot.
+
+    Every country, university and course row is a document. Rows are ranked by
+    cosine similarity between the query and the row's searchable text, and the
+    best rows across all sections are packed into a token budget.
+    """
+
+    def __init__(self, version: int, rows: Dict[str, List[Dict[str, Any]]]):
+        self.version = version
+        # (section, row, prompt line, prompt tokens of the line)
+        self.documents: List[Tuple[str, Dict[str, Any], str, int]] = []
+        self._postings: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+        self._idf: Dict[str, float] = {}
+
+        term_counts = []
+        for section in SECTIONS:
+            formatter = ROW_FORMATTERS[section]
+            for row in rows.get(section) or []:
+                line = formatter(row)
+                if not line:
+                    continue
+                text = " ".join(str(row.get(f) or '') for f in SEARCH_FIELDS[section])
+                self.documents.append((section, row, line, count_tokens(line)))
+                term_counts.append(Counter(tokenize(text)))
+
+        total = len(term_counts) or 1
+        document_frequency = Counter(term for counts in term_counts for term in counts)
+        self._idf = {term: math.log((1 + total) / (1 + df)) + 1 for term, df in document_frequency.items()}
+
+        for position, counts in enumerate(term_counts):
+            weights = {term: (1 + math.log(tf)) * self._idf[term] for term, tf in counts.items()}
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            for term, weight in weights.items():
+                self._postings[term].append((position, weight / norm))
+
+    def __len__(self):
+        return len(self.documents)
+
+    def _query_weights(self, message: str, history: List[Dict[str, Any]]) -> Dict[str, float]:
+        weights: Dict[str, float] = defaultdict(float)
+
+        def add(text, factor):
+            for term in list(tokenize(text)) + _alias_tokens(text):
+                if term in self._idf:
+                    weights[term] += factor * self._idf[term]
+
+        add(message, 1.0)
+        user_turns = [m.get('content', '') for m in history if m.get('role', 'user') == 'user']
+        for text in user_turns[-HISTORY_TURNS:]:
+            add(text, HISTORY_WEIGHT)
+        return weights
+
+    def search(self, message: str, history: Optional[List[Dict[str, Any]]] = None) -> List[Tuple[float, int]]:
+        """All matching documents as (score, position), best first"""
+        scores: Dict[int, float] = defaultdict(float)
+        for term, query_weight in self._query_weights(message, history or []).items():
+            for position, doc_weight in self._postings[term]:
+                scores[position] += query_weight * doc_weight
+        return sorted(((score, position) for position, score in scores.items()), key=lambda item: (-item[0], item[1]))
+
+    def retrieve(self, message: str, history: Optional[List[Dict[str, Any]]] = None,
+                 token_budget: int = 1500) -> Dict[str, List[Dict[str, Any]]]:
+        """Most relevant rows per section whose formatted lines fit in `token_budget`"""
+        ranked = [position for _, position in self.search(message, history)]
+        if not ranked:
+            ranked = self._browse_positions()
+
+        selected: Dict[str, List[Dict[str, Any]]] = {section: [] for section in SECTIONS}
+        used = 0
+        for position in ranked:
+            section, row, _, cost = self.documents[position]
+            if used + cost > token_budget:
+                continue
+            selected[section].append(row)
+            used += cost
+        return selected
+
+    def _browse_positions(self) -> List[int]:
+        taken = Counter()
+        positions = []
+        for position, (section, _, _, _) in enumerate(self.documents):
+            if taken[section] < BROWSE_ROWS[section]:
+                taken[section] += 1
+                positions.append(position)
+        return positions
+
+
+# ── Snapshot lookup ────────────────────────────────────────────────────────
+
+class CatalogRetriever:
+    """Per-process holder of the active snapshot's index, rebuilt when the version changes"""
+
+    def __init__(self):
+        self._index: Optional[CatalogIndex] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def active_version() -> Optional[int]:
+        version = cache.get(ACTIVE_VERSION_CACHE_KEY)
+        if version is None:
+            from ..models import CatalogSnapshot
+            version = CatalogSnapshot.objects.order_by('-version').values_list('version', flat=True).first() or 0
+            cache.set(ACTIVE_VERSION_CACHE_KEY, version, settings.CATALOG_VERSION_CHECK_SECONDS)
+        return version or None
+
+    def get_index(self) -> Optional[CatalogIndex]:
+        version = self.active_version()
+        if version is None:
+            return None
+
+        index = self._index
+        if index is not None and index.version == version:
+            return index
+
+        with self._lock:
+            if self._index is None or self._index.version != version:
+                from ..models import CatalogSnapshot
+                snapshot = CatalogSnapshot.objects.filter(version=version).first()
+                if snapshot is None:
+                    return None
+                self._index = CatalogIndex(version, {
+                    'countries': snapshot.countries,
+                    'universities': snapshot.universities,
+                    'courses': snapshot.courses,
+                })
+                logger.info(f"Built catalog index v{version} with {len(self._index)} rows")
+            return self._index
+
+    def retrieve(self, message: str, history: List[Dict[str, Any]],
+                 token_budget: Optional[int] = None) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+        """Relevant catalog rows for a chat message, or None when no snapshot is loaded"""
+        index = self.get_index()
+        if index is None:
+            return None
+        if token_budget is None:
+            token_budget = settings.CHATBOT_CONTEXT_TOKEN_BUDGET
+        return index.retrieve(message, history, token_budget)
+
+    async def aretrieve(self, message: str, history: List[Dict[str, Any]],
+                        token_budget: Optional[int] = None) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+        return await sync_to_async(self.retrieve)(message, history, token_budget)
+
+
+catalog_retriever = CatalogRetriever()
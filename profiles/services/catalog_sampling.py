@@ -0,0 +1,76 @@
+# profiles/services/catalog_sampling.py
+
+import logging
+from collections import Counter
+from itertools import groupby
+from operator import itemgetter
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .course_index import CourseIndex, course_index, load_rows, select_courses
+
+logger = logging.getLogger(__name__)
+
+# Columns of CourseIndex.strata() a sample is balanced over
+STRATUM_FIELDS = ('country', 'level', 'band')
+
+
+def stratified_sample(size: int, filters: Optional[Dict[str, Any]] = None,
+                      index: Optional[CourseIndex] = None) -> List[Dict[str, Any]]:
+    """
+    Up to `size` course rows spread over countries, levels and price bands.
+
+    The in-memory course index hands over only the first ceil(size / strata)
+    rows of each (country, level, price band) stratum, so the work is bounded
+    by the sample size and the number of strata, not by the catalog. Those
+    candidates are then taken round by round, each pick favouring the country,
+    level and band seen least so far, so small samples still cover every facet.
+    """
+    index = index or course_index.get_index()
+    candidates = index.strata(index.filter_mask(filters or {}), size)
+    return load_rows(index, _interleave(candidates, size))
+
+
+def _interleave(candidates: Dict[str, Any], size: int) -> List[int]:
+    rows = [dict(zip(candidates, values)) for values in zip(*(column.tolist() for column in candidates.values()))]
+    seen = {field: Counter() for field in STRATUM_FIELDS}
+    picked = []
+    for _, group in groupby(rows, key=itemgetter('rank')):
+        group = list(group)
+        while group and len(picked) < size:
+            best = min(range(len(group)),
+                       key=lambda i: sum(seen[field][group[i][field]] for field in STRATUM_FIELDS))
+            row = group.pop(best)
+            for field in STRATUM_FIELDS:
+                seen[field][row[field]] += 1
+            picked.append(row['position'])
+    return picked
+
+
+def sample_courses(size: Optional[int] = None, query: str = '', filters: Optional[Dict[str, Any]] = None,
+                   budget_usd: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Representative course sample for the AI endpoints.
+
+    The whole-catalog sample is cached per version of the index it was drawn
+    from (which lags the catalog version while a rebuild runs). With a query
+    (keywords) and/or filters (process-filters JSON), the best matching courses
+    are picked from the in-memory index (keyword matches first, then fit under
+    budget_usd) and topped up from the whole-catalog sample, so the sample stays
+    relevant without ever coming back short.
+    """
+    size = size or settings.COURSE_SAMPLE_SIZE
+    query = (query or '').strip()
+    index = course_index.get_index()
+
+    general = cache.get_or_set(f"course_sample:v{index.version}:{size}",
+                               lambda: stratified_sample(size, index=index), settings.COURSE_SAMPLE_TTL)
+    if not query and not filters:
+        return general
+
+    relevant = select_courses(filters or {}, size, query=query, budget_usd=budget_usd, index=index)
+    taken = {course['course_id'] for course in relevant}
+    relevant.extend(course for course in general if course['course_id'] not in taken)
+    return relevant[:size]
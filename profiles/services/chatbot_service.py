@@ -0,0 +1,242 @@
+# profiles/services/chatbot_service.py
+
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, Iterator, List
+
+from django.conf import settings
+
+from .catalog_retrieval import catalog_retriever, format_country, format_course, format_university
+from .openai_client import client, get_async_client
+from .prompt_budget import TOKENS_PER_MESSAGE, TOKENS_PER_REPLY, PromptAssembler
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on earlier turns considered; the token budget usually decides first
+HISTORY_MAX_TURNS = 10
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> bytes:
+    """Encode one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode('utf-8')
+
+
+def _chunk_text(chunk) -> str:
+    if not chunk.choices:
+        return ""
+    return chunk.choices[0].delta.content or ""
+
+
+class ChatbotService:
+    """
+    Builds AIGLE chatbot prompts and runs them against OpenAI (sync or async)
+    """
+
+    suggest_keywords = [
+        'find course', 'recommend course', 'which course', 'suggest course',
+        'want to study', 'looking for', 'search for', 'help me find',
+        'show me course', 'best course', 'match my profile'
+    ]
+
+    def __init__(self):
+        self.model = "gpt-4o-mini"
+        self.temperature = 0.7
+        self.max_tokens = 300
+
+    def build_messages(self, message: str, context: Dict[str, Any], history: List[Dict[str, Any]]) -> List[
+        Dict[str, str]]:
+        countries    = context.get('countries', [])
+        universities = context.get('universities', [])
+        courses      = context.get('courses', [])
+        user_name    = context.get('userName', 'there')
+
+        # ── Fit catalog rows and history into the prompt token budget ──
+        #
+        # Catalog rows arrive most relevant first; history is offered newest first.
+        # Whatever does not fit is dropped from the end, catalog rows behind a
+        # "...and N more" line.
+
+        assembler = PromptAssembler(settings.CHATBOT_PROMPT_TOKEN_BUDGET, 'chatbot', self.model)
+        assembler.reserve(self._system_prompt('', '', '', user_name), tokens=TOKENS_PER_MESSAGE)
+        assembler.reserve(message, tokens=TOKENS_PER_MESSAGE + TOKENS_PER_REPLY)
+
+        assembler.add_section('countries', [format_country(c) for c in countries], priority=1,
+                              summarize=lambda n: f"- ...and {n} more countries")
+        assembler.add_section('universities', [format_university(u) for u in universities], priority=2,
+                              summarize=lambda n: f"- ...and {n} more universities")
+        assembler.add_section('courses', [format_course(c) for c in courses], priority=3,
+                              summarize=lambda n: f"- ...and {n} more courses")
+
+        turns = [(self._history_role(msg), msg.get('content', '')) for msg in history]
+        recent = turns[-HISTORY_MAX_TURNS:]
+        assembler.add_section('history', [content for _, content in reversed(recent)], priority=4,
+                              row_overhead=TOKENS_PER_MESSAGE)
+        assembled = assembler.assemble()
+
+        system_prompt = self._system_prompt(
+            assembled.text('countries', "No country data available"),
+            assembled.text('universities', "No university data available"),
+            assembled.text('courses', "No course data available"),
+            user_name,
+        )
+
+        # ── Build messages ─────────────────────────────────────────────
+
+        messages_list = [{"role": "system", "content": system_prompt}]
+
+        kept_turns = len(assembled.rows['history'])
+        for role, content in recent[len(recent) - kept_turns:]:
+            messages_list.append({"role": role, "content": content})
+
+        messages_list.append({"role": "user", "content": message})
+
+        assembler.record(messages_list, assembled)
+        return messages_list
+
+    @staticmethod
+    def _history_role(msg: Dict[str, Any]) -> str:
+        role = msg.get('role', 'user')
+        return 'assistant' if role == 'system' else role
+
+    @staticmethod
+    def _system_prompt(countries_text: str, universities_text: str, courses_text: str, user_name: str) -> str:
+        return f"""You are AIGLE, a friendly study abroad assistant chatbot for EdMaster.
+
+AVAILABLE COUNTRIES IN OUR DATABASE:
+{countries_text}
+
+AVAILABLE UNIVERSITIES IN OUR DATABASE:
+{universities_text}
+
+AVAILABLE COURSES IN OUR DATABASE:
+{courses_text}
+
+Student's name: {user_name}
+
+IMPORTANT RULES:
+1. ONLY recommend countries, universities, and courses that are listed above in the database
+2. If a student asks about a country (e.g. UK, Denmark, USA), check the countries list above and give details from it
+3. Never say "I don't have data" if the country/university IS in the list above
+4. Be friendly, warm, and conversational
+5. Keep responses concise — under 150 words
+6. Use emojis sparingly (1–2 max)
+7. When recommending specific courses, include the university name, fee, and intake
+8. For personalized course matching, suggest the AI Profile Evaluator"""
+
+    @staticmethod
+    def _merge_catalog(context: Dict[str, Any], rows) -> Dict[str, Any]:
+        # Without a loaded snapshot, fall back to whatever catalog rows the client sent
+        if rows is None:
+            return context
+        return {**context, **rows}
+
+    def with_catalog(self, message: str, context: Dict[str, Any], history: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Replace client-sent catalog rows with the snapshot rows relevant to this message"""
+        return self._merge_catalog(context, catalog_retriever.retrieve(message, history))
+
+    async def awith_catalog(self, message: str, context: Dict[str, Any],
+                            history: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return self._merge_catalog(context, await catalog_retriever.aretrieve(message, history))
+
+    def suggest_filters(self, message: str) -> bool:
+        return any(keyword in message.lower() for keyword in self.suggest_keywords)
+
+    def _request(self, messages_list: List[Dict[str, str]]) -> Dict[str, Any]:
+        return {
+            'model': self.model,
+            'messages': messages_list,
+            'temperature': self.temperature,
+            'max_tokens': self.max_tokens,
+        }
+
+    def _result(self, message: str, response) -> Dict[str, Any]:
+        ai_response = response.choices[0].message.content.strip()
+        logger.info(f"AI response: {ai_response[:100]}...")
+
+        return {
+            'success': True,
+            'response': ai_response,
+            'suggestFilters': self.suggest_filters(message)
+        }
+
+    def reply(self, message: str, context: Dict[str, Any], history: List[Dict[str, Any]]) -> Dict[str, Any]:
+        context = self.with_catalog(message, context, history)
+        messages_list = self.build_messages(message, context, history)
+        logger.info(f"Sending {len(messages_list)} messages to OpenAI")
+
+        response = client.chat.completions.create(**self._request(messages_list))
+        return self._result(message, response)
+
+    async def areply(self, message: str, context: Dict[str, Any], history: List[Dict[str, Any]]) -> Dict[str, Any]:
+        context = await self.awith_catalog(message, context, history)
+        messages_list = self.build_messages(message, context, history)
+        logger.info(f"Sending {len(messages_list)} messages to OpenAI (async)")
+
+        response = await get_async_client().chat.completions.create(**self._request(messages_list))
+        return self._result(message, response)
+
+    # ── Streaming (Server-Sent Events) ─────────────────────────────────
+    #
+    # Tokens are relayed as `token` events while OpenAI generates them, followed by
+    # one `done` event carrying the full response and suggestFilters. If the client
+    # goes away the generator is closed (WSGI) or cancelled (ASGI) and the upstream
+    # OpenAI stream is closed with it, so abandoned generations stop costing tokens.
+
+    def _done_event(self, message: str, chunks: List[str]) -> bytes:
+        ai_response = "".join(chunks).strip()
+        logger.info(f"AI streamed response: {ai_response[:100]}...")
+        return format_sse('done', {
+            'success': True,
+            'response': ai_response,
+            'suggestFilters': self.suggest_filters(message)
+        })
+
+    def stream_events(self, message: str, context: Dict[str, Any], history: List[Dict[str, Any]]) -> Iterator[bytes]:
+        stream = None
+        chunks = []
+        try:
+            context = self.with_catalog(message, context, history)
+            messages_list = self.build_messages(message, context, history)
+            logger.info(f"Streaming {len(messages_list)} messages to OpenAI")
+            stream = client.chat.completions.create(**self._request(messages_list), stream=True)
+            for chunk in stream:
+                text = _chunk_text(chunk)
+                if text:
+                    chunks.append(text)
+                    yield format_sse('token', {'delta': text})
+            yield self._done_event(message, chunks)
+        except GeneratorExit:
+            logger.info("Chatbot stream abandoned by client, cancelling upstream request")
+            raise
+        except Exception as e:
+            logger.error(f"Chatbot stream error: {str(e)}")
+            yield format_sse('error', {'success': False, 'error': 'Failed to process message'})
+        finally:
+            if stream is not None:
+                stream.close()
+
+    async def astream_events(self, message: str, context: Dict[str, Any],
+                             history: List[Dict[str, Any]]) -> AsyncIterator[bytes]:
+        stream = None
+        chunks = []
+        try:
+            context = await self.awith_catalog(message, context, history)
+            messages_list = self.build_messages(message, context, history)
+            logger.info(f"Streaming {len(messages_list)} messages to OpenAI (async)")
+            stream = await get_async_client().chat.completions.create(**self._request(messages_list), stream=True)
+            async for chunk in stream:
+                text = _chunk_text(chunk)
+                if text:
+                    chunks.append(text)
+                    yield format_sse('token', {'delta': text})
+            yield self._done_event(message, chunks)
+        except (asyncio.CancelledError, GeneratorExit):
+            logger.info("Chatbot stream abandoned by client, cancelling upstream request")
+            raise
+        except Exception as e:
+            logger.error(f"Chatbot stream error: {str(e)}")
+            yield format_sse('error', {'success': False, 'error': 'Failed to process message'})
+        finally:
+            if stream is not None:
+                await stream.close()
@@ -0,0 +1,23 @@
+# profiles/services/course_catalog.py
+
+from django.conf import settings
+from django.core.cache import cache
+
+ACTIVE_VERSION_CACHE_KEY = 'course_catalog:active_version'
+
+
+def course_catalog_version() -> int:
+    """
+    Current Course catalog version (0 before the first ingest). Workers re-read it
+    at most every CATALOG_VERSION_CHECK_SECONDS; a bump clears the shared entry.
+    """
+    version = cache.get(ACTIVE_VERSION_CACHE_KEY)
+    if version is None:
+        from ..models import CourseCatalogVersion
+        version = CourseCatalogVersion.objects.order_by('-version').values_list('version', flat=True).first() or 0
+        cache.set(ACTIVE_VERSION_CACHE_KEY, version, settings.CATALOG_VERSION_CHECK_SECONDS)
+    return version
+
+
+def forget_active_version():
+    cache.delete(ACTIVE_VERSION_CACHE_KEY)
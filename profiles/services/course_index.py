@@ -0,0 +1,368 @@
+# profiles/services/course_index.py
+
+import bisect
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+from django.conf import settings
+
+from .catalog_normalize import canonical_level, country_candidates, duration_months, parse_intake
+from .course_catalog import course_catalog_version
+from .course_search import WHOLE_WORD_MAX_LENGTH, _as_list, _number
+from .matching import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Code of a missing categorical value (no country, no parsed intake, ...)
+MISSING = 0
+
+# Upper bounds (USD per year) of the price bands samples are stratified over; the
+# last band is open-ended and courses without a USD fee form their own band (-1)
+PRICE_BANDS_USD = (10000, 20000, 30000, 45000, 60000)
+
+# Score weights for top-k: every query keyword a title matches outweighs any budget fit
+KEYWORD_WEIGHT = 1.0
+BUDGET_FIT_WEIGHT = 0.5
+JITTER = 1e-3
+
+
+class Vocabulary:
+    """Value <-> small integer code; code 0 is reserved for missing values"""
+
+    def __init__(self):
+        self.values: List[Any] = [None]
+        self.codes: Dict[Any, int] = {}
+
+    def code(self, value) -> int:
+        if value in (None, ''):
+            return MISSING
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class CourseIndex:
+    """
+    Columnar, read-only copy of one catalog version for filtering in memory.
+
+    Categorical columns (country, level, intake season and year, duration in
+    months) are integer-coded, and every value of them has a precomputed bitmap
+    packed 8 rows to a byte. A filter is an AND of per-facet ORs of bitmaps, a
+    fee ceiling is one comparison over the float fee column, and title keywords
+    go through an inverted index of row positions. Only the chosen top-k rows
+    are loaded from the database, by primary key.
+    """
+
+    def __init__(self, version: int, rows: Iterable[tuple], countries: Dict[str, Any]):
+        self.version = version
+        started = time.perf_counter()
+
+        ids, fees, months = [], [], []
+        columns = {name: [] for name in ('country', 'level', 'level_name', 'season', 'year')}
+        self.vocabularies = {name: Vocabulary() for name in columns}
+        postings = defaultdict(list)
+
+        for position, (pk, country_id, level, level_name, season, year, months_value, fee, title_search) in \
+                enumerate(rows):
+            ids.append(pk.bytes)
+            for name, value in (('country', country_id), ('level', level), ('level_name', (level_name or '').casefold()),
+                                ('season', season), ('year', year)):
+                columns[name].append(self.vocabularies[name].code(value))
+            months.append(months_value or 0)
+            fees.append(np.nan if fee is None else fee)
+            for token in set(title_search.split()):
+                postings[token].append(position)
+
+        self.size = len(ids)
+        self.ids = np.array(ids, dtype='S16')
+        self.fee_usd = np.array(fees, dtype=np.float64)
+        self.duration_months = np.array(months, dtype=np.int16)
+        self.price_band = np.where(np.isnan(self.fee_usd), -1,
+                                   np.searchsorted(PRICE_BANDS_USD, self.fee_usd, side='left')).astype(np.int8)
+        self.columns = {name: np.array(values, dtype=np.int32) for name, values in columns.items()}
+
+        # Facet value code -> packed bitmap of the rows holding it
+        self.bitmaps = {name: self._bitmaps(self.columns[name], len(self.vocabularies[name]))
+                        for name in ('country', 'level', 'season', 'year')}
+        self.duration_bitmaps = {int(m): self._pack(self.duration_months == m)
+                                 for m in np.unique(self.duration_months) if m}
+
+        self.tokens = sorted(postings)
+        self.postings = [np.array(postings[token], dtype=np.int32) for token in self.tokens]
+
+        # country_candidates() names -> country code, so filters need no query
+        self.country_codes = {name: self.vocabularies['country'].codes[pk]
+                              for name, pk in countries.items() if pk in self.vocabularies['country'].codes}
+        # Stable per-course tie-breaker, so equal scores don't always favour the oldest rows
+        self.jitter = (np.frombuffer(self.ids.tobytes(), dtype='>u8')[1::2] % 1000).astype(np.float64) * JITTER / 1000
+        self.build_seconds = time.perf_counter() - started
+
+    def __len__(self) -> int:
+        return self.size
+
+    # ── Bitmaps ────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _pack(mask: np.ndarray) -> np.ndarray:
+        return np.packbits(mask)
+
+    def _bitmaps(self, codes: np.ndarray, vocabulary_size: int) -> List[np.ndarray]:
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(vocabulary_size + 1))
+        bitmaps = []
+        for code in range(vocabulary_size):
+            mask = np.zeros(self.size, dtype=bool)
+            mask[order[bounds[code]:bounds[code + 1]]] = True
+            bitmaps.append(self._pack(mask))
+        return bitmaps
+
+    def _none(self) -> np.ndarray:
+        return np.zeros((self.size + 7) // 8, dtype=np.uint8)
+
+    def _any(self, bitmaps: Iterable[np.ndarray]) -> np.ndarray:
+        combined = self._none()
+        for bitmap in bitmaps:
+            combined |= bitmap
+        return combined
+
+    def _keyword_hits(self, text: str) -> Optional[np.ndarray]:
+        """Per row, how many of the text's keywords its title matches (None without keywords)"""
+        keywords = list(dict.fromkeys(tokenize(text)))
+        if not keywords:
+            return None
+        hits = np.zeros(self.size, dtype=np.int16)
+        for keyword in keywords:
+            start = bisect.bisect_left(self.tokens, keyword)
+            if len(keyword) <= WHOLE_WORD_MAX_LENGTH:
+                end = start + 1 if start < len(self.tokens) and self.tokens[start] == keyword else start
+            else:
+                end = bisect.bisect_left(self.tokens, keyword + '\uffff', lo=start)
+            if end - start == 1:
+                hits[self.postings[start]] += 1
+            elif end > start:
+                hits[np.unique(np.concatenate(self.postings[start:end]))] += 1
+        return hits
+
+    # ── Filtering ──────────────────────────────────────────────────────────
+
+    def filter_mask(self, filters: Dict[str, Any]) -> np.ndarray:
+        """
+        Packed bitmap of the rows matching process-filters JSON, with the same
+        semantics as course_search.build_course_filter
+        """
+        mask = np.full((self.size + 7) // 8, 0xFF, dtype=np.uint8)
+
+        countries = _as_list(filters.get('countries'))
+        if countries:
+            codes = {self.country_codes.get(name) for country in countries for name in country_candidates(country)}
+            mask &= self._any(self.bitmaps['country'][code] for code in codes if code)
+
+        level_name = (filters.get('level') or '').strip()
+        if level_name:
+            level = canonical_level(level_name)
+            if level:
+                code = self.vocabularies['level'].codes.get(level)
+                mask &= self.bitmaps['level'][code] if code else self._none()
+            else:
+                code = self.vocabularies['level_name'].codes.get(level_name.casefold())
+                mask &= self._pack(self.columns['level_name'] == code) if code else self._none()
+
+        months = duration_months(filters.get('duration') or '')
+        if months:
+            mask &= self.duration_bitmaps.get(months, self._none())
+        min_months, max_months = _number(filters.get('minDurationMonths')), _number(filters.get('maxDurationMonths'))
+        if min_months is not None or max_months is not None:
+            mask &= self._any(bitmap for m, bitmap in self.duration_bitmaps.items()
+                              if (min_months is None or m >= min_months) and (max_months is None or m <= max_months))
+
+        intakes, any_intake = self._none(), False
+        for intake in _as_list(filters.get('intakes')):
+            season, year = parse_intake(intake)
+            if not season and year is None:
+                continue
+            any_intake = True
+            match = np.full_like(intakes, 0xFF)
+            for name, value in (('season', season), ('year', year)):
+                if value:
+                    code = self.vocabularies[name].codes.get(value)
+                    match &= self.bitmaps[name][code] if code else self._none()
+            intakes |= match
+        if any_intake:
+            mask &= intakes
+
+        budget = _number(filters.get('maxBudgetUSD'))
+        if budget is not None and budget > 0:
+            # NaN fees compare False, like NULL in SQL
+            mask &= self._pack(self.fee_usd <= float(budget))
+
+        hits = self._keyword_hits(filters.get('course') or filters.get('searchQuery') or '')
+        if hits is not None:
+            mask &= self._pack(hits > 0)
+        return mask
+
+    def _unpack(self, mask: np.ndarray) -> np.ndarray:
+        # Viewed as bool, nonzero() takes numpy's fast path for boolean arrays
+        return np.unpackbits(mask, count=self.size).view(bool)
+
+    def positions(self, mask: np.ndarray) -> np.ndarray:
+        return np.flatnonzero(self._unpack(mask))
+
+    def count(self, filters: Dict[str, Any]) -> int:
+        return int(np.count_nonzero(self._unpack(self.filter_mask(filters))))
+
+    def top_k(self, filters: Dict[str, Any], k: int, query: str = '',
+              budget_usd: Optional[float] = None) -> np.ndarray:
+        """
+        Positions of the k best rows matching the filters and any query keyword,
+        best first. Rows score one point per query keyword their title matches,
+        plus up to half a point for how far under budget_usd their fee is.
+        """
+        mask = self.filter_mask(filters)
+        hits = self._keyword_hits(query)
+        if hits is not None:
+            mask &= self._pack(hits > 0)
+        candidates = self.positions(mask)
+        if not len(candidates) or k <= 0:
+            return candidates[:0]
+
+        scores = self.jitter[candidates].copy()
+        if hits is not None:
+            scores += KEYWORD_WEIGHT * hits[candidates]
+        if budget_usd:
+            fit = np.clip(1 - self.fee_usd[candidates] / float(budget_usd), 0, 1)
+            scores += BUDGET_FIT_WEIGHT * np.nan_to_num(fit, nan=0.0)
+
+        if len(candidates) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+        else:
+            best = np.arange(len(candidates))
+        return candidates[best[np.argsort(-scores[best], kind='stable')]]
+
+    def strata(self, mask: np.ndarray, size: int) -> Dict[str, np.ndarray]:
+        """
+        Sampling candidates: the first ceil(size / strata) rows (in jitter order)
+        of every (country, level, price band) stratum of the masked rows, as
+        columns ordered by rank within the stratum
+        """
+        candidates = self.positions(mask)
+        if not len(candidates):
+            return {'position': candidates}
+        country, level = self.columns['country'][candidates], self.columns['level'][candidates]
+        band = self.price_band[candidates]
+        key = country.astype(np.int64) * len(self.vocabularies['level']) + level
+        key = key * (len(PRICE_BANDS_USD) + 2) + band + 1
+        strata, stratum = np.unique(key, return_inverse=True)
+        per_stratum = -(-size // len(strata))
+
+        # Group by stratum (jitter order within each), rank inside the group, keep the
+        # first per_stratum of each, then order round by round
+        order = np.lexsort((self.jitter[candidates], stratum))
+        grouped = stratum[order]
+        rank = np.arange(len(order)) - np.searchsorted(grouped, grouped, side='left')
+        taken = rank < per_stratum
+        keep, rank = order[taken], rank[taken]
+        by_round = np.lexsort((stratum[keep], rank))
+        keep, rank = keep[by_round], rank[by_round]
+        return {
+            'position': candidates[keep],
+            'country': country[keep],
+            'level': level[keep],
+            'band': band[keep],
+            'rank': rank,
+        }
+
+    def course_ids(self, positions: np.ndarray) -> List[uuid.UUID]:
+        return [uuid.UUID(bytes=self.ids[p].ljust(16, b'\0')) for p in positions]
+
+
+class CourseIndexHolder:
+    """
+    Per-process holder of the catalog's CourseIndex, rebuilt when the catalog
+    version changes. While a rebuild runs, other requests keep using the
+    previous index instead of waiting for it.
+    """
+
+    def __init__(self):
+        self._index: Optional[CourseIndex] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def build(version: int) -> CourseIndex:
+        from ..models import Country, Course
+
+        rows = (Course.objects.order_by().values_list(
+            'id', 'country_id', 'level', 'level_name', 'intake_season', 'intake_year', 'duration_months',
+            'annual_fee_usd', 'title_search',
+        ).iterator(chunk_size=settings.COURSE_INDEX_CHUNK_SIZE))
+        countries = dict(Country.objects.values_list('name_normalized', 'id'))
+        index = CourseIndex(version, rows, countries)
+        logger.info(f"Built course index v{version}: {len(index)} courses in {index.build_seconds:.2f}s")
+        return index
+
+    def get_index(self) -> CourseIndex:
+        version = course_catalog_version()
+        index = self._index
+        if index is not None and index.version == version:
+            return index
+
+        # Someone else is rebuilding: serve the previous version until they finish
+        if not self._lock.acquire(blocking=index is None):
+            return index
+        try:
+            if self._index is None or self._index.version != version:
+                self._index = self.build(version)
+            return self._index
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        """Drop the built index; the next request rebuilds it"""
+        with self._lock:
+            self._index = None
+
+    def warm(self):
+        """Build the index in the background so the first request doesn't pay for it"""
+        def run():
+            try:
+                self.get_index()
+            except Exception as e:
+                logger.error(f"Could not warm the course index: {e}")
+
+        threading.Thread(target=run, name='course-index-warmup', daemon=True).start()
+
+
+course_index = CourseIndexHolder()
+
+
+def load_rows(index: CourseIndex, positions: Iterable[int]) -> List[Dict[str, Any]]:
+    """Course rows (Course.objects.rows()) for index positions, in their order"""
+    from ..models import Course
+
+    ids = index.course_ids(positions)
+    if not ids:
+        return []
+    rows = {row['id']: row for row in Course.objects.filter(id__in=ids).rows('id')}
+    loaded = []
+    for pk in ids:
+        row = rows.get(pk)
+        if row is not None:  # deleted since the index was built
+            row.pop('id')
+            loaded.append(row)
+    return loaded
+
+
+def select_courses(filters: Dict[str, Any], k: int, query: str = '', budget_usd: Optional[float] = None,
+                   index: Optional[CourseIndex] = None) -> List[Dict[str, Any]]:
+    """Top-k catalog rows for filters (process-filters JSON) and query keywords, see CourseIndex.top_k"""
+    index = index or course_index.get_index()
+    return load_rows(index, index.top_k(filters, k, query=query, budget_usd=budget_usd))
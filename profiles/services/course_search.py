@@ -0,0 +1,154 @@
+# profiles/services/course_search.py
+
+import base64
+import json
+import logging
+import uuid
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.db.models import F, Q
+
+from ..models import Country, Course
+from .catalog_normalize import canonical_level, country_candidates, duration_months, parse_intake
+from .matching import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Keyword tokens up to this length must match a whole title word ("it", "ai", "mba");
+# longer ones match any title word they start ("comput" -> "computer", "computing")
+WHOLE_WORD_MAX_LENGTH = 3
+
+ORDERING = (F('annual_fee_usd').asc(nulls_last=True), F('id').asc())
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(course: Dict[str, Any]) -> str:
+    fee = course['annual_fee_usd']
+    payload = json.dumps([None if fee is None else str(fee), course['id'].hex], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[Decimal], uuid.UUID]:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        fee, last_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return (None if fee is None else Decimal(fee)), uuid.UUID(last_id)
+    except (ValueError, TypeError, InvalidOperation, UnicodeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {e}")
+
+
+def _after_cursor(cursor: str) -> Q:
+    """Rows strictly after the cursor in (annual_fee_usd NULLS LAST, id) order"""
+    fee, last_id = decode_cursor(cursor)
+    if fee is None:
+        return Q(annual_fee_usd__isnull=True, id__gt=last_id)
+    return (Q(annual_fee_usd__gt=fee) | Q(annual_fee_usd=fee, id__gt=last_id) |
+            Q(annual_fee_usd__isnull=True))
+
+
+def _as_list(value) -> List[str]:
+    if isinstance(value, str):
+        return [value] if value.strip() else []
+    return [str(v) for v in value or [] if str(v).strip()]
+
+
+def _number(value) -> Optional[Decimal]:
+    if value in (None, ''):
+        return None
+    try:
+        number = Decimal(str(value))
+    except InvalidOperation:
+        return None
+    return number if number.is_finite() else None
+
+
+def keyword_filter(text: str) -> Q:
+    """Any keyword matching a title word, against the padded title_search column"""
+    condition = Q()
+    for token in dict.fromkeys(tokenize(text)):
+        if len(token) <= WHOLE_WORD_MAX_LENGTH:
+            condition |= Q(title_search__contains=f" {token} ")
+        else:
+            condition |= Q(title_search__contains=f" {token}")
+    return condition
+
+
+def build_course_filter(filters: Dict[str, Any]) -> Q:
+    """
+    Translate the filter JSON produced by process-filters (countries, level, course,
+    duration, intakes, maxBudgetUSD, searchQuery) into conditions on the
+    normalized, indexed course columns. Empty filters are ignored; a country
+    list none of whose names is in the catalog matches nothing.
+    """
+    condition = Q()
+
+    countries = _as_list(filters.get('countries'))
+    if countries:
+        names = [name for country in countries for name in country_candidates(country)]
+        country_ids = list(Country.objects.filter(name_normalized__in=names).values_list('id', flat=True))
+        condition &= Q(country_id__in=country_ids)
+
+    level_name = (filters.get('level') or '').strip()
+    if level_name:
+        level = canonical_level(level_name)
+        condition &= Q(level=level) if level else Q(level_name__iexact=level_name)
+
+    months = duration_months(filters.get('duration') or '')
+    if months:
+        condition &= Q(duration_months=months)
+    min_months, max_months = _number(filters.get('minDurationMonths')), _number(filters.get('maxDurationMonths'))
+    if min_months is not None:
+        condition &= Q(duration_months__gte=min_months)
+    if max_months is not None:
+        condition &= Q(duration_months__lte=max_months)
+
+    intakes = Q()
+    for intake in _as_list(filters.get('intakes')):
+        season, year = parse_intake(intake)
+        if not season and year is None:
+            continue
+        match = Q()
+        if season:
+            match &= Q(intake_season=season)
+        if year is not None:
+            match &= Q(intake_year=year)
+        intakes |= match
+    if intakes:
+        condition &= intakes
+
+    budget = _number(filters.get('maxBudgetUSD'))
+    if budget is not None and budget > 0:
+        condition &= Q(annual_fee_usd__lte=budget)
+
+    keywords = keyword_filter(filters.get('course') or filters.get('searchQuery') or '')
+    if keywords:
+        condition &= keywords
+
+    return condition
+
+
+def search_courses(filters: Dict[str, Any], limit: int = 20, cursor: Optional[str] = None) -> Dict[str, Any]:
+    """
+    One page of catalog courses matching the filters, cheapest first. Pages are
+    keyset-paginated on (annual_fee_usd, id): the cursor holds the last row's
+    sort key, so every page is an index range scan however deep it is.
+    """
+    queryset = Course.objects.filter(build_course_filter(filters))
+    if cursor:
+        queryset = queryset.filter(_after_cursor(cursor))
+
+    page = list(queryset.order_by(*ORDERING).rows('id')[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+    next_cursor = encode_cursor(page[-1]) if has_more else None
+
+    for course in page:
+        course['id'] = course['id'].hex
+    return {
+        'courses': page,
+        'nextCursor': next_cursor,
+    }
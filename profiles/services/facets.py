@@ -0,0 +1,171 @@
+# profiles/services/facets.py
+
+import hashlib
+import json
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .filter_cache import FilterResultCache
+from .fx import fx_table
+from .matching import FacetMatcher, get_matcher
+
+# facet name -> course field it is read from
+FACET_FIELDS = {
+    'countries': 'country_name',
+    'levels': 'level',
+    'durations': 'duration',
+    'intakes': 'intake',
+}
+
+TITLE_SAMPLE_SIZE = 20
+DEFAULT_MAX_PRICE = 50000
+SUMMARY_CACHE_SIZE = 128
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+@dataclass
+class FacetSummary:
+    """
+    Everything the filter pipeline needs from a course sample, extracted in one pass:
+    distinct facet values with counts, a title sample and price statistics.
+    """
+    content_hash: str
+    counts: Dict[str, Counter] = field(default_factory=dict)
+    titles: List[str] = field(default_factory=list)
+    prices: List[float] = field(default_factory=list)
+    course_count: int = 0
+
+    def values(self, facet: str) -> List[str]:
+        """Distinct values of a facet, most common first"""
+        return [value for value, _ in sorted(self.counts[facet].items(), key=lambda item: (-item[1], item[0]))]
+
+    @cached_property
+    def price_stats(self) -> Dict[str, float]:
+        return {
+            'min': self.prices[0] if self.prices else 0,
+            'max': self.prices[-1] if self.prices else DEFAULT_MAX_PRICE,
+            'p25': percentile(self.prices, 25),
+            'p50': percentile(self.prices, 50),
+            'p75': percentile(self.prices, 75),
+            'count': len(self.prices),
+        }
+
+    @property
+    def min_price(self) -> float:
+        return self.price_stats['min']
+
+    @property
+    def max_price(self) -> float:
+        return self.price_stats['max']
+
+    @cached_property
+    def matchers(self) -> Dict[str, FacetMatcher]:
+        return {facet: get_matcher(self.counts[facet]) for facet in FACET_FIELDS}
+
+    @cached_property
+    def vocabulary_hash(self) -> str:
+        return FilterResultCache.vocabulary_hash({
+            **{facet: list(self.counts[facet]) for facet in FACET_FIELDS},
+            'price_range': [self.min_price, self.max_price],
+        })
+
+
+def _content_hash(course_sample: List[Dict[str, Any]]) -> str:
+    payload = json.dumps(course_sample, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def usd_prices(course_sample: List[Dict[str, Any]]) -> List[float]:
+    """
+    Sorted USD fees of a sample: annual_fee_usd where present, otherwise
+    tuition_fees converted from its currency, all in one array operation
+    """
+    table = fx_table()
+    amounts = [course.get('tuition_fees') for course in course_sample]
+    currencies = [course.get('currency') or '' for course in course_sample]
+    converted = table.to_usd([_amount(a) for a in amounts], currencies)
+    stored = np.array([_amount(course.get('annual_fee_usd')) for course in course_sample], dtype=np.float64)
+    prices = np.where(np.isnan(stored), converted, stored)
+    return np.sort(prices[~np.isnan(prices)]).tolist()
+
+
+def _amount(value) -> float:
+    if value in (None, ''):
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def extract_facets(course_sample: List[Dict[str, Any]], content_hash: str = '') -> FacetSummary:
+    """Build a FacetSummary with a single walk over the sample"""
+    summary = FacetSummary(content_hash=content_hash, counts={facet: Counter() for facet in FACET_FIELDS})
+    counters = [(summary.counts[facet], course_field) for facet, course_field in FACET_FIELDS.items()]
+
+    for position, course in enumerate(course_sample):
+        for counter, course_field in counters:
+            value = course.get(course_field)
+            if value:
+                value = str(value).strip()
+                if value:
+                    counter[value] += 1
+
+        if position < TITLE_SAMPLE_SIZE:
+            title = course.get('course_title')
+            if title:
+                summary.titles.append(str(title).strip())
+
+    summary.prices = usd_prices(course_sample)
+    summary.course_count = len(course_sample)
+    return summary
+
+
+class FacetSummaryCache:
+    """
+    Per-process LRU of facet summaries keyed by the sample's content hash and
+    the FX rates version its USD prices were converted with
+    """
+
+    def __init__(self, max_size=SUMMARY_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, course_sample: List[Dict[str, Any]]) -> FacetSummary:
+        content_hash = _content_hash(course_sample)
+        key = (content_hash, fx_table().version)
+
+        with self._lock:
+            summary = self._entries.get(key)
+            if summary is not None:
+                self._entries.move_to_end(key)
+                return summary
+
+        summary = extract_facets(course_sample, content_hash)
+
+        with self._lock:
+            self._entries[key] = summary
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return summary
+
+
+_summary_cache = FacetSummaryCache()
+
+
+def get_facet_summary(course_sample: List[Dict[str, Any]]) -> FacetSummary:
+    return _summary_cache.get_or_build(course_sample)
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import logging
+import math
+from typing import Any, Dict, Iterable, Optional
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from .metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+
+class FilterResultCache:
+    """
+    Shared cache for CourseFilterAI results.
+
+    Keys are a fingerprint of the normalized student profile plus a hash of the
+    facet vocabulary found in the course sample, so two students with the same
+    answers against the same catalog share one LLM result.
+    """
+
+    KEY_VERSION = 1
+
+    def __init__(self, cache_alias=None, timeout=None):
+        self.cache_alias = cache_alias or settings.AI_FILTER_CACHE_ALIAS
+        self.cache = caches[self.cache_alias]
+        self.timeout = settings.AI_FILTER_CACHE_TTL if timeout is None else timeout
+        self.metrics = Metrics(self.cache_alias, prefix='ai_filter_cache')
+
+    @staticmethod
+    def _normalize_list(values: Optional[Iterable[str]]):
+        return sorted({str(v).strip().casefold() for v in values or [] if str(v).strip()})
+
+    @staticmethod
+    def cgpa_band(cgpa, width=0.5):
+        try:
+            return math.floor(float(cgpa) / width) * width
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def vocabulary_hash(vocabulary: Dict[str, Any]) -> str:
+        canonical = {
+            key: sorted(value) if isinstance(value, (list, set, tuple)) else value
+            for key, value in vocabulary.items()
+        }
+        payload = json.dumps(canonical, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def fingerprint(self, profile_data: Dict[str, Any], budget_usd) -> Dict[str, Any]:
+        """Canonical form of the parts of a profile that drive the generated filters"""
+        return {
+            'countries': self._normalize_list(profile_data.get('countries')),
+            'fields': self._normalize_list(profile_data.get('fields')),
+            'intakes': self._normalize_list(profile_data.get('intakes')),
+            'degree': str(profile_data.get('degree', '')).strip().casefold(),
+            'completed_degree': str(profile_data.get('completedDegree', '')).strip().casefold(),
+            # budget_usd is already rounded to the nearest 1000 and clamped
+            'budget_bucket': int(budget_usd),
+            'cgpa_band': self.cgpa_band(profile_data.get('cgpa', 0)),
+        }
+
+    def make_key(self, profile_data: Dict[str, Any], budget_usd, vocabulary_hash: str) -> str:
+        payload = json.dumps(self.fingerprint(profile_data, budget_usd), sort_keys=True)
+        profile_hash = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+        return f"ai_filters:v{self.KEY_VERSION}:{profile_hash[:32]}:{vocabulary_hash[:16]}"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            result = self.cache.get(key)
+        except Exception as e:
+            logger.warning(f"Filter cache read failed: {e}")
+            return None
+
+        if result is None:
+            self.metrics.incr('misses')
+            return None
+
+        self.metrics.incr('hits')
+        logger.info(f"Filter cache hit: {key}")
+        return result
+
+    def set(self, key: str, result: Dict[str, Any]):
+        try:
+            self.cache.set(key, result, timeout=self.timeout)
+        except Exception as e:
+            logger.warning(f"Filter cache write failed: {e}")
+
+    async def aget(self, key: str) -> Optional[Dict[str, Any]]:
+        return await sync_to_async(self.get, thread_sensitive=False)(key)
+
+    async def aset(self, key: str, result: Dict[str, Any]):
+        await sync_to_async(self.set, thread_sensitive=False)(key, result)
+
+    def stats(self) -> Dict[str, Any]:
+        counters = self.metrics.get_many(['hits', 'misses'])
+        total = counters['hits'] + counters['misses']
+        counters['hit_ratio'] = round(counters['hits'] / total, 4) if total else 0.0
+        return counters
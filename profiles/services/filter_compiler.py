@@ -0,0 +1,230 @@
+# profiles/services/filter_compiler.py
+
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from .matching import FacetMatcher
+
+logger = logging.getLogger(__name__)
+
+DURATION_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*(year|yr|month|mo|week|wk)', re.IGNORECASE)
+
+# Reasonable programme length (in months) per target degree, mirroring the LLM prompt
+DEGREE_DURATION_RANGES = {
+    "Undergraduate": (36, 48),
+    "Postgraduate": (12, 24),
+    "Doctorate": (36, 60),
+    "Diploma": (6, 24),
+}
+
+# How much each filter contributes to the overall confidence score
+CONFIDENCE_WEIGHTS = {
+    'countries': 0.3,
+    'level': 0.25,
+    'course': 0.2,
+    'intakes': 0.15,
+    'duration': 0.1,
+}
+
+KEYWORD_ACRONYMS = {"ai", "it", "ml", "mba"}
+
+
+def parse_duration_months(duration: str) -> Optional[float]:
+    """Parse strings like '2 Years', '18 months' or '1.5 year' into months"""
+    if not duration:
+        return None
+    match = DURATION_PATTERN.search(duration)
+    if not match:
+        return None
+    value = float(match.group(1))
+    unit = match.group(2).lower()
+    if unit.startswith('y'):
+        return value * 12
+    if unit.startswith('w'):
+        return round(value / 4.345, 1)
+    return value
+
+
+class LocalFilterCompiler:
+    """
+    Rule-based equivalent of the LLM filter prompt.
+
+    Builds the same filter JSON from CourseFilterAI's mapping tables and the facet
+    vocabulary of the course sample, and scores how confident it is in the result
+    so callers can decide whether an LLM round trip is worth it.
+    """
+
+    def __init__(self, level_mappings: Dict[str, List[str]], field_keywords: Dict[str, List[str]]):
+        self.level_mappings = level_mappings
+        self.field_keywords = {field.casefold(): keywords for field, keywords in field_keywords.items()}
+        self.field_names = {field.casefold(): field for field in field_keywords}
+
+    def compile(self, profile_data: Dict[str, Any], context: Dict[str, Any]) -> Dict[str, Any]:
+        matchers = context['matchers']
+        countries, countries_score = self._match_all(profile_data.get('countries', []), matchers['countries'])
+        intakes, intakes_score = self._match_all(profile_data.get('intakes', []), matchers['intakes'])
+        level, level_score = self._compile_level(profile_data.get('degree', ''), matchers['levels'])
+        course, search_query, course_score = self._compile_course(profile_data.get('fields', []),
+                                                                  context['facets'].titles)
+        duration, duration_score = self._compile_duration(profile_data.get('degree', ''),
+                                                          context['facets'].counts['durations'])
+
+        filters = {
+            'countries': countries,
+            'level': level,
+            'course': course,
+            'duration': duration,
+            'intakes': intakes,
+            'maxBudgetUSD': self._compile_budget(context),
+            'searchQuery': search_query,
+        }
+        scores = {
+            'countries': countries_score,
+            'level': level_score,
+            'course': course_score,
+            'intakes': intakes_score,
+            'duration': duration_score,
+        }
+        confidence = round(sum(CONFIDENCE_WEIGHTS[key] * score for key, score in scores.items()), 3)
+
+        return {
+            'filters': filters,
+            'confidence': confidence,
+            'scores': scores,
+        }
+
+    @staticmethod
+    def _match_all(wanted: List[str], matcher: FacetMatcher) -> Tuple[List[str], float]:
+        if not wanted:
+            return [], 0.0
+        matched = []
+        hits = 0
+        for value in wanted:
+            best_match = matcher.best(value)
+            if not best_match:
+                continue
+            hits += 1
+            if best_match not in matched:
+                matched.append(best_match)
+        return matched, hits / len(wanted)
+
+    def _canonical_level(self, degree: str) -> Optional[str]:
+        """Resolve a degree to a level_mappings key, accepting synonyms such as 'PG' or 'Masters'"""
+        degree_lower = (degree or '').casefold()
+        for canonical, synonyms in self.level_mappings.items():
+            if degree_lower == canonical.casefold() or degree_lower in (s.casefold() for s in synonyms):
+                return canonical
+        return None
+
+    def _compile_level(self, degree: str, levels: FacetMatcher) -> Tuple[str, float]:
+        if not degree or not len(levels):
+            return "", 0.0
+
+        canonical = self._canonical_level(degree)
+        if canonical is None:
+            best_match = levels.best(degree)
+            return best_match, (0.6 if best_match else 0.0)
+
+        candidates = self.level_mappings[canonical]
+        for level in candidates:
+            if level in levels:
+                return level, 1.0
+
+        # Rank every synonym's best candidate instead of taking the first hit
+        ranked = [match for level in candidates for match in levels.rank(level, limit=1)]
+        if ranked:
+            return max(ranked)[1], 0.8
+
+        return "", 0.0
+
+    def _compile_course(self, fields: List[str], course_titles: List[str]) -> Tuple[str, str, float]:
+        if not fields:
+            return "", "", 0.0
+
+        title_words = set(" ".join(course_titles).casefold().split())
+        keywords = []
+        known = 0
+
+        for field in fields:
+            field_keywords = self.field_keywords.get(field.casefold())
+            if field_keywords is None:
+                keywords.extend(word for word in re.split(r'[\s&/,]+', field) if len(word) > 2)
+                continue
+            known += 1
+            # Prefer keywords that actually appear in the catalog's course titles
+            single_words = [k for k in field_keywords if ' ' not in k]
+            single_words.sort(key=lambda k: k not in title_words)
+            keywords.extend(single_words)
+
+        course_words = []
+        for keyword in keywords:
+            word = keyword.upper() if keyword.casefold() in KEYWORD_ACRONYMS else keyword.title()
+            if word.casefold() not in (w.casefold() for w in course_words):
+                course_words.append(word)
+
+        query_words = []
+        for field in fields[:2]:
+            name = self.field_names.get(field.casefold(), field)
+            for word in re.split(r'[\s&/,]+', name):
+                if word and word.casefold() not in (w.casefold() for w in query_words):
+                    query_words.append(word.upper() if word.casefold() in KEYWORD_ACRONYMS else word)
+
+        return " ".join(course_words[:3]), " ".join(query_words[:3]), known / len(fields)
+
+    def _compile_duration(self, degree: str, duration_counts: Dict[str, int]) -> Tuple[str, float]:
+        months_range = DEGREE_DURATION_RANGES.get(self._canonical_level(degree))
+        if months_range is None:
+            return "", 0.5
+
+        # Prefer the most common duration in range, then the one closest to the middle of it
+        low, high = months_range
+        target = (low + high) / 2
+        in_range = []
+        for duration, count in duration_counts.items():
+            months = parse_duration_months(duration)
+            if months is not None and low <= months <= high:
+                in_range.append((-count, abs(months - target), -months, duration))
+
+        if not in_range:
+            # No duration constraint is still a valid (if broad) answer
+            return "", 0.5
+
+        return min(in_range)[3], 1.0
+
+    @staticmethod
+    def _compile_budget(context: Dict[str, Any]) -> float:
+        budget = context['budget_usd'] * 1.2
+        if budget < context['min_price']:
+            return context['min_price'] * 1.5
+        if budget > context['max_price']:
+            return context['max_price'] * 1.2
+        return budget
+
+
+def diff_filters(local_filters: Dict[str, Any], llm_filters: Dict[str, Any], budget_tolerance: float = 0.1) -> \
+        Dict[str, Tuple[Any, Any]]:
+    """Return the filter keys on which the local compiler and the LLM disagree"""
+    differences = {}
+    for key in CONFIDENCE_WEIGHTS.keys() | {'maxBudgetUSD', 'searchQuery'}:
+        local_value = local_filters.get(key)
+        llm_value = llm_filters.get(key)
+
+        if isinstance(local_value, list) or isinstance(llm_value, list):
+            same = {str(v).casefold() for v in local_value or []} == {str(v).casefold() for v in llm_value or []}
+        elif key == 'maxBudgetUSD':
+            try:
+                local_number, llm_number = float(local_value or 0), float(llm_value or 0)
+                same = abs(local_number - llm_number) <= budget_tolerance * max(local_number, llm_number, 1)
+            except (TypeError, ValueError):
+                same = False
+        elif key in ('course', 'searchQuery'):
+            local_words = set(str(local_value or '').casefold().split())
+            llm_words = set(str(llm_value or '').casefold().split())
+            same = bool(local_words & llm_words) or local_words == llm_words
+        else:
+            same = str(local_value or '').casefold() == str(llm_value or '').casefold()
+
+        if not same:
+            differences[key] = (local_value, llm_value)
+    return differences
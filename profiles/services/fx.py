@@ -0,0 +1,218 @@
+# profiles/services/fx.py
+
+import logging
+import threading
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router
+from django.db.models import Count, Max
+
+logger = logging.getLogger(__name__)
+
+FX_VERSION_CACHE_KEY = 'fx_rates:version'
+BASE_CURRENCY = 'USD'
+
+
+class FxRateError(ValueError):
+    pass
+
+
+class FxTable:
+    """
+    One snapshot of the FxRate table as arrays: currency codes and US dollars per
+    unit of each. Whole columns of fees convert with a single gather and
+    multiply; unknown currencies come out as NaN.
+    """
+
+    def __init__(self, version: str, rates: Dict[str, float]):
+        self.version = version
+        rates = {**rates, BASE_CURRENCY: 1.0}
+        self.currencies = tuple(sorted(rates))
+        self.codes = {currency: code for code, currency in enumerate(self.currencies)}
+        # Code len(currencies) is the slot for currencies without a rate
+        self.usd_per_unit = np.array([rates[c] for c in self.currencies] + [np.nan], dtype=np.float64)
+
+    def __contains__(self, currency: str) -> bool:
+        return (currency or '').upper() in self.codes
+
+    def __len__(self) -> int:
+        return len(self.currencies)
+
+    def rate(self, currency: str) -> Optional[float]:
+        """US dollars per unit of a currency, or None without a stored rate"""
+        code = self.codes.get((currency or '').upper())
+        return None if code is None else float(self.usd_per_unit[code])
+
+    def convert(self, amount: float, from_currency: str, to_currency: str = BASE_CURRENCY) -> Optional[float]:
+        source, target = self.rate(from_currency), self.rate(to_currency)
+        if amount is None or source is None or target is None:
+            return None
+        return float(amount) * source / target
+
+    def currency_codes(self, currencies: Sequence[str]) -> np.ndarray:
+        """Integer code per currency; distinct values are looked up once, not per row"""
+        uniques, inverse = np.unique(np.asarray(currencies, dtype=str), return_inverse=True)
+        missing = len(self.currencies)
+        lookup = np.array([self.codes.get(c.strip().upper(), missing) for c in uniques], dtype=np.intp)
+        return lookup[inverse.reshape(-1)]
+
+    def to_usd(self, amounts: Iterable, currencies: Sequence[str]) -> np.ndarray:
+        """Vectorized fee conversion: amounts[i] in currencies[i] -> USD (NaN if either is unknown)"""
+        try:
+            amounts = np.asarray(amounts, dtype=np.float64)
+        except TypeError:
+            # Missing fees (None) among the amounts
+            amounts = np.asarray([np.nan if a is None else a for a in amounts], dtype=np.float64)
+        if not len(amounts):
+            return amounts
+        return amounts * self.usd_per_unit[self.currency_codes(currencies)]
+
+    def from_usd(self, amounts_usd: Iterable, currency: str) -> np.ndarray:
+        rate = self.rate(currency)
+        amounts_usd = np.asarray(amounts_usd, dtype=np.float64)
+        return amounts_usd / rate if rate else np.full_like(amounts_usd, np.nan)
+
+
+def to_decimals(values: np.ndarray) -> List[Optional[Decimal]]:
+    """Array of amounts -> cent-rounded Decimals for DecimalFields (NaN -> None)"""
+    return [None if np.isnan(v) else Decimal(f"{v:.2f}") for v in np.round(values, 2)]
+
+
+class FxRates:
+    """Per-process holder of the FxRate table, reloaded when the rates change"""
+
+    def __init__(self):
+        self._table: Optional[FxTable] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def active_version() -> str:
+        version = cache.get(FX_VERSION_CACHE_KEY)
+        if version is None:
+            from ..models import FxRate
+            stats = FxRate.objects.aggregate(updated=Max('updated_at'), count=Count('id'))
+            version = f"{stats['count']}:{stats['updated'].isoformat() if stats['updated'] else ''}"
+            cache.set(FX_VERSION_CACHE_KEY, version, settings.FX_RATES_CHECK_SECONDS)
+        return version
+
+    def get_table(self) -> FxTable:
+        version = self.active_version()
+        table = self._table
+        if table is not None and table.version == version:
+            return table
+
+        with self._lock:
+            if self._table is None or self._table.version != version:
+                from ..models import FxRate
+                rates = {currency: float(rate) for currency, rate in
+                         FxRate.objects.values_list('currency', 'usd_per_unit')}
+                self._table = FxTable(version, rates)
+                logger.info(f"Loaded {len(self._table)} FX rates ({version})")
+            return self._table
+
+    @staticmethod
+    def forget():
+        cache.delete(FX_VERSION_CACHE_KEY)
+
+
+fx_rates = FxRates()
+
+
+def fx_table() -> FxTable:
+    return fx_rates.get_table()
+
+
+def fetch_rates(url: Optional[str] = None, timeout: float = 10) -> Dict[str, Decimal]:
+    """
+    US dollars per unit of every currency quoted by a rates API answering
+    {"base" | "base_code": ..., "rates": {"INR": 83.2, ...}} (units per base)
+    """
+    url = url or settings.FX_RATES_URL
+    try:
+        response = requests.get(url, timeout=timeout)
+        response.raise_for_status()
+        payload = response.json()
+    except (requests.RequestException, ValueError) as e:
+        raise FxRateError(f"Could not fetch FX rates from {url}: {e}")
+
+    quotes = payload.get('rates') or {}
+    base = (payload.get('base') or payload.get('base_code') or BASE_CURRENCY).upper()
+    quotes = {str(c).upper(): Decimal(str(q)) for c, q in quotes.items() if q}
+    quotes[base] = Decimal(1)
+    if BASE_CURRENCY not in quotes:
+        raise FxRateError(f"{url} quotes no {BASE_CURRENCY} rate against {base}")
+
+    # units per base / units per base for USD = units per USD; invert for USD per unit
+    return {currency: (quotes[BASE_CURRENCY] / quote).quantize(Decimal('1e-10'))
+            for currency, quote in quotes.items() if len(currency) == 3}
+
+
+def save_rates(rates: Dict[str, Decimal], source: str = '') -> int:
+    """Upsert rates (US dollars per unit) into FxRate and make every worker reload them"""
+    from ..models import FxRate
+
+    rows = [FxRate(currency=currency.upper(), usd_per_unit=rate, source=source[:50])
+            for currency, rate in rates.items() if currency.upper() != BASE_CURRENCY]
+    features = connections[router.db_for_write(FxRate)].features
+    FxRate.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['currency'] if features.supports_update_conflicts_with_target else None,
+        update_fields=['usd_per_unit', 'source', 'updated_at'],
+    )
+    fx_rates.forget()
+    return len(rows)
+
+
+def reprice_courses(batch_size: int = 5000) -> int:
+    """
+    Recompute annual_fee_usd of every non-USD course from tuition_fees with the
+    current rates, a batch at a time with one vectorized conversion per batch.
+    Returns how many fees changed.
+    """
+    from ..models import Course
+
+    table = fx_table()
+    queryset = (Course.objects.exclude(currency__iexact=BASE_CURRENCY).exclude(currency='')
+                .filter(tuition_fees__isnull=False).order_by('id'))
+    changed, last_id = 0, None
+    while True:
+        page = queryset if last_id is None else queryset.filter(id__gt=last_id)
+        batch = list(page.only('id', 'tuition_fees', 'currency', 'annual_fee_usd')[:batch_size])
+        if not batch:
+            return changed
+        last_id = batch[-1].id
+
+        fees = to_decimals(table.to_usd([c.tuition_fees for c in batch], [c.currency for c in batch]))
+        updated = []
+        for course, fee in zip(batch, fees):
+            if fee is not None and fee != course.annual_fee_usd:
+                course.annual_fee_usd = fee
+                updated.append(course)
+        Course.objects.bulk_update(updated, ['annual_fee_usd'])
+        changed += len(updated)
+
+
+def refresh_fx_rates(url: Optional[str] = None, rates: Optional[Dict[str, Decimal]] = None,
+                     source: Optional[str] = None, reprice: bool = True) -> Dict[str, Any]:
+    """
+    Store the given rates (or fetch the latest from url / FX_RATES_URL), then
+    optionally reprice non-USD courses. A repricing that changes any fee bumps
+    the course catalog version, so cached samples pick up the new fees.
+    """
+    from ..models import CourseCatalogVersion
+
+    if rates is None:
+        rates = fetch_rates(url)
+        source = source or url or settings.FX_RATES_SOURCE
+    saved = save_rates(rates, source=source or '')
+    repriced = reprice_courses() if reprice else 0
+    version = None
+    if repriced:
+        version = CourseCatalogVersion.bump(note=f"fx: repriced {repriced} courses").version
+    return {'saved': saved, 'repriced': repriced, 'version': version}
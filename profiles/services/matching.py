@@ -0,0 +1,187 @@
+# profiles/services/matching.py
+
+import re
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+TOKEN_PATTERN = re.compile(r'\w+(?:\.\d+)?')
+
+STOPWORDS = frozenset({"a", "an", "and", "in", "of", "the", "for", "to", "with"})
+
+# Per-token normalisation applied to both options and targets
+TOKEN_ALIASES = {
+    "autumn": "fall",
+    "yrs": "year",
+    "yr": "year",
+    "months": "month",
+    "mos": "month",
+}
+
+# Whole-phrase aliases: what students type -> how the catalog may spell it
+DEFAULT_ALIASES = {
+    "usa": ["United States", "United States of America"],
+    "us": ["United States", "United States of America"],
+    "u.s.": ["United States", "United States of America"],
+    "america": ["United States", "United States of America"],
+    "uk": ["United Kingdom"],
+    "u.k.": ["United Kingdom"],
+    "britain": ["United Kingdom"],
+    "great britain": ["United Kingdom"],
+    "england": ["United Kingdom"],
+    "uae": ["United Arab Emirates"],
+    "nz": ["New Zealand"],
+    "holland": ["Netherlands"],
+    "pg": ["Master", "Masters", "Postgraduate"],
+    "postgraduate": ["Master", "Masters"],
+    "graduate": ["Master", "Masters"],
+    "ug": ["Bachelor", "Bachelors", "Undergraduate"],
+    "undergraduate": ["Bachelor", "Bachelors"],
+    "phd": ["Doctorate", "Doctoral"],
+    "doctorate": ["PhD", "Doctoral"],
+    "certificate": ["Diploma", "Certification"],
+}
+
+EXACT_SCORE = 1.0
+NORMALIZED_SCORE = 0.98
+ALIAS_SCORE = 0.95
+TOKEN_SCORE_CEILING = 0.9
+# Substring matches ("Aus" -> "Australia") only rank when nothing else matched
+SUBSTRING_SCORE_CEILING = 0.5
+SUBSTRING_MIN_LENGTH = 3
+
+
+def normalize_text(value: str) -> str:
+    return " ".join((value or "").casefold().split())
+
+
+def tokenize(value: str) -> Tuple[str, ...]:
+    tokens = []
+    for token in TOKEN_PATTERN.findall((value or "").casefold()):
+        if token in STOPWORDS:
+            continue
+        token = TOKEN_ALIASES.get(token, token)
+        # Cheap plural folding so "Masters" matches "Master" and "Years" matches "Year"
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        tokens.append(token)
+    return tuple(tokens)
+
+
+class FacetMatcher:
+    """
+    Precompiled fuzzy matcher over one facet vocabulary (countries, levels, ...).
+
+    Options are normalised once; lookups go through an exact-match dict, an alias
+    table and a token inverted index, so the cost of a match depends on the
+    target's tokens rather than on the size of the vocabulary. Candidates are
+    ranked by similarity instead of returning the first hit. Only a target that
+    none of those find falls back to a substring scan of the options.
+    """
+
+    def __init__(self, options: Iterable[str], aliases: Optional[Dict[str, List[str]]] = None):
+        self.options = sorted({option.strip() for option in options if option and option.strip()})
+        self.option_set = frozenset(self.options)
+
+        self._exact: Dict[str, str] = {}
+        self._normalized: Dict[Tuple[str, ...], str] = {}
+        self._index: Dict[str, List[int]] = defaultdict(list)
+        self._tokens: List[frozenset] = []
+        self._texts: List[str] = []
+
+        for position, option in enumerate(self.options):
+            text = normalize_text(option)
+            self._texts.append(text)
+            self._exact.setdefault(text, option)
+            tokens = tokenize(option)
+            self._normalized.setdefault(tokens, option)
+            token_set = frozenset(tokens)
+            self._tokens.append(token_set)
+            for token in token_set:
+                self._index[token].append(position)
+
+        self._aliases: Dict[str, List[str]] = {}
+        for alias, targets in (DEFAULT_ALIASES if aliases is None else aliases).items():
+            resolved = [self._exact[normalize_text(t)] for t in targets if normalize_text(t) in self._exact]
+            if resolved:
+                self._aliases[normalize_text(alias)] = resolved
+
+    def __contains__(self, option: str) -> bool:
+        return option in self.option_set
+
+    def __len__(self) -> int:
+        return len(self.options)
+
+    def __iter__(self):
+        return iter(self.options)
+
+    def __repr__(self):
+        return f"FacetMatcher({self.options!r})"
+
+    def rank(self, target: str, limit: int = 5) -> List[Tuple[float, str]]:
+        """Return up to `limit` (score, option) pairs, best first"""
+        if not target or not self.options:
+            return []
+
+        normalized = normalize_text(target)
+        exact = self._exact.get(normalized)
+        if exact is not None:
+            return [(EXACT_SCORE, exact)]
+
+        scores: Dict[str, float] = {}
+
+        target_tokens = tokenize(target)
+        normalized_match = self._normalized.get(target_tokens)
+        if normalized_match is not None:
+            scores[normalized_match] = NORMALIZED_SCORE
+
+        for option in self._aliases.get(normalized, ()):
+            scores[option] = max(scores.get(option, 0.0), ALIAS_SCORE)
+
+        target_set = frozenset(target_tokens)
+        if target_set:
+            overlaps: Dict[int, int] = defaultdict(int)
+            for token in target_set:
+                for position in self._index.get(token, ()):
+                    overlaps[position] += 1
+
+            for position, overlap in overlaps.items():
+                option_tokens = self._tokens[position]
+                dice = 2 * overlap / (len(target_set) + len(option_tokens))
+                score = TOKEN_SCORE_CEILING * dice
+                option = self.options[position]
+                if score > scores.get(option, 0.0):
+                    scores[option] = score
+
+        if not scores and len(normalized) >= SUBSTRING_MIN_LENGTH:
+            scores = self._substring_scores(normalized)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], len(item[0]), item[0]))
+        return [(round(score, 4), option) for option, score in ranked[:limit]]
+
+    def _substring_scores(self, normalized: str) -> Dict[str, float]:
+        scores: Dict[str, float] = {}
+        for position, text in enumerate(self._texts):
+            if len(text) >= SUBSTRING_MIN_LENGTH and (normalized in text or text in normalized):
+                shorter, longer = sorted((len(normalized), len(text)))
+                scores[self.options[position]] = SUBSTRING_SCORE_CEILING * shorter / longer
+        return scores
+
+    def best(self, target: str, min_score: float = 0.0) -> str:
+        """Best matching option, or "" when nothing scores above `min_score`"""
+        ranked = self.rank(target, limit=1)
+        if ranked and ranked[0][0] > min_score:
+            return ranked[0][1]
+        return ""
+
+
+@lru_cache(maxsize=512)
+def _cached_matcher(options: frozenset) -> FacetMatcher:
+    return FacetMatcher(options)
+
+
+def get_matcher(options: Iterable[str]) -> FacetMatcher:
+    """Shared matcher for a vocabulary, built once per distinct set of options"""
+    if isinstance(options, FacetMatcher):
+        return options
+    return _cached_matcher(frozenset(options))
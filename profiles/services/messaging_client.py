@@ -0,0 +1,180 @@
+# profiles/services/messaging_client.py
+
+import atexit
+import logging
+import os
+import socket
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from twilio.base.exceptions import TwilioRestException
+from twilio.http.http_client import TwilioHttpClient
+from twilio.rest import Client
+from urllib3.connection import HTTPConnection
+
+from .metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the request latency histogram; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500)
+
+METRIC_NAMES = ['requests', 'errors', 'new_connections', 'latency_ms_total'] + \
+    [f'latency_le_{bound}' for bound in LATENCY_BUCKETS_MS] + ['latency_le_inf']
+
+
+# Twilio message statuses that end without the message reaching the handset
+UNDELIVERED_STATUSES = frozenset({'failed', 'undelivered', 'canceled'})
+
+
+def fetch_message_status(client: Client, sid: str) -> Tuple[str, Optional[int]]:
+    """Current (status, error_code) of a sent message"""
+    message = client.messages(sid).fetch()
+    return message.status, message.error_code
+
+
+def is_retryable_error(error):
+    """Twilio throttling, Twilio 5xx and network errors are worth retrying; other 4xx are not"""
+    if isinstance(error, TwilioRestException):
+        return error.status == 429 or error.status >= 500
+    return True
+
+
+class KeepAliveHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose sockets enable TCP keep-alive, so idle pooled connections survive NAT timeouts"""
+
+    def __init__(self, *args, keepalive: bool = True, **kwargs):
+        self.keepalive = keepalive
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.keepalive:
+            kwargs['socket_options'] = HTTPConnection.default_socket_options + [
+                (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+            ]
+        super().init_poolmanager(*args, **kwargs)
+
+
+class PooledTwilioHttpClient(TwilioHttpClient):
+    """
+    TwilioHttpClient on one long-lived requests Session with a sized connection
+    pool, so consecutive messages reuse a warm TLS connection instead of paying a
+    handshake each. Reports request latency and how many new connections the pool
+    had to open to the shared Metrics counters, buffered in process and written
+    at most every metrics_flush_seconds so a send doesn't cost several cache
+    round trips (0 writes them through).
+    """
+
+    def __init__(self, pool_size: int, connect_timeout: float, read_timeout: float, keepalive: bool = True,
+                 metrics_flush_seconds: float = 0):
+        super().__init__(pool_connections=True, max_retries=None)
+        # requests accepts a (connect, read) pair; the base class only validates scalars
+        self.timeout = (connect_timeout, read_timeout)
+        self.adapter = KeepAliveHTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0,
+                                            keepalive=keepalive)
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        self.metrics = Metrics(settings.OTP_CACHE_ALIAS, prefix='twilio_http')
+        self.metrics_flush_seconds = metrics_flush_seconds
+        self._lock = threading.Lock()
+        self._connections_seen = 0
+        self._pending = Counter()
+        self._last_flush = time.monotonic()
+
+    def _opened_connections(self) -> int:
+        # urllib3 counts every connection a host pool has ever opened
+        pools = self.adapter.poolmanager.pools
+        return sum(pools[key].num_connections for key in list(pools.keys()))
+
+    def request(self, *args, **kwargs):
+        started = time.perf_counter()
+        failed = False
+        try:
+            return super().request(*args, **kwargs)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self._observe((time.perf_counter() - started) * 1000, failed)
+
+    def _observe(self, elapsed_ms: float, failed: bool = False):
+        bucket = next((f'latency_le_{bound}' for bound in LATENCY_BUCKETS_MS if elapsed_ms <= bound),
+                      'latency_le_inf')
+        with self._lock:
+            opened = self._opened_connections()
+            # A host pool evicted from the pool manager takes its count with it, so the total can drop
+            new_connections = max(0, opened - self._connections_seen)
+            self._connections_seen = opened
+
+            pending = self._pending
+            pending['requests'] += 1
+            pending[bucket] += 1
+            pending['latency_ms_total'] += int(elapsed_ms)
+            pending['new_connections'] += new_connections
+            pending['errors'] += failed
+
+            now = time.monotonic()
+            if now - self._last_flush < self.metrics_flush_seconds:
+                return
+            self._pending, self._last_flush = Counter(), now
+        self.metrics.incr_many(pending)
+
+    def flush_metrics(self):
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._last_flush = time.monotonic()
+        self.metrics.incr_many(pending)
+
+
+_clients: Dict[Tuple, Client] = {}
+_clients_lock = threading.Lock()
+
+
+def get_twilio_client() -> Optional[Client]:
+    """
+    Per-process Twilio REST client, created on first use and shared by every thread.
+
+    Keyed by PID and credentials so a forked worker (gunicorn --preload, Celery
+    prefork) builds its own pool instead of sharing the parent's sockets.
+    """
+    if not (settings.TWILIO_ACCOUNT_SID and settings.TWILIO_AUTH_TOKEN):
+        return None
+
+    key = (os.getpid(), settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN, settings.TWILIO_API_BASE_URL)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            http_client = PooledTwilioHttpClient(
+                pool_size=settings.TWILIO_HTTP_POOL_SIZE,
+                connect_timeout=settings.TWILIO_HTTP_CONNECT_TIMEOUT,
+                read_timeout=settings.TWILIO_HTTP_READ_TIMEOUT,
+                keepalive=settings.TWILIO_HTTP_KEEPALIVE,
+                metrics_flush_seconds=settings.TWILIO_HTTP_METRICS_FLUSH_SECONDS,
+            )
+            atexit.register(http_client.flush_metrics)
+            client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN, http_client=http_client)
+            if settings.TWILIO_API_BASE_URL:
+                client.api.base_url = settings.TWILIO_API_BASE_URL
+            _clients[key] = client
+            logger.info(f"Twilio client initialized (pool size {settings.TWILIO_HTTP_POOL_SIZE})")
+    return client
+
+
+def twilio_http_stats() -> dict:
+    """
+    Shared counters across all workers, with the derived reuse ratio and mean
+    latency; each worker's latest TWILIO_HTTP_METRICS_FLUSH_SECONDS are not in yet
+    """
+    stats = Metrics(settings.OTP_CACHE_ALIAS, prefix='twilio_http').get_many(METRIC_NAMES)
+    requests = stats['requests']
+    stats['connection_reuse_ratio'] = round(1 - stats['new_connections'] / requests, 3) if requests else None
+    stats['mean_latency_ms'] = round(stats['latency_ms_total'] / requests, 1) if requests else None
+    return stats
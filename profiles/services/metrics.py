@@ -0,0 +1,107 @@
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+
+class Metrics:
+    """Lightweight counters kept in a shared cache so every worker reports the same numbers"""
+
+    def __init__(self, cache_alias='default', prefix='metrics'):
+        self.cache_alias = cache_alias
+        self.cache = caches[cache_alias]
+        self.prefix = prefix
+
+    def _key(self, name):
+        return f"{self.prefix}:{name}"
+
+    def incr(self, name, amount=1):
+        key = self._key(name)
+        try:
+            # add() is a no-op when the counter already exists
+            self.cache.add(key, 0, timeout=None)
+            return self.cache.incr(key, amount)
+        except Exception as e:
+            logger.warning(f"Failed to increment metric {name}: {e}")
+            return None
+
+    def incr_many(self, amounts):
+        """Apply a batch of increments, e.g. counts buffered in process; zero amounts are skipped"""
+        for name, amount in amounts.items():
+            if amount:
+                self.incr(name, amount)
+
+    def get(self, name, default=0):
+        try:
+            return self.cache.get(self._key(name), default)
+        except Exception as e:
+            logger.warning(f"Failed to read metric {name}: {e}")
+            return default
+
+    def get_many(self, names):
+        try:
+            values = self.cache.get_many([self._key(name) for name in names])
+        except Exception as e:
+            logger.warning(f"Failed to read metrics {names}: {e}")
+            values = {}
+        return {name: values.get(self._key(name), 0) for name in names}
+
+
+class MetricsBuffer:
+    """
+    In-process sums of metric increments, written to the shared cache by a
+    background thread every METRICS_FLUSH_SECONDS. Bumping a counter then never
+    waits on cache I/O, which matters on an event loop. With
+    METRICS_FLUSH_SECONDS=0 increments are written inline.
+    """
+
+    def __init__(self):
+        self._pending: Dict[Tuple[str, str], Counter] = defaultdict(Counter)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, cache_alias: str, prefix: str, name: str, amount: int = 1):
+        with self._lock:
+            self._pending[(cache_alias, prefix)][name] += amount
+
+        if settings.METRICS_FLUSH_SECONDS <= 0:
+            self.flush()
+        else:
+            self._ensure_thread()
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='metrics-flush', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(settings.METRICS_FLUSH_SECONDS)
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(Counter)
+        for (cache_alias, prefix), amounts in pending.items():
+            Metrics(cache_alias, prefix).incr_many(amounts)
+
+
+metrics_buffer = MetricsBuffer()
+atexit.register(metrics_buffer.flush)
+
+
+class BufferedMetrics(Metrics):
+    """Metrics whose increments go through the process-wide MetricsBuffer"""
+
+    def incr(self, name, amount=1):
+        metrics_buffer.add(self.cache_alias, self.prefix, name, amount)
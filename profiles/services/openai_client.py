@@ -0,0 +1,34 @@
+# profiles/services/openai_client.py
+
+import asyncio
+import threading
+import weakref
+from django.conf import settings
+from openai import AsyncOpenAI, OpenAI
+
+# Sync client shared by every thread of the process
+client = OpenAI(
+    api_key=settings.OPENAI_API_KEY,
+    base_url=settings.OPENAI_BASE_URL,
+    max_retries=settings.OPENAI_MAX_RETRIES,
+)
+
+# AsyncOpenAI keeps an httpx connection pool bound to the event loop it was first
+# used on, so keep one client per running loop (uvicorn runs one loop per worker;
+# async views served through WSGI get a fresh loop per request).
+_async_clients = weakref.WeakKeyDictionary()
+_async_clients_lock = threading.Lock()
+
+
+def get_async_client() -> AsyncOpenAI:
+    loop = asyncio.get_running_loop()
+    with _async_clients_lock:
+        async_client = _async_clients.get(loop)
+        if async_client is None:
+            async_client = AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                base_url=settings.OPENAI_BASE_URL,
+                max_retries=settings.OPENAI_MAX_RETRIES,
+            )
+            _async_clients[loop] = async_client
+    return async_client
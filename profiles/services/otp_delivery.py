@@ -0,0 +1,356 @@
+# profiles/services/otp_delivery.py
+
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from .messaging_client import UNDELIVERED_STATUSES
+from .metrics import Metrics
+from .sms_service import SMSService
+from .whatsapp_service import WhatsAppService
+
+logger = logging.getLogger(__name__)
+
+# Delivery lifecycle as reported to polling clients
+QUEUED = 'queued'
+SENDING = 'sending'
+RETRYING = 'retrying'
+SENT = 'sent'
+FAILED = 'failed'
+
+TERMINAL_STATUSES = {SENT, FAILED}
+
+
+class DeliveryStatusStore:
+    """
+    Per-send delivery records in the shared 'otp' cache, so the polling endpoint
+    sees the same state whichever worker ran the task. Records outlive the OTP
+    itself by a few minutes and then expire with it.
+
+    The code to send is kept beside the record rather than in the task message, so
+    it never sits in the broker, result backend or dead-letter queue; it is dropped
+    once the delivery finishes and expires with the OTP regardless.
+    """
+
+    def __init__(self, cache_alias: Optional[str] = None):
+        cache_alias = cache_alias or settings.OTP_CACHE_ALIAS
+        self.cache = caches[cache_alias]
+        self.metrics = Metrics(cache_alias, prefix='otp_delivery')
+
+    @staticmethod
+    def _key(delivery_id: str) -> str:
+        return f"otp_delivery:{delivery_id}"
+
+    @staticmethod
+    def _code_key(delivery_id: str) -> str:
+        return f"otp_delivery:{delivery_id}:code"
+
+    @staticmethod
+    def _ttl() -> int:
+        return settings.OTP_EXPIRE_MINUTES * 60 + settings.OTP_DELIVERY_STATUS_GRACE_SECONDS
+
+    def create(self, phone: str, otp_code: str) -> str:
+        delivery_id = uuid.uuid4().hex
+        now = timezone.now().isoformat()
+        self.cache.set(self._code_key(delivery_id), otp_code, timeout=settings.OTP_EXPIRE_MINUTES * 60)
+        self.cache.set(self._key(delivery_id), {
+            'status': QUEUED,
+            'phone': phone,
+            'attempts': 0,
+            'channel': None,
+            'confirmed': None,
+            'sid': None,
+            'error': None,
+            'createdAt': now,
+            'updatedAt': now,
+        }, timeout=self._ttl())
+        self.metrics.incr(QUEUED)
+        return delivery_id
+
+    def get(self, delivery_id: str) -> Optional[dict]:
+        return self.cache.get(self._key(delivery_id))
+
+    def pending_code(self, delivery_id: str) -> Optional[str]:
+        return self.cache.get(self._code_key(delivery_id))
+
+    def discard_code(self, delivery_id: str):
+        self.cache.delete(self._code_key(delivery_id))
+
+    def update(self, delivery_id: str, status: str, **fields) -> Optional[dict]:
+        # Only the task running this delivery writes the record, so read-modify-write is safe
+        record = self.get(delivery_id)
+        if record is None:
+            logger.warning(f"OTP delivery {delivery_id} expired before reaching '{status}'")
+            return None
+        record.update(fields, status=status, updatedAt=timezone.now().isoformat())
+        self.cache.set(self._key(delivery_id), record, timeout=self._ttl())
+        if status != SENDING:
+            self.metrics.incr(status)
+        return record
+
+
+delivery_status = DeliveryStatusStore()
+
+
+def retry_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter: uniform(0, min(cap, base * 2**attempt))"""
+    ceiling = min(settings.OTP_DELIVERY_BACKOFF_MAX_SECONDS,
+                  settings.OTP_DELIVERY_BACKOFF_SECONDS * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+
+# ITU-T E.164 country calling codes are prefix-free: these are the one- and
+# two-digit ones, every other code has three digits
+ONE_DIGIT_CALLING_CODES = {'1', '7'}
+TWO_DIGIT_CALLING_CODES = {
+    '20', '27', '30', '31', '32', '33', '34', '36', '39', '40', '41', '43', '44', '45', '46', '47', '48',
+    '49', '51', '52', '53', '54', '55', '56', '57', '58', '60', '61', '62', '63', '64', '65', '66', '81',
+    '82', '84', '86', '90', '91', '92', '93', '94', '95', '98',
+}
+
+
+def calling_code(phone: str) -> str:
+    """Country calling code of an E.164 number, e.g. '+919876543210' -> '91'"""
+    digits = ''.join(ch for ch in phone if ch.isdigit())
+    if not digits:
+        return 'unknown'
+    if digits[0] in ONE_DIGIT_CALLING_CODES:
+        return digits[0]
+    if digits[:2] in TWO_DIGIT_CALLING_CODES:
+        return digits[:2]
+    return digits[:3]
+
+
+CHANNEL_SERVICES = {
+    'whatsapp': WhatsAppService,
+    'sms': SMSService,
+}
+
+
+class ChannelStats:
+    """
+    Per country calling code and channel send outcomes in the shared cache. Counters
+    are bucketed by day and only today and yesterday are read, so a channel that
+    recovers (or degrades) is noticed within a day instead of being outvoted by history.
+    """
+
+    def __init__(self, cache_alias: Optional[str] = None):
+        self.cache_alias = cache_alias or settings.OTP_CACHE_ALIAS
+
+    def _metrics(self, prefix: str, channel: str, day) -> Metrics:
+        return Metrics(self.cache_alias, prefix=f"otp_channel:{prefix}:{channel}:{day.isoformat()}")
+
+    def record(self, prefix: str, channel: str, success: bool, latency_ms: float):
+        metrics = self._metrics(prefix, channel, timezone.now().date())
+        if success:
+            metrics.incr('sent')
+            metrics.incr('latency_ms_total', int(latency_ms))
+        else:
+            metrics.incr('failed')
+
+    def summary(self, prefix: str, channel: str) -> Dict[str, float]:
+        today = timezone.now().date()
+        totals = {'sent': 0, 'failed': 0, 'latency_ms_total': 0}
+        for day in (today, today - timedelta(days=1)):
+            counts = self._metrics(prefix, channel, day).get_many(list(totals))
+            for name in totals:
+                totals[name] += counts[name] or 0
+        return totals
+
+    def expected_cost_ms(self, prefix: str, channel: str) -> Optional[float]:
+        """
+        Mean latency of a successful send divided by the (smoothed) success rate,
+        i.e. the expected time to get the code out. None until there are enough samples.
+        """
+        totals = self.summary(prefix, channel)
+        attempts = totals['sent'] + totals['failed']
+        if attempts < settings.OTP_CHANNEL_MIN_SAMPLES or not totals['sent']:
+            return None
+        success_rate = (totals['sent'] + 1) / (attempts + 2)
+        return (totals['latency_ms_total'] / totals['sent']) / success_rate
+
+
+channel_stats = ChannelStats()
+
+_executors: Dict[int, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def _executor() -> ThreadPoolExecutor:
+    # Per PID, like the Twilio client: threads don't survive a fork
+    pid = os.getpid()
+    if pid not in _executors:
+        with _executors_lock:
+            if pid not in _executors:
+                _executors[pid] = ThreadPoolExecutor(max_workers=settings.OTP_HEDGE_MAX_WORKERS,
+                                                     thread_name_prefix='otp-hedge')
+    return _executors[pid]
+
+
+class HedgedOTPSender:
+    """
+    Sends an OTP on the preferred channel and, if it has not been delivered within
+    OTP_HEDGE_DELAY_SECONDS, also on the secondary channel, returning the first
+    confirmed delivery. Twilio accepting a message is not enough: its status is
+    polled until the channel's CONFIRMED_STATUSES (or a failure) are reported, so a
+    WhatsApp message to a number that cannot receive it falls back to SMS. A fast
+    failure fires the secondary at once. Most sends are confirmed inside the hedge
+    delay, so both channels are only paid for on the slow tail.
+
+    The preferred channel per country calling code is the one with the lowest
+    expected time to a successful send (see ChannelStats), falling back to the
+    order of OTP_DELIVERY_CHANNELS until enough outcomes are recorded.
+
+    When Celery runs tasks eagerly the send happens inside the initiate request, so
+    no status is polled: the first channel to accept the message wins, and the next
+    channel is only tried if it fails.
+    """
+
+    def __init__(self, stats: ChannelStats = channel_stats, confirm_delivery: Optional[bool] = None):
+        self.stats = stats
+        # None follows the Celery app: confirm only when sends run on a worker
+        self.confirm_delivery = confirm_delivery
+
+    def confirms_delivery(self) -> bool:
+        if self.confirm_delivery is not None:
+            return self.confirm_delivery
+        from ai_profile_backend.celery import app
+        return not app.conf.task_always_eager
+
+    def channel_order(self, prefix: str) -> List[str]:
+        services = {name: CHANNEL_SERVICES[name]() for name in settings.OTP_DELIVERY_CHANNELS}
+        configured = [name for name, service in services.items() if service.is_configured()]
+        # With nothing configured keep the development fallback of the first channel
+        channels = configured or list(services)[:1]
+
+        costs = {name: self.stats.expected_cost_ms(prefix, name) for name in channels}
+        if all(cost is not None for cost in costs.values()):
+            channels = sorted(channels, key=lambda name: costs[name])
+        return channels
+
+    def _send(self, channel: str, phone: str, otp_code: str, prefix: str, confirm: bool = True) -> dict:
+        started = time.perf_counter()
+        service = CHANNEL_SERVICES[channel]()
+        try:
+            result = service.send_otp(phone, otp_code)
+            if result['success']:
+                result = (self._await_delivery(service, result) if confirm
+                          else dict(result, confirmed=False, status=result.get('status')))
+        except Exception as e:
+            result = {'success': False, 'error': str(e), 'retryable': True}
+        latency_ms = (time.perf_counter() - started) * 1000
+        # Only confirmed deliveries count towards a channel's success rate, so
+        # unconfirmed eager sends would only skew it
+        if confirm:
+            self.stats.record(prefix, channel, result['success'] and result['confirmed'], latency_ms)
+        return dict(result, channel=channel, latency_ms=round(latency_ms, 1))
+
+    @staticmethod
+    def _await_delivery(service, result: dict) -> dict:
+        """
+        Poll an accepted message until its status is confirmed or undelivered, for at
+        most OTP_DELIVERY_CONFIRM_SECONDS. A message still pending after that stays
+        a success, marked unconfirmed.
+        """
+        sid = result.get('sid')
+        deadline = time.monotonic() + settings.OTP_DELIVERY_CONFIRM_SECONDS
+        status = None
+        while True:
+            try:
+                status, error_code = service.message_status(sid)
+            except Exception as e:
+                logger.warning(f"Could not fetch the status of message {sid}: {e}")
+            else:
+                if status in service.CONFIRMED_STATUSES:
+                    return dict(result, confirmed=True, status=status)
+                if status in UNDELIVERED_STATUSES:
+                    return {'success': False, 'sid': sid, 'status': status, 'retryable': False,
+                            'error': f"message {status} (Twilio error {error_code})"}
+            if time.monotonic() >= deadline:
+                return dict(result, confirmed=False, status=status)
+            time.sleep(settings.OTP_DELIVERY_POLL_SECONDS)
+
+    def send(self, phone: str, otp_code: str) -> dict:
+        prefix = calling_code(phone)
+        channels = self.channel_order(prefix)
+        executor = _executor()
+        confirm = self.confirms_delivery()
+
+        pending = {executor.submit(self._send, channels[0], phone, otp_code, prefix, confirm)}
+        backups = channels[1:]
+        failures = []
+        unconfirmed = None
+        hedged = False
+
+        while pending:
+            # Before the backup fires wait at most the hedge delay, afterwards for whichever finishes
+            timeout = settings.OTP_HEDGE_DELAY_SECONDS if backups else None
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                result = future.result()
+                if result['success'] and result['confirmed']:
+                    # A still-running loser finishes in the background and only feeds the stats
+                    logger.info(f"OTP for {phone} delivered via {result['channel']} in {result['latency_ms']}ms"
+                                f"{' (hedged)' if hedged else ''}")
+                    return dict(result, hedged=hedged)
+                if result['success'] and not confirm:
+                    logger.info(f"OTP for {phone} accepted via {result['channel']} in {result['latency_ms']}ms "
+                                f"(eager, delivery not confirmed)")
+                    return dict(result, hedged=hedged)
+                if result['success']:
+                    unconfirmed = unconfirmed or result
+                else:
+                    failures.append(result)
+
+            if backups and (not done or not pending):
+                # Slow, unconfirmed or failed: fire the next channel alongside whatever is still running
+                hedged = hedged or bool(pending)
+                pending.add(executor.submit(self._send, backups.pop(0), phone, otp_code, prefix, confirm))
+
+        if unconfirmed is not None:
+            # Accepted but never confirmed: sending again would only duplicate the code
+            logger.warning(f"OTP for {phone} accepted via {unconfirmed['channel']} but delivery is unconfirmed "
+                           f"(status {unconfirmed['status']})")
+            return dict(unconfirmed, hedged=hedged)
+
+        error = '; '.join(f"{r['channel']}: {r.get('error')}" for r in failures)
+        logger.error(f"OTP for {phone} failed on every channel: {error}")
+        return {
+            'success': False,
+            'channel': None,
+            'confirmed': False,
+            'hedged': hedged,
+            'error': error,
+            'retryable': any(r.get('retryable') for r in failures),
+        }
+
+
+otp_sender = HedgedOTPSender()
+
+
+def enqueue_otp_delivery(phone: str, otp_code: str) -> str:
+    """Record a queued delivery and hand the send to the task queue; returns the delivery id"""
+    from ..tasks import send_otp_task
+
+    delivery_id = delivery_status.create(phone, otp_code)
+    try:
+        # A send still queued when the code has expired is pointless
+        send_otp_task.apply_async(args=(delivery_id,), queue=settings.OTP_DELIVERY_QUEUE,
+                                  expires=settings.OTP_EXPIRE_MINUTES * 60)
+    except Exception as e:
+        # Broker down: the client sees a failed delivery and can request a new code
+        logger.error(f"Failed to enqueue OTP delivery {delivery_id} for {phone}: {e}")
+        delivery_status.discard_code(delivery_id)
+        delivery_status.update(delivery_id, FAILED, error='Could not queue the OTP message')
+    return delivery_id
@@ -0,0 +1,201 @@
+# profiles/services/otp_retention.py
+
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from typing import Callable, List, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ..models import PhoneOTP
+
+logger = logging.getLogger(__name__)
+
+PARTITION_PREFIX = f"{PhoneOTP._meta.db_table}_p"
+
+
+@dataclass
+class PurgeResult:
+    deleted: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+    created_partitions: List[str] = field(default_factory=list)
+    dropped_partitions: List[str] = field(default_factory=list)
+
+
+def retention_cutoff(retention_hours: Optional[float] = None) -> datetime:
+    """Rows that expired before this are past retention (used rows expire minutes after issue too)"""
+    hours = settings.OTP_RETENTION_HOURS if retention_hours is None else retention_hours
+    return timezone.now() - timedelta(hours=hours)
+
+
+def purge_expired_otps(batch_size: Optional[int] = None, pause_seconds: Optional[float] = None,
+                       retention_hours: Optional[float] = None, max_batches: Optional[int] = None,
+                       log: Callable[[str], None] = logger.info) -> PurgeResult:
+    """
+    Delete phone_otps rows past retention in bounded batches.
+
+    Each batch picks at most batch_size primary keys through the expires_at index
+    and deletes exactly those in its own short transaction, then sleeps
+    pause_seconds, so locks are held briefly and replicas and live OTP writes keep up.
+    On a partitioned table (see partition_phone_otps) upcoming daily partitions are
+    created and whole expired ones dropped first, leaving only the boundary day
+    for row deletes.
+    """
+    batch_size = batch_size or settings.OTP_PURGE_BATCH_SIZE
+    pause_seconds = settings.OTP_PURGE_PAUSE_SECONDS if pause_seconds is None else pause_seconds
+    cutoff = retention_cutoff(retention_hours)
+    started = time.monotonic()
+    result = PurgeResult()
+
+    if is_partitioned():
+        result.created_partitions = ensure_partitions()
+        result.dropped_partitions = drop_expired_partitions(cutoff)
+
+    expired = PhoneOTP.objects.filter(expires_at__lt=cutoff).order_by('expires_at')
+    while max_batches is None or result.batches < max_batches:
+        with transaction.atomic():
+            ids = list(expired.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            deleted, _ = PhoneOTP.objects.filter(id__in=ids).delete()
+
+        result.deleted += deleted
+        result.batches += 1
+        log(f"Purged batch {result.batches}: {deleted} rows ({result.deleted} total)")
+        if len(ids) < batch_size:
+            break
+        if pause_seconds:
+            time.sleep(pause_seconds)
+
+    result.seconds = round(time.monotonic() - started, 2)
+    return result
+
+
+# PostgreSQL range partitioning by created_at, one partition per UTC day
+
+def is_partitioned() -> bool:
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [PhoneOTP._meta.db_table],
+        )
+        return cursor.fetchone() is not None
+
+
+def partition_name(day: date) -> str:
+    return f"{PARTITION_PREFIX}{day:%Y%m%d}"
+
+
+def _day_start(day: date) -> datetime:
+    return datetime(day.year, day.month, day.day, tzinfo=dt_timezone.utc)
+
+
+def list_partitions() -> List[str]:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = %s ORDER BY c.relname",
+            [PhoneOTP._meta.db_table],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def ensure_partitions(days_ahead: Optional[int] = None, start: Optional[date] = None) -> List[str]:
+    """Create daily partitions from start (default today) through days_ahead days from now"""
+    days_ahead = settings.OTP_PARTITION_PREMAKE_DAYS if days_ahead is None else days_ahead
+    today = timezone.now().astimezone(dt_timezone.utc).date()
+    day = start or today
+    existing = set(list_partitions())
+    created = []
+    table = connection.ops.quote_name(PhoneOTP._meta.db_table)
+
+    with connection.cursor() as cursor:
+        while day <= today + timedelta(days=days_ahead):
+            name = partition_name(day)
+            if name not in existing:
+                cursor.execute(
+                    f"CREATE TABLE {connection.ops.quote_name(name)} PARTITION OF {table} "
+                    f"FOR VALUES FROM (%s) TO (%s)",
+                    [_day_start(day), _day_start(day + timedelta(days=1))],
+                )
+                created.append(name)
+            day += timedelta(days=1)
+    return created
+
+
+def drop_expired_partitions(cutoff: datetime) -> List[str]:
+    """
+    Drop daily partitions whose every row is past retention. Rows are partitioned
+    by created_at and expire OTP_EXPIRE_MINUTES later, so a day is droppable once
+    it ended that long before the cutoff.
+    """
+    max_lifetime = timedelta(minutes=settings.OTP_EXPIRE_MINUTES)
+    dropped = []
+    with connection.cursor() as cursor:
+        for name in list_partitions():
+            suffix = name[len(PARTITION_PREFIX):]
+            if not (name.startswith(PARTITION_PREFIX) and suffix.isdigit()):
+                continue  # the default partition
+            day = datetime.strptime(suffix, '%Y%m%d').date()
+            if _day_start(day + timedelta(days=1)) + max_lifetime <= cutoff:
+                cursor.execute(f"DROP TABLE {connection.ops.quote_name(name)}")
+                dropped.append(name)
+    if dropped:
+        logger.info(f"Dropped expired OTP partitions: {', '.join(dropped)}")
+    return dropped
+
+
+def convert_to_partitioned(days_ahead: Optional[int] = None, log: Callable[[str], None] = logger.info) -> int:
+    """
+    Rebuild phone_otps as a table range-partitioned by created_at, copying the
+    rows still within retention. Runs in one transaction and holds an exclusive
+    lock on phone_otps while copying, so run it in a quiet period.
+
+    The primary key becomes (id, created_at), as PostgreSQL requires the
+    partition key in it; Django keeps addressing rows by id.
+    """
+    if connection.vendor != 'postgresql':
+        raise ValueError("phone_otps partitioning needs PostgreSQL")
+    if is_partitioned():
+        raise ValueError("phone_otps is already partitioned")
+
+    table = PhoneOTP._meta.db_table
+    legacy = f"{table}_legacy"
+    qn = connection.ops.quote_name
+    cutoff = retention_cutoff()
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {qn(table)} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(f"ALTER TABLE {qn(table)} RENAME TO {qn(legacy)}")
+        # Index and constraint names are unique per schema; free them for the new table
+        cursor.execute(f"ALTER TABLE {qn(legacy)} RENAME CONSTRAINT {qn(table + '_pkey')} TO {qn(legacy + '_pkey')}")
+        for index in PhoneOTP._meta.indexes:
+            cursor.execute(f"ALTER INDEX IF EXISTS {qn(index.name)} RENAME TO {qn(index.name + '_legacy')}")
+        cursor.execute(
+            f"CREATE TABLE {qn(table)} (LIKE {qn(legacy)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            f"PARTITION BY RANGE (created_at)"
+        )
+        cursor.execute(f"ALTER TABLE {qn(table)} ADD PRIMARY KEY (id, created_at)")
+        with connection.schema_editor(atomic=False) as editor:
+            for index in PhoneOTP._meta.indexes:
+                editor.add_index(PhoneOTP, index)
+
+        cursor.execute(f"SELECT MIN(created_at) FROM {qn(legacy)} WHERE expires_at >= %s", [cutoff])
+        oldest = cursor.fetchone()[0]
+        created = ensure_partitions(days_ahead, start=oldest.astimezone(dt_timezone.utc).date() if oldest else None)
+        cursor.execute(f"CREATE TABLE {qn(table + '_default')} PARTITION OF {qn(table)} DEFAULT")
+
+        cursor.execute(f"INSERT INTO {qn(table)} SELECT * FROM {qn(legacy)} WHERE expires_at >= %s", [cutoff])
+        copied = cursor.rowcount
+        cursor.execute(f"DROP TABLE {qn(legacy)}")
+
+    log(f"Partitioned {table}: {len(created)} daily partitions, {copied} rows copied")
+    return copied
@@ -0,0 +1,256 @@
+# profiles/services/otp_store.py
+
+import atexit
+import hashlib
+import logging
+import secrets
+import threading
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import PhoneOTP
+
+logger = logging.getLogger(__name__)
+
+# Deletes the key only if it still holds the expected code, in one round trip
+COMPARE_AND_DELETE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def otp_digest(phone: str, otp_code: str) -> str:
+    """Codes are kept hashed in the cache so a cache dump does not leak live OTPs"""
+    payload = f"{phone}:{otp_code}:{settings.SECRET_KEY}".encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()
+
+
+class OTPAuditWriter:
+    """
+    Write-behind for PhoneOTP audit rows.
+
+    Issued and verified OTPs are buffered in memory and flushed by a background
+    thread every OTP_AUDIT_FLUSH_SECONDS (or once OTP_AUDIT_BATCH_SIZE events are
+    queued) as one UPDATE plus one bulk INSERT per batch, instead of several
+    statements per request. With OTP_AUDIT_FLUSH_SECONDS=0 rows are written inline.
+    """
+
+    def __init__(self):
+        self._issued: List[PhoneOTP] = []
+        self._verified: List[Tuple[str, str]] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def inline(self) -> bool:
+        return settings.OTP_AUDIT_FLUSH_SECONDS <= 0
+
+    def record_issued(self, phone: str, otp_code: str, expires_at):
+        self._enqueue(issued=PhoneOTP(phone=phone, otp=otp_code, expires_at=expires_at))
+
+    def record_verified(self, phone: str, otp_code: str):
+        self._enqueue(verified=(phone, otp_code))
+
+    def _enqueue(self, issued=None, verified=None):
+        with self._lock:
+            if issued is not None:
+                self._issued.append(issued)
+            if verified is not None:
+                self._verified.append(verified)
+            pending = len(self._issued) + len(self._verified)
+
+        if self.inline:
+            self.flush()
+            return
+
+        self._ensure_thread()
+        if pending >= settings.OTP_AUDIT_BATCH_SIZE:
+            self._wakeup.set()
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='otp-audit-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(settings.OTP_AUDIT_FLUSH_SECONDS)
+            self._wakeup.clear()
+            self.flush()
+            # Connections are per thread; don't hold one open between flushes
+            connections.close_all()
+
+    def flush(self) -> int:
+        with self._lock:
+            issued, self._issued = self._issued, []
+            verified, self._verified = self._verified, []
+
+        if not issued and not verified:
+            return 0
+
+        try:
+            if issued:
+                # A new code supersedes every earlier unused one for the phone,
+                # including earlier codes in this same batch
+                latest = {row.phone: row for row in issued}
+                for row in issued:
+                    row.is_used = row is not latest[row.phone]
+                PhoneOTP.objects.filter(phone__in=latest.keys(), is_used=False).update(is_used=True)
+                PhoneOTP.objects.bulk_create(issued, batch_size=settings.OTP_AUDIT_BATCH_SIZE)
+            if verified:
+                matches = reduce(or_, (Q(phone=phone, otp=code) for phone, code in verified))
+                PhoneOTP.objects.filter(matches).update(is_used=True)
+        except Exception as e:
+            logger.error(f"Failed to write {len(issued)} OTP audit rows: {e}")
+            return 0
+
+        logger.info(f"Wrote OTP audit batch: {len(issued)} issued, {len(verified)} verified")
+        return len(issued) + len(verified)
+
+
+audit_writer = OTPAuditWriter()
+atexit.register(audit_writer.flush)
+
+
+class DatabaseOTPStore:
+    """Today's behaviour: every OTP lives in the phone_otps table"""
+
+    name = 'db'
+
+    def issue(self, phone: str, otp_code: str, expire_minutes: int):
+        # Mark old OTPs as used
+        PhoneOTP.objects.filter(phone=phone, is_used=False).update(is_used=True)
+        PhoneOTP.objects.create(
+            phone=phone,
+            otp=otp_code,
+            expires_at=timezone.now() + timedelta(minutes=expire_minutes)
+        )
+
+    def verify(self, phone: str, otp_code: str) -> bool:
+        # One conditional UPDATE consumes the code: of two concurrent verifies only
+        # the first matches is_used=False, the other updates nothing
+        consumed = PhoneOTP.objects.filter(
+            phone=phone,
+            otp=otp_code,
+            is_used=False,
+            expires_at__gt=timezone.now()
+        ).update(is_used=True)
+        return consumed > 0
+
+
+class CacheOTPStore:
+    """
+    Live OTPs in a shared cache with native TTL; the database only sees audit rows.
+
+    Issuing overwrites the phone's key, which supersedes any earlier code.
+    Verification must consume the code exactly once: each issued code carries a
+    nonce, and the one verifier whose add() creates that nonce's claim marker wins.
+    That is only as atomic as the backend's add(), so file-based caches (an
+    exists-then-write) are refused; RedisOTPStore compares and deletes in one script.
+    """
+
+    name = 'cache'
+
+    def __init__(self, cache_alias: Optional[str] = None, audit: OTPAuditWriter = audit_writer):
+        self.cache = caches[cache_alias or settings.OTP_CACHE_ALIAS]
+        if isinstance(self.cache, FileBasedCache):
+            raise ImproperlyConfigured(
+                "OTP_STORE_BACKEND=cache needs a cache with an atomic add() (Redis, Memcached, "
+                "database); the file-based 'otp' cache could let one code verify twice"
+            )
+        self.audit = audit
+
+    @staticmethod
+    def _key(phone: str) -> str:
+        return f"otp:{phone}"
+
+    def issue(self, phone: str, otp_code: str, expire_minutes: int):
+        self._store(self._key(phone), otp_digest(phone, otp_code), expire_minutes * 60)
+        self.audit.record_issued(phone, otp_code, timezone.now() + timedelta(minutes=expire_minutes))
+
+    def verify(self, phone: str, otp_code: str) -> bool:
+        if not self._consume(self._key(phone), otp_digest(phone, otp_code)):
+            return False
+        self.audit.record_verified(phone, otp_code)
+        return True
+
+    def _store(self, key: str, digest: str, ttl: int):
+        self.cache.set(key, f"{secrets.token_hex(8)}:{ttl}:{digest}", timeout=ttl)
+
+    def _consume(self, key: str, digest: str) -> bool:
+        value = self.cache.get(key)
+        if not value:
+            return False
+        nonce, ttl, stored = value.split(':', 2)
+        if stored != digest:
+            return False
+        # The code key is left to expire: deleting it here could drop a newer code
+        # issued since the get(), so the claim marker outlives it instead
+        return self.cache.add(f"{key}:claimed:{nonce}", 1, timeout=int(ttl))
+
+
+_redis_client = None
+_redis_lock = threading.Lock()
+
+
+def get_redis_client():
+    """Per-process redis-py client (with its own connection pool) for REDIS_URL"""
+    global _redis_client
+    if _redis_client is None:
+        with _redis_lock:
+            if _redis_client is None:
+                import redis
+                _redis_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _redis_client
+
+
+class RedisOTPStore(CacheOTPStore):
+    """Cache store on Redis, verifying with a server-side compare-and-delete script"""
+
+    name = 'redis'
+
+    def __init__(self, client=None, audit: OTPAuditWriter = audit_writer):
+        self.client = client or get_redis_client()
+        self.audit = audit
+        self._compare_and_delete = self.client.register_script(COMPARE_AND_DELETE)
+
+    @staticmethod
+    def _key(phone: str) -> str:
+        return f"ai_profile:otp:{phone}"
+
+    def _store(self, key: str, digest: str, ttl: int):
+        self.client.set(key, digest, ex=ttl)
+
+    def _consume(self, key: str, digest: str) -> bool:
+        return bool(self._compare_and_delete(keys=[key], args=[digest]))
+
+
+OTP_STORES = {
+    DatabaseOTPStore.name: DatabaseOTPStore,
+    CacheOTPStore.name: CacheOTPStore,
+    RedisOTPStore.name: RedisOTPStore,
+}
+
+
+def get_otp_store():
+    backend = settings.OTP_STORE_BACKEND
+    try:
+        return OTP_STORES[backend]()
+    except KeyError:
+        raise ValueError(f"Unknown OTP_STORE_BACKEND '{backend}', expected one of {sorted(OTP_STORES)}")
@@ -0,0 +1,65 @@
+# profiles/services/profile_cache.py
+
+import logging
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import http_date
+
+from ..models import StudentProfile
+
+logger = logging.getLogger(__name__)
+
+# Cached "no verified profile" marker, so polling before verification stays off the database too
+NOT_FOUND = {'found': False}
+
+
+def _key(phone: str) -> str:
+    return f"profile_detail:{phone}"
+
+
+def profile_etag(profile: StudentProfile) -> str:
+    return f'"{profile.pk.hex}-{int(profile.updated_at.timestamp() * 1_000_000)}"'
+
+
+def get_profile_entry(phone: str) -> Optional[dict]:
+    """
+    Serialized verified profile with its ETag and Last-Modified, read through the
+    default cache. Entries are dropped by invalidate_profile on every write.
+    """
+    entry = cache.get(_key(phone))
+    if entry is None:
+        entry = _load(phone)
+        timeout = settings.PROFILE_CACHE_TTL if entry['found'] else settings.PROFILE_CACHE_MISS_TTL
+        cache.set(_key(phone), entry, timeout)
+    return entry if entry['found'] else None
+
+
+def _load(phone: str) -> dict:
+    from ..serializers import StudentProfileSerializer
+
+    profile = StudentProfile.objects.filter(phone=phone, is_verified=True).first()
+    if profile is None:
+        return NOT_FOUND
+    return {
+        'found': True,
+        'profile': dict(StudentProfileSerializer(profile).data),
+        'etag': profile_etag(profile),
+        'last_modified': int(profile.updated_at.timestamp()),
+    }
+
+
+def last_modified_header(entry: dict) -> str:
+    return http_date(entry['last_modified'])
+
+
+def invalidate_profile(*phones: str):
+    keys = [_key(phone) for phone in phones if phone]
+    if not keys:
+        return
+    try:
+        cache.delete_many(keys)
+    except Exception as e:
+        # Entries then age out within PROFILE_CACHE_TTL
+        logger.error(f"Failed to invalidate cached profiles {phones}: {e}")
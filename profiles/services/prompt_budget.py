@@ -0,0 +1,196 @@
+# profiles/services/prompt_budget.py
+
+import logging
+import math
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+
+from .metrics import BufferedMetrics
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional dependency
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+# Chat format overhead: every message costs a few tokens beyond its content
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+# Fallback tokenizer: words, digit groups, single punctuation marks and runs of
+# whitespace, roughly the way BPE vocabularies split English text
+HEURISTIC_PATTERN = re.compile(r"[^\W\d_]+|\d{1,3}|[^\w\s]|\s{2,}")
+
+
+@lru_cache(maxsize=8)
+def _get_encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # tiktoken downloads its vocabulary on first use; stay usable offline
+        logger.warning(f"tiktoken encoding for {model} unavailable, using heuristic token counts: {e}")
+        return None
+
+
+def _heuristic_count(text: str) -> int:
+    count = 0
+    for piece in HEURISTIC_PATTERN.findall(text):
+        if piece[0].isalpha():
+            count += max(1, math.ceil(len(piece) / 6))
+        else:
+            count += 1
+    return count
+
+
+def count_tokens(text: str, model: str = DEFAULT_MODEL) -> int:
+    """Number of tokens `text` encodes to for `model`"""
+    if not text:
+        return 0
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return _heuristic_count(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages: List[Dict[str, str]], model: str = DEFAULT_MODEL) -> int:
+    """Prompt tokens of a chat completion request"""
+    return sum(TOKENS_PER_MESSAGE + count_tokens(m.get('content', ''), model) for m in messages) + TOKENS_PER_REPLY
+
+
+@dataclass
+class PromptSection:
+    name: str
+    rows: List[str]
+    priority: int
+    separator: str = "\n"
+    max_rows: Optional[int] = None
+    row_overhead: int = 0
+    # Builds a line standing in for rows that did not fit, e.g. "...and 12 more courses"
+    summarize: Optional[Callable[[int], str]] = None
+
+
+@dataclass
+class AssembledPrompt:
+    budget: int
+    reserved_tokens: int
+    rows: Dict[str, List[str]] = field(default_factory=dict)
+    summaries: Dict[str, str] = field(default_factory=dict)
+    dropped: Dict[str, int] = field(default_factory=dict)
+    section_tokens: Dict[str, int] = field(default_factory=dict)
+    separators: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def tokens(self) -> int:
+        return self.reserved_tokens + sum(self.section_tokens.values())
+
+    @property
+    def truncated(self) -> bool:
+        return any(self.dropped.values())
+
+    def text(self, name: str, empty: str = "") -> str:
+        lines = list(self.rows.get(name, []))
+        if self.summaries.get(name):
+            lines.append(self.summaries[name])
+        return self.separators.get(name, "\n").join(lines) if lines else empty
+
+
+class PromptAssembler:
+    """
+    Fits variable prompt sections into a per-endpoint token budget.
+
+    Fixed text (instructions, the user's message) is reserved first. Sections are
+    then filled in priority order (lowest number first), each row in the order
+    given, until the budget is spent; rows that do not fit are dropped, optionally
+    replaced by a one-line summary. Token counts use tiktoken when available.
+    """
+
+    def __init__(self, budget: int, endpoint: str, model: str = DEFAULT_MODEL):
+        self.budget = budget
+        self.endpoint = endpoint
+        self.model = model
+        self.reserved_tokens = 0
+        self.sections: List[PromptSection] = []
+
+    def count(self, text: str) -> int:
+        return count_tokens(text, self.model)
+
+    def reserve(self, text: str = "", tokens: int = 0) -> int:
+        """Account for text that is always sent"""
+        self.reserved_tokens += self.count(text) + tokens
+        return self.reserved_tokens
+
+    def add_section(self, name: str, rows: List[str], priority: int, **options) -> PromptSection:
+        section = PromptSection(name=name, rows=[row for row in rows if row], priority=priority, **options)
+        self.sections.append(section)
+        return section
+
+    def assemble(self) -> AssembledPrompt:
+        result = AssembledPrompt(budget=self.budget, reserved_tokens=self.reserved_tokens)
+        remaining = self.budget - self.reserved_tokens
+
+        for section in sorted(self.sections, key=lambda s: s.priority):
+            separator_cost = self.count(section.separator.strip()) if section.separator.strip() else 0
+            candidates = section.rows if section.max_rows is None else section.rows[:section.max_rows]
+            kept, costs = [], []
+
+            for row in candidates:
+                cost = self.count(row) + section.row_overhead + (separator_cost if kept else 0)
+                if cost > remaining:
+                    break
+                kept.append(row)
+                costs.append(cost)
+                remaining -= cost
+
+            dropped = len(section.rows) - len(kept)
+            summary = ""
+            if dropped and section.summarize is not None:
+                # Make room for the summary line by giving back the last rows if needed
+                while True:
+                    summary = section.summarize(dropped)
+                    summary_cost = self.count(summary) + separator_cost
+                    if summary_cost <= remaining or not kept:
+                        break
+                    kept.pop()
+                    remaining += costs.pop()
+                    dropped += 1
+                if summary_cost > remaining:
+                    summary = ""
+                else:
+                    remaining -= summary_cost
+                    costs.append(summary_cost)
+
+            result.rows[section.name] = kept
+            result.summaries[section.name] = summary
+            result.dropped[section.name] = dropped
+            result.section_tokens[section.name] = sum(costs)
+            result.separators[section.name] = section.separator
+
+        return result
+
+    def record(self, messages: List[Dict[str, str]], assembled: Optional[AssembledPrompt] = None) -> int:
+        """
+        Count the final request's prompt tokens and report them as metrics. Async
+        chatbot requests call this on the event loop, so the counters are buffered.
+        """
+        tokens = count_message_tokens(messages, self.model)
+        metrics = BufferedMetrics(settings.AI_FILTER_CACHE_ALIAS, prefix=f'prompt_tokens:{self.endpoint}')
+        metrics.incr('prompts')
+        metrics.incr('tokens', tokens)
+        if assembled is not None and assembled.truncated:
+            metrics.incr('truncated')
+
+        dropped = {name: n for name, n in (assembled.dropped if assembled else {}).items() if n}
+        logger.info(f"Prompt for {self.endpoint}: {tokens} tokens (budget {self.budget})"
+                    + (f", dropped rows {dropped}" if dropped else ""))
+        return tokens
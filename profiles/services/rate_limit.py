@@ -0,0 +1,103 @@
+# profiles/services/rate_limit.py
+
+import logging
+import math
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    count: float
+    limit: int
+    retry_after: int = 0
+    key: Optional[str] = None  # counter an allowed hit was added to, for release()
+
+
+class SlidingWindowRateLimiter:
+    """
+    Sliding-window counter over a shared cache.
+
+    Each identity has one counter per fixed window; the current rate is the
+    current window's count plus the previous window's count weighted by how much
+    of it still overlaps the sliding window. Only allowed hits count: a hit over
+    the budget is taken back at once, so retrying while limited does not extend
+    the wait. On Redis incr/decr are atomic (INCRBY), so concurrent workers never
+    lose a hit; on the file and database cache fallbacks they are read-modify-write,
+    so a concurrent burst can slip a few hits past the limit.
+    """
+
+    def __init__(self, scope: str, limit: int, window_seconds: int, cache_alias: Optional[str] = None):
+        self.scope = scope
+        self.limit = limit
+        self.window = window_seconds
+        self.cache = caches[cache_alias or settings.RATE_LIMIT_CACHE_ALIAS]
+
+    def _key(self, identity: str, window_index: int) -> str:
+        return f"ratelimit:{self.scope}:{identity}:{window_index}"
+
+    def _incr(self, key: str) -> int:
+        # add() is a no-op when the counter exists; the TTL covers this window and the next
+        self.cache.add(key, 0, timeout=2 * self.window)
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # Expired between add() and incr()
+            self.cache.add(key, 1, timeout=2 * self.window)
+            return 1
+
+    def hit(self, identity: str, now: Optional[float] = None) -> RateLimitResult:
+        now = time.time() if now is None else now
+        window_index = int(now // self.window)
+        elapsed = now - window_index * self.window
+
+        try:
+            current = self._incr(self._key(identity, window_index))
+            previous = self.cache.get(self._key(identity, window_index - 1), 0)
+        except Exception as e:
+            # Fail open: a cache outage must not block every signup
+            logger.warning(f"Rate limiter for {self.scope} unavailable: {e}")
+            return RateLimitResult(True, 0, self.limit)
+
+        key = self._key(identity, window_index)
+        overlap = 1 - elapsed / self.window
+        count = previous * overlap + current
+        if count <= self.limit:
+            return RateLimitResult(True, count, self.limit, key=key)
+
+        # Over budget: take the hit back, so only allowed hits ever count
+        self._decr(key)
+        return RateLimitResult(False, count - 1, self.limit, self._retry_after(previous, current - 1, elapsed))
+
+    def release(self, result: RateLimitResult):
+        """Take back an allowed hit whose action did not happen after all"""
+        if result.allowed and result.key:
+            self._decr(result.key)
+
+    def _decr(self, key: str):
+        try:
+            self.cache.decr(key)
+        except Exception as e:
+            # Expired meanwhile (nothing to take back) or the cache is down
+            logger.warning(f"Rate limiter for {self.scope} could not release a hit: {e}")
+
+    def _retry_after(self, previous: int, current: int, elapsed: float) -> int:
+        """Seconds until one more hit fits in the budget, given the counted (allowed) hits"""
+        room = self.limit - 1
+        if current <= room and previous:
+            # Wait for enough of the previous window to slide out
+            fraction = 1 - (room - current) / previous
+            wait = fraction * self.window - elapsed
+        else:
+            # The current window alone is over budget: wait for it to become the
+            # previous window and slide out far enough
+            fraction = 1 - room / current if current else 0
+            wait = (self.window - elapsed) + max(0.0, fraction) * self.window
+        return max(1, math.ceil(wait))
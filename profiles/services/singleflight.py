@@ -0,0 +1,220 @@
+# profiles/services/singleflight.py
+
+import asyncio
+import copy
+import logging
+import threading
+import time
+import uuid
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from .metrics import BufferedMetrics
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one execution.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is in flight wait for its result instead of repeating the
+    work. In distributed mode the leader also holds a lock in the shared cache
+    and publishes its result there, so duplicates in other workers poll for it.
+    Followers give up waiting after `timeout` seconds and run the function
+    themselves, so a stuck leader never blocks them for good. A cancelled async
+    leader (e.g. its client disconnected) does not cancel its followers: one of
+    them takes over as leader.
+    """
+
+    def __init__(self, namespace: str, timeout: Optional[float] = None, distributed: Optional[bool] = None,
+                 cache_alias: Optional[str] = None, poll_interval: Optional[float] = None):
+        self.namespace = namespace
+        self.timeout = settings.AI_SINGLEFLIGHT_TIMEOUT if timeout is None else timeout
+        self.distributed = settings.AI_SINGLEFLIGHT_DISTRIBUTED if distributed is None else distributed
+        self.poll_interval = settings.AI_SINGLEFLIGHT_POLL_INTERVAL if poll_interval is None else poll_interval
+        self.cache_alias = cache_alias or settings.AI_FILTER_CACHE_ALIAS
+        # Buffered: ado() bumps these on the event loop
+        self.metrics = BufferedMetrics(self.cache_alias, prefix=f'singleflight:{namespace}')
+
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        # asyncio futures are bound to their event loop, so async flights are tracked per loop
+        self._async_calls: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Future]]' = \
+            weakref.WeakKeyDictionary()
+
+    # ── Shared-cache lock and result ────────────────────────────────────
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def _lock_key(self, key: str) -> str:
+        return f"singleflight:{self.namespace}:lock:{key}"
+
+    def _result_key(self, key: str) -> str:
+        return f"singleflight:{self.namespace}:result:{key}"
+
+    def _acquire(self, key: str) -> Optional[str]:
+        token = uuid.uuid4().hex
+        try:
+            return token if self.cache.add(self._lock_key(key), token, timeout=max(1, int(self.timeout))) else None
+        except Exception as e:
+            logger.warning(f"Single-flight lock failed, running uncoordinated: {e}")
+            return token
+
+    def _release(self, key: str, token: str):
+        try:
+            if self.cache.get(self._lock_key(key)) == token:
+                self.cache.delete(self._lock_key(key))
+        except Exception as e:
+            logger.warning(f"Single-flight unlock failed: {e}")
+
+    def _publish(self, key: str, result: Any):
+        try:
+            self.cache.set(self._result_key(key), result, timeout=max(1, int(self.timeout)))
+        except Exception as e:
+            logger.warning(f"Single-flight publish failed: {e}")
+
+    def _peek(self, key: str) -> Any:
+        try:
+            return self.cache.get(self._result_key(key))
+        except Exception as e:
+            logger.warning(f"Single-flight result read failed: {e}")
+            return None
+
+    # ── Sync ────────────────────────────────────────────────────────────
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Run `fn` once per key across concurrent callers and return its result"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            self.metrics.incr('followers')
+            if not call.event.wait(self.timeout):
+                self.metrics.incr('timeouts')
+                logger.warning(f"Single-flight leader for {key} exceeded {self.timeout}s, calling directly")
+                return fn()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        self.metrics.incr('leaders')
+        try:
+            call.result = self._lead(key, fn) if self.distributed else fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def _lead(self, key: str, fn: Callable[[], Any]) -> Any:
+        deadline = time.monotonic() + self.timeout
+        while True:
+            shared = self._peek(key)
+            if shared is not None:
+                self.metrics.incr('remote_followers')
+                return shared
+
+            token = self._acquire(key)
+            if token is not None:
+                try:
+                    result = fn()
+                    self._publish(key, result)
+                    return result
+                finally:
+                    self._release(key, token)
+
+            if time.monotonic() >= deadline:
+                self.metrics.incr('timeouts')
+                logger.warning(f"Single-flight lock for {key} held past {self.timeout}s, calling directly")
+                return fn()
+            time.sleep(self.poll_interval)
+
+    # ── Async ───────────────────────────────────────────────────────────
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Async variant of do(); `fn` returns a fresh awaitable"""
+        loop = asyncio.get_running_loop()
+        calls = self._async_calls.setdefault(loop, {})
+
+        future = calls.get(key)
+        if future is not None:
+            self.metrics.incr('followers')
+            try:
+                result = await asyncio.wait_for(asyncio.shield(future), self.timeout)
+            except asyncio.TimeoutError:
+                self.metrics.incr('timeouts')
+                logger.warning(f"Single-flight leader for {key} exceeded {self.timeout}s, calling directly")
+                return await fn()
+            except asyncio.CancelledError:
+                # Either this caller was cancelled, or the leader was and left the key free
+                if not future.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                logger.info(f"Single-flight leader for {key} was cancelled, retrying")
+                return await self.ado(key, fn)
+            return copy.deepcopy(result)
+
+        future = calls[key] = loop.create_future()
+        self.metrics.incr('leaders')
+        try:
+            result = await (self._alead(key, fn) if self.distributed else fn())
+        except Exception as e:
+            future.set_exception(e)
+            # Followers re-raise it; keep asyncio from warning when there are none
+            future.exception()
+            raise
+        except BaseException:
+            # Cancelled, e.g. the client went away: followers retry rather than fail with it
+            future.cancel()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if calls.get(key) is future:
+                del calls[key]
+
+    async def _alead(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        deadline = time.monotonic() + self.timeout
+        while True:
+            shared = await sync_to_async(self._peek, thread_sensitive=False)(key)
+            if shared is not None:
+                self.metrics.incr('remote_followers')
+                return shared
+
+            token = await sync_to_async(self._acquire, thread_sensitive=False)(key)
+            if token is not None:
+                try:
+                    result = await fn()
+                    await sync_to_async(self._publish, thread_sensitive=False)(key, result)
+                    return result
+                finally:
+                    await sync_to_async(self._release, thread_sensitive=False)(key, token)
+
+            if time.monotonic() >= deadline:
+                self.metrics.incr('timeouts')
+                logger.warning(f"Single-flight lock for {key} held past {self.timeout}s, calling directly")
+                return await fn()
+            await asyncio.sleep(self.poll_interval)
@@ -1,14 +1,18 @@
 import logging
 import json
 from django.conf import settings
-from twilio.rest import Client
+
+from .messaging_client import fetch_message_status, get_twilio_client, is_retryable_error
 
 logger = logging.getLogger(__name__)
 
 
 class SMSService:
     """Service for sending SMS via Twilio with fallback for development"""
-    
+
+    # Many carriers never return delivery receipts, so handing off to the carrier counts
+    CONFIRMED_STATUSES = frozenset({'sent', 'delivered'})
+
     def __init__(self):
         self.twilio_client = None
         if all([
@@ -17,11 +21,8 @@ class SMSService:
             settings.TWILIO_PHONE_NUMBER
         ]):
             try:
-                self.twilio_client = Client(
-                    settings.TWILIO_ACCOUNT_SID,
-                    settings.TWILIO_AUTH_TOKEN
-                )
-                logger.info("Twilio client initialized successfully")
+                # Shared per-process client, so sends reuse pooled connections
+                self.twilio_client = get_twilio_client()
             except Exception as e:
                 logger.error(f"Failed to initialize Twilio client: {e}")
         else:
@@ -48,7 +49,8 @@ class SMSService:
                 logger.error(f"Failed to send SMS to {phone}: {e}")
                 return {
                     'success': False,
-                    'error': str(e)
+                    'error': str(e),
+                    'retryable': is_retryable_error(e)
                 }
         else:
             # Development fallback - log to console
@@ -59,6 +61,12 @@ class SMSService:
                 'otp_code': otp_code  # Only for development
             }
     
+    def message_status(self, sid):
+        """(status, error_code) of a sent SMS; development sends count as delivered"""
+        if not self.twilio_client:
+            return 'delivered', None
+        return fetch_message_status(self.twilio_client, sid)
+
     def is_configured(self):
         """Check if SMS service is properly configured"""
         return self.twilio_client is not None
\ No newline at end of file
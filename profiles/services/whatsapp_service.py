@@ -1,6 +1,7 @@
 import logging
 from django.conf import settings
-from twilio.rest import Client
+
+from .messaging_client import fetch_message_status, get_twilio_client, is_retryable_error
 
 logger = logging.getLogger(__name__)
 
@@ -10,6 +11,10 @@ class WhatsAppService:
     WhatsApp OTP service using Twilio
     """
 
+    # Twilio accepts messages to numbers that cannot receive them (no WhatsApp account,
+    # sandbox not joined) and only reports that later, so only delivery counts
+    CONFIRMED_STATUSES = frozenset({'delivered', 'read'})
+
     def __init__(self):
         self.client = None
 
@@ -19,11 +24,8 @@ class WhatsAppService:
             settings.TWILIO_WHATSAPP_NUMBER
         ]):
             try:
-                self.client = Client(
-                    settings.TWILIO_ACCOUNT_SID,
-                    settings.TWILIO_AUTH_TOKEN
-                )
-                logger.info("WhatsApp client initialized")
+                # Shared per-process client, so sends reuse pooled connections
+                self.client = get_twilio_client()
             except Exception as e:
                 logger.error(f"WhatsApp init failed: {e}")
         else:
@@ -39,8 +41,7 @@ class WhatsAppService:
             try:
                 message = self.client.messages.create(
                     body=message_body,
-                    # from_=f"whatsapp:{settings.TWILIO_WHATSAPP_NUMBER}",
-                    from_="whatsapp:+14155238886",
+                    from_=f"whatsapp:{settings.TWILIO_WHATSAPP_NUMBER}",
                     to=f"whatsapp:{phone}"
                 )
 
@@ -55,7 +56,8 @@ class WhatsAppService:
                 logger.error(f"WhatsApp send failed: {e}")
                 return {
                     "success": False,
-                    "error": str(e)
+                    "error": str(e),
+                    "retryable": is_retryable_error(e)
                 }
 
         else:
@@ -65,5 +67,11 @@ class WhatsAppService:
                 "otp_code": otp_code
             }
 
+    def message_status(self, sid):
+        """(status, error_code) of a sent message; development sends count as delivered"""
+        if not self.client:
+            return 'delivered', None
+        return fetch_message_status(self.client, sid)
+
     def is_configured(self):
         return self.client is not None
@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .models import StudentProfile
+from .services.profile_cache import invalidate_profile
+
+
+@receiver(post_init, sender=StudentProfile)
+def remember_loaded_phone(sender, instance, **kwargs):
+    # Lets an edit that changes the phone also drop the entry under the old one
+    instance._loaded_phone = instance.phone
+
+
+@receiver(post_save, sender=StudentProfile)
+@receiver(post_delete, sender=StudentProfile)
+def invalidate_cached_profile(sender, instance, **kwargs):
+    invalidate_profile(instance.phone, getattr(instance, '_loaded_phone', None))
+    instance._loaded_phone = instance.phone
@@ -0,0 +1,117 @@
+# profiles/tasks.py
+
+import logging
+
+from celery import shared_task
+from django.conf import settings
+
+from .services.otp_delivery import FAILED, RETRYING, SENDING, SENT, delivery_status, otp_sender, retry_delay
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, acks_late=True, reject_on_worker_lost=True)
+def send_otp_task(self, delivery_id):
+    """
+    Send one OTP through the hedged WhatsApp/SMS sender. The phone and code are read
+    from the delivery record, so the message only carries its id. Retryable failures
+    (Twilio 429/5xx, network errors) are retried up to OTP_DELIVERY_MAX_RETRIES times
+    with jittered exponential backoff; after that, or on a permanent failure, the
+    delivery is marked failed and dead-lettered.
+    """
+    record = delivery_status.get(delivery_id)
+    otp_code = delivery_status.pending_code(delivery_id)
+    if record is None or otp_code is None:
+        logger.warning(f"OTP delivery {delivery_id} expired before it was sent")
+        return {'status': FAILED, 'attempts': self.request.retries}
+
+    phone = record['phone']
+    attempt = self.request.retries + 1
+    delivery_status.update(delivery_id, SENDING, attempts=attempt)
+
+    result = otp_sender.send(phone, otp_code)
+    if result['success']:
+        delivery_status.discard_code(delivery_id)
+        delivery_status.update(delivery_id, SENT, channel=result['channel'], hedged=result['hedged'],
+                               confirmed=result['confirmed'], sid=result.get('sid'), error=None)
+        return {'status': SENT, 'attempts': attempt, 'channel': result['channel']}
+
+    error = result.get('error')
+    if result.get('retryable') and self.request.retries < settings.OTP_DELIVERY_MAX_RETRIES:
+        countdown = retry_delay(self.request.retries)
+        delivery_status.update(delivery_id, RETRYING, error=error)
+        logger.warning(f"OTP delivery {delivery_id} attempt {attempt} failed, retrying in {countdown:.1f}s: {error}")
+        raise self.retry(countdown=countdown, max_retries=settings.OTP_DELIVERY_MAX_RETRIES)
+
+    delivery_status.discard_code(delivery_id)
+    delivery_status.update(delivery_id, FAILED, error=error)
+    otp_delivery_dead_letter.apply_async(args=(delivery_id, phone, error, attempt),
+                                         queue=settings.OTP_DEAD_LETTER_QUEUE)
+    return {'status': FAILED, 'attempts': attempt}
+
+
+@shared_task
+def otp_delivery_dead_letter(delivery_id, phone, error, attempts):
+    """
+    Terminal failures land on OTP_DEAD_LETTER_QUEUE, which regular workers do not
+    consume, so they can be inspected (or drained by a worker started with
+    -Q <dead letter queue>). The code itself is not carried: it expires within
+    minutes and the user can request a new one.
+    """
+    logger.error(f"OTP delivery {delivery_id} to {phone} dead-lettered after {attempts} attempt(s): {error}")
+    delivery_status.metrics.incr('dead_lettered')
+
+
+@shared_task
+def purge_expired_otps_task():
+    """Scheduled by CELERY_BEAT_SCHEDULE; see profiles.services.otp_retention"""
+    from .services.otp_retention import purge_expired_otps
+
+    result = purge_expired_otps()
+    logger.info(f"OTP retention: purged {result.deleted} rows in {result.batches} batches ({result.seconds}s), "
+                f"partitions created {result.created_partitions or 'none'}, "
+                f"dropped {result.dropped_partitions or 'none'}")
+    return {'deleted': result.deleted, 'batches': result.batches}
+
+
+@shared_task(acks_late=True)
+def ingest_catalog_task(job_id, fmt, name):
+    """Ingest a catalog spooled by CatalogImportView; the job record is what the admin polls"""
+    from .services.catalog_ingest import (
+        IngestError, discard_spooled_upload, ingest_catalog, open_spooled_upload, update_import_job,
+    )
+
+    update_import_job(job_id, 'running')
+    try:
+        with open_spooled_upload(job_id) as stream:
+            result = ingest_catalog(stream, fmt=fmt, name=name)
+    except (OSError, IngestError) as e:
+        logger.error(f"Catalog import {job_id} ({name}) failed: {e}")
+        update_import_job(job_id, 'failed', error=str(e))
+        return {'status': 'failed'}
+    except Exception as e:
+        update_import_job(job_id, 'failed', error='Server error occurred')
+        logger.error(f"Catalog import {job_id} ({name}) crashed: {e}")
+        raise
+    finally:
+        discard_spooled_upload(job_id)
+
+    logger.info(f"Catalog import {job_id} ({name}): {result.upserted} upserted, {result.rejected} rejected, "
+                f"{result.rows_per_sec} rows/s, catalog v{result.version}")
+    update_import_job(job_id, 'done', result=result.as_dict())
+    return {'status': 'done', 'upserted': result.upserted}
+
+
+@shared_task
+def update_fx_rates_task():
+    """Scheduled by CELERY_BEAT_SCHEDULE; see profiles.services.fx"""
+    from .services.fx import FxRateError, refresh_fx_rates
+
+    try:
+        result = refresh_fx_rates()
+    except FxRateError as e:
+        # Keep serving the stored rates; the next run tries again
+        logger.error(f"FX rates update failed: {e}")
+        return {'saved': 0, 'repriced': 0}
+    logger.info(f"FX rates: saved {result['saved']}, repriced {result['repriced']} courses")
+    return result
@@ -1,3 +1,1438 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import io
+import json
+import math
+import pickle
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from ai_profile_backend.cache import CompactSerializer
+
+from .models import CatalogImportChunk, Country, Course, CourseCatalogVersion, FxRate, PhoneOTP, StudentProfile, University
+from .services.catalog_ingest import IngestError, ingest_catalog, iter_json_array
+from .services.ai_service import CourseFilterAI
+from .services.catalog_retrieval import ROW_FORMATTERS, CatalogIndex
+from .services.catalog_sampling import sample_courses
+from .services.course_index import CourseIndexHolder, course_index
+from .services.course_search import build_course_filter
+from .services.facets import get_facet_summary
+from .services.filter_cache import FilterResultCache
+from .services.fx import FxTable, fx_rates, fx_table
+from .services.matching import FacetMatcher
+from .services.messaging_client import PooledTwilioHttpClient, twilio_http_stats
+from .services.metrics import Metrics, metrics_buffer
+from .services.otp_delivery import (
+    CHANNEL_SERVICES, ChannelStats, HedgedOTPSender, delivery_status, enqueue_otp_delivery,
+)
+from .services.otp_retention import is_partitioned, purge_expired_otps
+from .services.otp_store import CacheOTPStore
+from .services.prompt_budget import PromptAssembler, count_tokens
+from .tasks import send_otp_task
+from .services.rate_limit import SlidingWindowRateLimiter
+from .services.singleflight import SingleFlight
+from .utils import uuid7
+from .views import AsyncChatbotQueryView, AsyncProcessFiltersView, CourseSelectionView
+
+PHONE = '+919876543210'
+
+# Keep signup state off the database (as with Redis) so only the endpoint's own statements are counted
+IN_MEMORY_CACHES = {**settings.CACHES, 'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+# Live OTPs, rate-limit counters and delivery stats too, so test runs don't share them through /tmp
+OTP_IN_MEMORY_CACHES = {**IN_MEMORY_CACHES, settings.OTP_CACHE_ALIAS: {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'otp-tests'}}
+# AI filter results, single-flight locks and prompt metrics
+AI_IN_MEMORY_CACHES = {**IN_MEMORY_CACHES, settings.AI_FILTER_CACHE_ALIAS: {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'ai-results-tests'}}
+
+
+@override_settings(OTP_STORE_BACKEND='db', CACHES=IN_MEMORY_CACHES)
+class ProfileVerifyViewTests(TestCase):
+    """The verify endpoint consumes the OTP and upserts the profile in two statements"""
+
+    def setUp(self):
+        self.url = reverse('profiles:profile_verify')
+        self.otp = PhoneOTP.objects.create(phone=PHONE, otp='123456',
+                                           expires_at=timezone.now() + timedelta(minutes=5))
+        cache.set(f"profile_data_{PHONE}", {"name": "Asha Rao", "email": "asha@example.com", "phone": PHONE})
+
+    def tearDown(self):
+        cache.clear()
+
+    def verify(self, otp='123456'):
+        return self.client.post(self.url, {"phone": PHONE, "otp": otp}, content_type='application/json')
+
+    def test_creates_profile_in_two_queries(self):
+        with self.assertNumQueries(2):
+            response = self.verify()
+
+        self.assertEqual(response.status_code, 201)
+        profile = StudentProfile.objects.get(phone=PHONE)
+        self.assertEqual((profile.name, profile.email, profile.is_verified), ("Asha Rao", "asha@example.com", True))
+        self.otp.refresh_from_db()
+        self.assertTrue(self.otp.is_used)
+
+    def test_updates_existing_profile_in_two_queries(self):
+        existing = StudentProfile.objects.create(phone=PHONE, name="Old Name", email="old@example.com")
+
+        with self.assertNumQueries(2):
+            response = self.verify()
+
+        self.assertEqual(response.status_code, 201)
+        profile = StudentProfile.objects.get(phone=PHONE)
+        self.assertEqual(profile.pk, existing.pk)
+        self.assertEqual(profile.created_at, existing.created_at)
+        self.assertEqual((profile.name, profile.email, profile.is_verified), ("Asha Rao", "asha@example.com", True))
+
+    def test_otp_is_consumed_once(self):
+        self.assertEqual(self.verify().status_code, 201)
+        cache.set(f"profile_data_{PHONE}", {"name": "Asha Rao", "email": "asha@example.com", "phone": PHONE})
+
+        with self.assertNumQueries(1):
+            response = self.verify()
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_rejects_expired_and_wrong_codes(self):
+        PhoneOTP.objects.filter(pk=self.otp.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(self.verify().status_code, 400)
+        self.assertEqual(self.verify(otp='654321').status_code, 400)
+        self.assertFalse(StudentProfile.objects.exists())
+
+
+@override_settings(CACHES=IN_MEMORY_CACHES)
+class ProfileDetailViewTests(TestCase):
+    """Detail polls are served from cache and revalidated with ETag / Last-Modified"""
+
+    def setUp(self):
+        self.profile = StudentProfile.objects.create(phone=PHONE, name="Asha Rao", email="asha@example.com",
+                                                     is_verified=True)
+        self.url = reverse('profiles:profile_detail', args=[PHONE])
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_repeat_polls_skip_the_database(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json()['profile']['email'], "asha@example.com")
+
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second.json(), first.json())
+
+    def test_conditional_get_returns_304(self):
+        etag = self.client.get(self.url)['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_writes_invalidate_the_cached_profile(self):
+        etag = self.client.get(self.url)['ETag']
+
+        self.profile.name = "Asha R"
+        self.profile.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['profile']['name'], "Asha R")
+
+        StudentProfile.upsert_verified(PHONE, name="Asha Rao", email="new@example.com")
+        self.assertEqual(self.client.get(self.url).json()['profile']['email'], "new@example.com")
+
+    def test_unverified_profile_is_not_found(self):
+        StudentProfile.objects.filter(pk=self.profile.pk).update(is_verified=False)
+
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+@override_settings(CACHES=OTP_IN_MEMORY_CACHES, OTP_STORE_BACKEND='db', OTP_RATE_LIMIT=2, OTP_IP_RATE_LIMIT=3)
+class OTPRateLimitTests(TestCase):
+    """Only OTP sends that go ahead count against the per-phone and per-IP budgets"""
+
+    def setUp(self):
+        self.url = reverse('profiles:profile_initiate')
+
+    def tearDown(self):
+        cache.clear()
+        caches[settings.OTP_CACHE_ALIAS].clear()
+
+    def initiate(self, phone=PHONE, **extra):
+        return self.client.post(self.url, {"name": "Asha Rao", "email": "asha@example.com", "phone": phone},
+                                content_type='application/json', **extra)
+
+    def test_phone_budget_rejects_with_retry_after(self):
+        self.assertEqual(self.initiate().status_code, 200)
+        self.assertEqual(self.initiate().status_code, 200)
+
+        response = self.initiate()
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+
+    def test_invalid_and_rejected_requests_are_not_counted(self):
+        for _ in range(5):
+            self.client.post(self.url, {"phone": PHONE}, content_type='application/json')
+        self.assertEqual(self.initiate().status_code, 200)
+        self.assertEqual(self.initiate().status_code, 200)
+        for _ in range(5):
+            self.assertEqual(self.initiate().status_code, 429)
+
+        # Two sends on the phone, one more on a second phone; the five 429s cost the IP nothing
+        self.assertEqual(self.initiate(phone='+919876543211').status_code, 200)
+        self.assertEqual(self.initiate(phone='+919876543212').status_code, 429)
+
+    def test_forwarded_for_is_ignored_without_proxies(self):
+        for n in range(3):
+            self.assertEqual(self.initiate(phone=f'+91987654330{n}', HTTP_X_FORWARDED_FOR=f'10.0.0.{n}').status_code,
+                             200)
+
+        self.assertEqual(self.initiate(phone='+919876543309', HTTP_X_FORWARDED_FOR='10.0.0.9').status_code, 429)
+
+    def test_retrying_while_limited_does_not_extend_the_wait(self):
+        limiter = SlidingWindowRateLimiter('test', limit=2, window_seconds=100)
+        limiter.hit('id', now=10)
+        limiter.hit('id', now=20)
+        retry_after = limiter.hit('id', now=30).retry_after
+        for now in range(31, 90):
+            self.assertFalse(limiter.hit('id', now=now).allowed)
+
+        self.assertTrue(limiter.hit('id', now=30 + retry_after).allowed)
+
+
+@override_settings(CACHES=OTP_IN_MEMORY_CACHES)
+class CacheOTPStoreTests(SimpleTestCase):
+    """A cached code verifies exactly once, however many requests race for it"""
+
+    def setUp(self):
+        self.store = CacheOTPStore(audit=mock.Mock())
+
+    def tearDown(self):
+        caches[settings.OTP_CACHE_ALIAS].clear()
+
+    def test_code_is_single_use_under_concurrent_verifies(self):
+        self.store.issue(PHONE, '123456', 5)
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda _: self.store.verify(PHONE, '123456'), range(16)))
+
+        self.assertEqual(results.count(True), 1)
+        self.assertFalse(self.store.verify(PHONE, '123456'))
+        self.store.audit.record_verified.assert_called_once_with(PHONE, '123456')
+
+    def test_reissue_supersedes_and_can_repeat_the_code(self):
+        self.store.issue(PHONE, '123456', 5)
+        self.store.issue(PHONE, '654321', 5)
+        self.assertFalse(self.store.verify(PHONE, '123456'))
+        self.assertTrue(self.store.verify(PHONE, '654321'))
+
+        self.store.issue(PHONE, '654321', 5)
+        self.assertTrue(self.store.verify(PHONE, '654321'))
+
+    def test_file_based_cache_is_refused(self):
+        with override_settings(CACHES={**OTP_IN_MEMORY_CACHES, settings.OTP_CACHE_ALIAS: {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp/otp-tests'}}):
+            with self.assertRaises(ImproperlyConfigured):
+                CacheOTPStore(audit=mock.Mock())
+
+
+class OTPRetentionTests(TestCase):
+    """Only rows that expired before the retention cutoff are purged, in bounded batches"""
+
+    NOW = timezone.make_aware(timezone.datetime(2026, 3, 1, 12, 0))
+
+    def setUp(self):
+        patcher = mock.patch('profiles.services.otp_retention.timezone.now', return_value=self.NOW)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cutoff = self.NOW - timedelta(hours=24)
+
+    def make_otps(self, count, expires_at):
+        PhoneOTP.objects.bulk_create(PhoneOTP(phone=PHONE, otp='123456', expires_at=expires_at)
+                                     for _ in range(count))
+
+    def purge(self, **options):
+        return purge_expired_otps(retention_hours=24, pause_seconds=0, log=lambda message: None, **options)
+
+    def test_cutoff_boundary(self):
+        self.make_otps(1, self.cutoff - timedelta(microseconds=1))
+        self.make_otps(1, self.cutoff)
+        self.make_otps(1, self.NOW + timedelta(minutes=5))
+
+        result = self.purge()
+
+        self.assertEqual((result.deleted, result.batches), (1, 1))
+        self.assertEqual(sorted(PhoneOTP.objects.values_list('expires_at', flat=True)),
+                         [self.cutoff, self.NOW + timedelta(minutes=5)])
+
+    def test_deletes_in_batches_and_stops_at_max_batches(self):
+        self.make_otps(7, self.cutoff - timedelta(hours=1))
+        self.make_otps(2, self.cutoff + timedelta(hours=1))
+
+        result = self.purge(batch_size=3, max_batches=2)
+        self.assertEqual((result.deleted, result.batches), (6, 2))
+        self.assertEqual(PhoneOTP.objects.count(), 3)
+
+        result = self.purge(batch_size=3)
+        self.assertEqual((result.deleted, result.batches), (1, 1))
+        self.assertFalse(PhoneOTP.objects.filter(expires_at__lt=self.cutoff).exists())
+        self.assertEqual(PhoneOTP.objects.count(), 2)
+
+    def test_dry_run_only_counts(self):
+        self.make_otps(2, self.cutoff - timedelta(hours=1))
+        out = io.StringIO()
+
+        call_command("purge_otps", "--dry-run", "--retention-hours", "24", stdout=out)
+
+        self.assertIn("2 rows expired before", out.getvalue())
+        self.assertEqual(PhoneOTP.objects.count(), 2)
+
+    @skipIf(connection.vendor == 'postgresql', "covers the non-PostgreSQL refusal")
+    def test_partitioning_is_refused_off_postgresql(self):
+        self.assertFalse(is_partitioned())
+        with self.assertRaisesMessage(CommandError, "needs PostgreSQL"):
+            call_command("partition_phone_otps", "--convert", stdout=io.StringIO())
+        with self.assertRaisesMessage(CommandError, "not partitioned"):
+            call_command("partition_phone_otps", stdout=io.StringIO())
+
+
+def scripted_channel(name, status, sent):
+    """Twilio channel stand-in that accepts every message and then reports `status` for it"""
+
+    class ScriptedChannel:
+        CONFIRMED_STATUSES = frozenset({'delivered', 'read'})
+
+        def send_otp(self, phone, otp_code):
+            sent.append(name)
+            return {'success': True, 'sid': f"SM-{name}"}
+
+        def message_status(self, sid):
+            return status, 63016 if status == 'undelivered' else None
+
+        def is_configured(self):
+            return True
+
+    return ScriptedChannel
+
+
+@override_settings(CACHES=OTP_IN_MEMORY_CACHES, OTP_DELIVERY_CHANNELS=['whatsapp', 'sms'],
+                   OTP_HEDGE_DELAY_SECONDS=5, OTP_DELIVERY_CONFIRM_SECONDS=0.2, OTP_DELIVERY_POLL_SECONDS=0.01)
+class HedgedOTPSenderTests(SimpleTestCase):
+    """A channel only wins once its message is confirmed delivered; accepted-but-undelivered falls back"""
+
+    def tearDown(self):
+        caches[settings.OTP_CACHE_ALIAS].clear()
+
+    def send(self, whatsapp_status, sms_status):
+        sent = []
+        channels = {'whatsapp': scripted_channel('whatsapp', whatsapp_status, sent),
+                    'sms': scripted_channel('sms', sms_status, sent)}
+        with mock.patch.dict(CHANNEL_SERVICES, channels):
+            return HedgedOTPSender(stats=ChannelStats(), confirm_delivery=True).send(PHONE, '123456'), sent
+
+    def test_confirmed_first_channel_needs_no_backup(self):
+        result, sent = self.send('delivered', 'delivered')
+
+        self.assertEqual(sent, ['whatsapp'])
+        self.assertEqual((result['channel'], result['confirmed'], result['hedged']), ('whatsapp', True, False))
+
+    def test_undelivered_whatsapp_falls_back_to_sms(self):
+        result, sent = self.send('undelivered', 'delivered')
+
+        self.assertEqual(sent, ['whatsapp', 'sms'])
+        self.assertTrue(result['success'])
+        self.assertEqual((result['channel'], result['confirmed']), ('sms', True))
+
+    def test_unconfirmed_delivery_is_not_resent(self):
+        result, sent = self.send('queued', 'queued')
+
+        self.assertEqual(sent, ['whatsapp', 'sms'])
+        self.assertTrue(result['success'])
+        self.assertFalse(result['confirmed'])
+
+    @override_settings(OTP_DELIVERY_CONFIRM_SECONDS=30)
+    def test_eager_delivery_does_not_wait_for_a_receipt(self):
+        sent = []
+        channels = {'whatsapp': scripted_channel('whatsapp', 'queued', sent),
+                    'sms': scripted_channel('sms', 'queued', sent)}
+        started = time.monotonic()
+        with mock.patch.dict(CHANNEL_SERVICES, channels):
+            # What ProfileInitiateView does; tasks run eagerly in tests
+            delivery_id = enqueue_otp_delivery(PHONE, '123456')
+
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(sent, ['whatsapp'])
+        record = delivery_status.get(delivery_id)
+        self.assertEqual((record['status'], record['channel'], record['confirmed']), ('sent', 'whatsapp', False))
+
+    def test_eager_send_still_falls_back_on_failure(self):
+        sent = []
+
+        class RejectingChannel:
+            def send_otp(self, phone, otp_code):
+                sent.append('whatsapp')
+                return {'success': False, 'error': "unreachable", 'retryable': True}
+
+            def is_configured(self):
+                return True
+
+        channels = {'whatsapp': RejectingChannel, 'sms': scripted_channel('sms', 'queued', sent)}
+        with mock.patch.dict(CHANNEL_SERVICES, channels):
+            result = HedgedOTPSender(stats=ChannelStats(), confirm_delivery=False).send(PHONE, '123456')
+
+        self.assertEqual(sent, ['whatsapp', 'sms'])
+        self.assertEqual((result['success'], result['channel'], result['confirmed']), (True, 'sms', False))
+
+    def test_task_message_carries_only_the_delivery_id(self):
+        channels = {'whatsapp': scripted_channel('whatsapp', 'delivered', []),
+                    'sms': scripted_channel('sms', 'delivered', [])}
+        with mock.patch.dict(CHANNEL_SERVICES, channels), \
+                mock.patch.object(send_otp_task, 'apply_async', wraps=send_otp_task.apply_async) as apply_async:
+            delivery_id = enqueue_otp_delivery(PHONE, '123456')
+
+        self.assertEqual(apply_async.call_args.kwargs['args'], (delivery_id,))
+        self.assertEqual(delivery_status.get(delivery_id)['status'], 'sent')
+        self.assertIsNone(delivery_status.pending_code(delivery_id))
+
+
+@override_settings(CACHES=OTP_IN_MEMORY_CACHES)
+class TwilioHttpMetricsTests(SimpleTestCase):
+    """Pool counters are buffered per process and never count a shrinking pool as negative connections"""
+
+    def tearDown(self):
+        caches[settings.OTP_CACHE_ALIAS].clear()
+
+    def observe(self, http_client, opened_connections):
+        with mock.patch.object(http_client, '_opened_connections', side_effect=opened_connections):
+            for _ in opened_connections:
+                http_client._observe(120.0)
+
+    def test_counters_are_flushed_in_batches(self):
+        http_client = PooledTwilioHttpClient(pool_size=2, connect_timeout=1, read_timeout=1,
+                                             metrics_flush_seconds=3600)
+
+        self.observe(http_client, [2, 1, 3])
+        self.assertEqual(twilio_http_stats()['requests'], 0)
+
+        http_client.flush_metrics()
+        stats = twilio_http_stats()
+        self.assertEqual((stats['requests'], stats['latency_le_250'], stats['new_connections']), (3, 3, 4))
+
+    def test_write_through_without_flush_interval(self):
+        http_client = PooledTwilioHttpClient(pool_size=2, connect_timeout=1, read_timeout=1)
+
+        self.observe(http_client, [1, 0])
+
+        stats = twilio_http_stats()
+        self.assertEqual((stats['requests'], stats['new_connections'], stats['connection_reuse_ratio']), (2, 1, 0.5))
+
+
+@override_settings(CACHES=AI_IN_MEMORY_CACHES, METRICS_FLUSH_SECONDS=0)
+class SingleFlightTests(SimpleTestCase):
+    """Concurrent identical calls share one execution; a slow or cancelled leader doesn't strand followers"""
+
+    def tearDown(self):
+        caches[settings.AI_FILTER_CACHE_ALIAS].clear()
+
+    def flight(self, timeout=5):
+        return SingleFlight('tests', timeout=timeout, distributed=False)
+
+    def test_sync_callers_share_one_call(self):
+        flight = self.flight()
+        started, release, calls = threading.Event(), threading.Event(), []
+
+        def fetch():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return {'countries': ["Canada"]}
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            leader = pool.submit(flight.do, 'key', fetch)
+            started.wait(5)
+            followers = [pool.submit(flight.do, 'key', fetch) for _ in range(3)]
+            time.sleep(0.1)
+            release.set()
+            results = [leader.result()] + [f.result() for f in followers]
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'countries': ["Canada"]}] * 4)
+        self.assertIsNot(results[0], results[1])
+        self.assertEqual(flight.metrics.get_many(['leaders', 'followers']), {'leaders': 1, 'followers': 3})
+
+    def test_async_callers_share_one_call(self):
+        flight, calls = self.flight(), []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {'countries': ["Canada"]}
+
+        async def main():
+            return await asyncio.gather(*(flight.ado('key', fetch) for _ in range(5)))
+
+        results = asyncio.run(main())
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'countries': ["Canada"]}] * 5)
+
+    def test_follower_calls_directly_after_timeout(self):
+        flight, calls = self.flight(timeout=0.05), []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.3 if len(calls) == 1 else 0)
+            return len(calls)
+
+        async def main():
+            leader = asyncio.create_task(flight.ado('key', fetch))
+            await asyncio.sleep(0)
+            follower = await flight.ado('key', fetch)
+            return await leader, follower
+
+        self.assertEqual(asyncio.run(main()), (2, 2))
+        self.assertEqual(flight.metrics.get('timeouts'), 1)
+
+    def test_cancelled_leader_hands_over_to_a_follower(self):
+        flight, calls = self.flight(), []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {'call': len(calls)}
+
+        async def main():
+            leader = asyncio.create_task(flight.ado('key', fetch))
+            await asyncio.sleep(0)
+            followers = [asyncio.create_task(flight.ado('key', fetch)) for _ in range(2)]
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            results = await asyncio.gather(*followers)
+            with self.assertRaises(asyncio.CancelledError):
+                await leader
+            return results
+
+        self.assertEqual(asyncio.run(main()), [{'call': 2}, {'call': 2}])
+        self.assertEqual(len(calls), 2)
+
+
+@override_settings(CACHES={**settings.CACHES,
+                           'tiered-l2': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                         'LOCATION': 'tiered-l2-tests'},
+                           'tiered': {'BACKEND': 'ai_profile_backend.cache.TieredCache',
+                                      'OPTIONS': {'L2': 'tiered-l2', 'L1_TIMEOUT': 0.2, 'FILL_WAIT': 5}}})
+class TieredCacheTests(SimpleTestCase):
+    """The per-process L1 serves reads briefly, yields to this process's writes and never stampedes L2"""
+
+    def setUp(self):
+        self.cache, self.l2 = caches['tiered'], caches['tiered-l2']
+
+    def tearDown(self):
+        self.cache.clear()
+
+    def test_l1_serves_reads_until_its_ttl_expires(self):
+        self.cache.set('k', "first")
+        self.l2.set('k', "changed by another worker")
+
+        self.assertEqual(self.cache.get('k'), "first")
+        time.sleep(0.25)
+        self.assertEqual(self.cache.get('k'), "changed by another worker")
+
+    def test_set_and_delete_replace_the_l1_copy(self):
+        self.cache.set('k', {'step': 1})
+        self.cache.get('k')['step'] = "mutated by a caller"
+        self.assertEqual(self.cache.get('k'), {'step': 1})
+
+        self.cache.set('k', {'step': 2})
+        self.assertEqual(self.cache.get('k'), {'step': 2})
+
+        self.cache.delete('k')
+        self.assertIsNone(self.cache.get('k'))
+        self.l2.set('k', {'step': 3})
+        self.assertEqual(self.cache.get('k'), {'step': 3})
+
+    def test_incr_goes_to_l2_and_drops_the_l1_copy(self):
+        self.cache.set('count', 10)
+        self.assertEqual(self.cache.get('count'), 10)
+
+        self.assertEqual(self.cache.incr('count', 5), 15)
+        self.assertEqual(self.cache.get('count'), 15)
+
+    def test_get_or_set_computes_once_under_concurrency(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.1)
+            return ["MSc Finance"]
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda _: self.cache.get_or_set('courses', compute, timeout=60), range(8)))
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [["MSc Finance"]] * 8)
+        self.assertIsNone(self.l2.get('courses:fill'))
+
+
+class CompactSerializerTests(SimpleTestCase):
+    """Ints stay raw for Redis INCR; large payloads are compressed and every form loads back"""
+
+    def setUp(self):
+        self.serializer = CompactSerializer()
+
+    def test_ints_stay_raw(self):
+        self.assertEqual(self.serializer.dumps(42), 42)
+        # Redis hands back the digits of an INCRed counter as bytes
+        self.assertEqual(self.serializer.loads(b"57"), 57)
+        self.assertIs(self.serializer.loads(self.serializer.dumps(True)), True)
+
+    def test_large_values_round_trip_through_zlib(self):
+        value = {'courses': [f"MSc Course {n}" for n in range(200)]}
+
+        data = self.serializer.dumps(value)
+
+        self.assertEqual(data[:1], b'\x78')
+        self.assertLess(len(data), len(pickle.dumps(value)))
+        self.assertEqual(self.serializer.loads(data), value)
+        self.assertEqual(self.serializer.loads(pickle.dumps(value)), value)
+        self.assertEqual(self.serializer.loads(self.serializer.dumps("1234")), "1234")
+
+
+class UUID7Tests(SimpleTestCase):
+    """Primary keys are RFC 9562 version 7 ids that sort in creation order"""
+
+    def test_ids_are_version_7_and_increasing(self):
+        ids = [uuid7() for _ in range(5000)]
+        self.assertTrue(all(value.version == 7 for value in ids))
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), len(ids))
+
+    def test_new_rows_default_to_uuid7(self):
+        self.assertIs(PhoneOTP._meta.pk.default, uuid7)
+        self.assertIs(StudentProfile._meta.pk.default, uuid7)
+
+
+class FacetMatcherTests(SimpleTestCase):
+    """Exact, alias and token matches rank first; a substring is the lowest-scored fallback"""
+
+    def setUp(self):
+        self.matcher = FacetMatcher(["Australia", "Germany", "United States", "Fall 2026", "Masters"])
+
+    def test_token_and_alias_matches(self):
+        self.assertEqual(self.matcher.best("usa"), "United States")
+        self.assertEqual(self.matcher.best("Fall"), "Fall 2026")
+        self.assertEqual(self.matcher.best("Master's degree"), "Masters")
+
+    def test_substring_fallback_scores_below_token_matches(self):
+        score, option = self.matcher.rank("Germ")[0]
+
+        self.assertEqual(option, "Germany")
+        self.assertLess(score, self.matcher.rank("Fall")[0][0])
+        self.assertEqual(self.matcher.best("Aus"), "Australia")
+        self.assertEqual(self.matcher.best("Ge"), "")
+        self.assertEqual(self.matcher.best("Computing"), "")
+
+
+class CatalogRetrievalTests(SimpleTestCase):
+    """Chatbot context is the best-ranked catalog rows that fit the token budget"""
+
+    def setUp(self):
+        self.index = CatalogIndex(1, {
+            'countries': [
+                {'country_name': "United Kingdom", 'average_tuition_fees': "GBP 18000"},
+                {'country_name': "Germany", 'average_tuition_fees': "EUR 1500"},
+                {'country_name': "Canada", 'average_tuition_fees': "CAD 25000"},
+            ],
+            'universities': [
+                {'university_name': "University of Leeds", 'country_name': "United Kingdom", 'location': "Leeds"},
+                {'university_name': "TU Munich", 'country_name': "Germany", 'location': "Munich"},
+            ],
+            'courses': [
+                {'course_title': "MSc Computer Science", 'university_name': "University of Leeds",
+                 'country_name': "United Kingdom", 'level': "Masters", 'intake': "Fall 2026"},
+                {'course_title': "MSc Mechanical Engineering", 'university_name': "TU Munich",
+                 'country_name': "Germany", 'level': "Masters", 'intake': "Winter 2026"},
+                {'course_title': "BSc Computer Science", 'university_name': "University of Toronto",
+                 'country_name': "Canada", 'level': "Bachelors", 'intake': "Fall 2026"},
+            ],
+        })
+
+    def top(self, message, history=None):
+        _, position = self.index.search(message, history)[0]
+        section, row, _, _ = self.index.documents[position]
+        return section, row
+
+    def test_rows_rank_by_relevance_with_aliases_and_history(self):
+        self.assertEqual(self.top("computer science masters in the uk")[1]['course_title'], "MSc Computer Science")
+        self.assertEqual(self.top("Munich"), ('universities', self.index.documents[4][1]))
+
+        history = [{'role': 'user', 'content': "I want to study in Germany"}]
+        self.assertEqual(self.top("any engineering courses?", history)[1]['course_title'],
+                         "MSc Mechanical Engineering")
+
+    def test_retrieval_fits_the_token_budget_best_rows_first(self):
+        ranked = [self.index.documents[position] for _, position in self.index.search("computer science")]
+        budget = ranked[0][3] + ranked[1][3]
+
+        selected = self.index.retrieve("computer science", token_budget=budget)
+
+        rows = [row for section in selected.values() for row in section]
+        self.assertEqual(rows, [ranked[0][1], ranked[1][1]])
+        self.assertLessEqual(sum(count_tokens(ROW_FORMATTERS[s](r)) for s in selected for r in selected[s]), budget)
+
+    def test_unmatched_message_browses_each_section(self):
+        selected = self.index.retrieve("hi", token_budget=10000)
+
+        self.assertEqual({section: len(rows) for section, rows in selected.items()},
+                         {'countries': 3, 'universities': 2, 'courses': 3})
+
+
+class PromptAssemblerTests(SimpleTestCase):
+    """Prompt sections fill the budget in priority order and summarize what was dropped"""
+
+    def test_sections_fill_in_priority_order_within_budget(self):
+        rows = [f"- course {n}: a fairly long catalog line describing the programme" for n in range(20)]
+        assembler = PromptAssembler(budget=120, endpoint='test')
+        assembler.reserve("You are a study abroad advisor.")
+        assembler.add_section('history', ["user: hello"], priority=0)
+        assembler.add_section('courses', rows, priority=1, summarize=lambda n: f"...and {n} more courses")
+
+        assembled = assembler.assemble()
+
+        self.assertEqual(assembled.rows['history'], ["user: hello"])
+        kept = assembled.rows['courses']
+        self.assertEqual(kept, rows[:len(kept)])
+        self.assertEqual(assembled.dropped['courses'], len(rows) - len(kept))
+        self.assertEqual(assembled.summaries['courses'], f"...and {len(rows) - len(kept)} more courses")
+        self.assertTrue(assembled.text('courses').endswith("more courses"))
+        self.assertLessEqual(assembled.tokens, 120)
+
+    def test_everything_fits_under_a_large_budget(self):
+        assembler = PromptAssembler(budget=1000, endpoint='test')
+        assembler.add_section('courses', ["- MSc Finance", "", "- MBA"], priority=0,
+                              summarize=lambda n: f"...and {n} more")
+
+        assembled = assembler.assemble()
+
+        self.assertFalse(assembled.truncated)
+        self.assertEqual(assembled.text('courses'), "- MSc Finance\n- MBA")
+
+    @override_settings(CACHES=AI_IN_MEMORY_CACHES, METRICS_FLUSH_SECONDS=60)
+    def test_record_buffers_its_metrics(self):
+        assembler = PromptAssembler(budget=1000, endpoint='test')
+        messages = [{'role': 'user', 'content': "Which MSc courses are in Canada?"}]
+
+        with mock.patch.object(Metrics, 'incr') as incr:
+            tokens = assembler.record(messages)
+        incr.assert_not_called()
+
+        metrics_buffer.flush()
+        metrics = Metrics(settings.AI_FILTER_CACHE_ALIAS, prefix='prompt_tokens:test')
+        self.assertEqual(metrics.get_many(['prompts', 'tokens']), {'prompts': 1, 'tokens': tokens})
+        caches[settings.AI_FILTER_CACHE_ALIAS].clear()
+
+
+class CourseSearchViewTests(TestCase):
+    """Catalog search applies process-filters JSON to the normalized columns and pages by keyset"""
+
+    @classmethod
+    def setUpTestData(cls):
+        usa = Country.objects.create(name="United States", code="US")
+        canada = Country.objects.create(name="Canada", code="CA")
+        mit = University.objects.create(name="Tech Institute", country=usa)
+        toronto = University.objects.create(name="Lakeside University", country=canada)
+        courses = [
+            ("US-1", "MS Computer Science", mit, "Masters", "2 Years", "Fall 2026", 42000, "USD"),
+            ("US-2", "MS Data Science", mit, "Master of Science", "24 months", "September 2026", 38000, "USD"),
+            ("US-3", "BSc Computer Science", mit, "Bachelors", "4 Years", "Fall 2026", 30000, "USD"),
+            ("US-4", "MBA", mit, "Masters", "2 Years", "Spring 2027", 60000, "USD"),
+            ("CA-1", "MSc Computer Engineering", toronto, "PG", "2 Years", "Fall 2026", 28000, "USD"),
+            ("CA-2", "MEng Digital Systems", toronto, "Masters", "2 Years", "Fall 2026", None, ""),
+        ]
+        for course_id, title, university, level, duration, intake, fee, currency in courses:
+            Course.objects.create(course_id=course_id, course_title=title, university=university,
+                                  level_name=level, duration=duration, intake=intake,
+                                  tuition_fees=fee, currency=currency)
+
+    def setUp(self):
+        self.url = reverse('profiles:course_search')
+
+    def search(self, filters, **body):
+        response = self.client.post(self.url, {'filters': filters, **body}, content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_applies_process_filters_output(self):
+        result = self.search({
+            'countries': ["USA", "Canada"],
+            'level': "Masters",
+            'course': "Computer IT Software",
+            'duration': "2 Years",
+            'intakes': ["Fall 2026"],
+            'maxBudgetUSD': 45000,
+            'searchQuery': "Computer Science",
+        })
+
+        self.assertEqual([c['course_id'] for c in result['courses']], ["CA-1", "US-1"])
+        self.assertEqual(result['courses'][0]['country_name'], "Canada")
+        self.assertIsNone(result['nextCursor'])
+
+    def test_short_keywords_match_whole_words_only(self):
+        result = self.search({'course': "IT"})
+        self.assertEqual(result['courses'], [])
+
+    def test_unknown_country_matches_nothing(self):
+        self.assertEqual(self.search({'countries': ["Atlantis"]})['courses'], [])
+
+    def test_keyset_pages_cover_the_catalog_once(self):
+        seen, cursor = [], None
+        while True:
+            page = self.search({}, limit=4, **({'cursor': cursor} if cursor else {}))
+            seen.extend(c['course_id'] for c in page['courses'])
+            cursor = page['nextCursor']
+            if not cursor:
+                break
+
+        self.assertEqual(seen, ["CA-1", "US-3", "US-2", "US-1", "US-4", "CA-2"])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.post(self.url, {'cursor': 'not-a-cursor'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class CourseSelectionViewTests(TestCase):
+    """Selecting a course echoes it back with the partner's own level label"""
+
+    def test_selected_course_is_returned(self):
+        country = Country.objects.create(name="United Kingdom")
+        university = University.objects.create(name="Leeds University", country=country)
+        Course.objects.create(course_id="UK-1", course_title="MSc Finance", university=university,
+                              level_name="Postgraduate Taught", duration="1 Year", tuition_fees=Decimal("20000"),
+                              currency="USD")
+        StudentProfile.objects.create(phone=PHONE, name="Asha Rao", email="asha@example.com", is_verified=True)
+
+        with mock.patch('profiles.views.CourseSuggestionSerializer') as serializer:
+            serializer.return_value.is_valid.return_value = True
+            serializer.return_value.validated_data = {'course_id': "UK-1", 'phone': PHONE}
+            response = CourseSelectionView.as_view()(APIRequestFactory().post('/', {}, format='json'))
+
+        self.assertEqual(response.status_code, 200, response.data)
+        selected = response.data['selected_course']
+        self.assertEqual((selected['university_name'], selected['country_name'], selected['level']),
+                         ("Leeds University", "United Kingdom", "Postgraduate Taught"))
+        self.assertIn('selected_at', selected)
+
+
+@override_settings(CACHES=IN_MEMORY_CACHES)
+class CatalogSamplingTests(TestCase):
+    """AI endpoints get a bounded, stratified course sample cached per catalog version"""
+
+    @classmethod
+    def setUpTestData(cls):
+        levels = ["Bachelors", "Masters", "PhD"]
+        for c, country_name in enumerate(["United States", "Canada", "Ireland", "Germany"]):
+            country = Country.objects.create(name=country_name)
+            university = University.objects.create(name=f"{country_name} University", country=country)
+            for n in range(30):
+                title = "MSc Psychology" if n == 0 else f"Programme {n}"
+                Course.objects.create(course_id=f"{c}-{n}", course_title=title, university=university,
+                                      level_name=levels[n % 3], tuition_fees=5000 + 2500 * n, currency="USD")
+        CourseCatalogVersion.bump()
+
+    def tearDown(self):
+        cache.clear()
+        course_index.clear()
+
+    def test_small_sample_covers_every_country_and_level(self):
+        sample = sample_courses(size=8)
+
+        self.assertEqual(len(sample), 8)
+        self.assertEqual(len({course['country_name'] for course in sample}), 4)
+        self.assertEqual({course['level'] for course in sample}, {"Undergraduate", "Postgraduate", "Doctorate"})
+
+    def test_sample_is_cached_until_the_catalog_version_changes(self):
+        first = sample_courses(size=10)
+        with self.assertNumQueries(0):
+            self.assertEqual(sample_courses(size=10), first)
+
+        Course.objects.filter(course_id__in=[c['course_id'] for c in first]).delete()
+        CourseCatalogVersion.bump()
+        second = sample_courses(size=10)
+        self.assertFalse({c['course_id'] for c in first} & {c['course_id'] for c in second})
+
+    def test_sample_from_a_stale_index_is_not_cached_as_the_new_version(self):
+        sample_courses(size=10)
+        Course.objects.filter(course_title="MSc Psychology").delete()
+        version = CourseCatalogVersion.bump().version
+
+        # Another thread is rebuilding: requests keep getting the previous index
+        with course_index._lock:
+            self.assertEqual(len(sample_courses(size=10)), 10)
+        self.assertIsNone(cache.get(f"course_sample:v{version}:10"))
+
+        fresh = sample_courses(size=10, query="psychology")
+        self.assertNotIn("MSc Psychology", {c['course_title'] for c in fresh})
+        self.assertIsNotNone(cache.get(f"course_sample:v{version}:10"))
+
+    def test_query_sample_puts_matching_courses_first(self):
+        sample = sample_courses(size=10, query="psychology")
+
+        self.assertEqual(len(sample), 10)
+        self.assertEqual({c['course_title'] for c in sample[:4]}, {"MSc Psychology"})
+
+
+@override_settings(CACHES=IN_MEMORY_CACHES)
+class CourseIndexTests(TestCase):
+    """The in-memory course index filters like the database and ranks by keywords, then budget fit"""
+
+    FILTERS = [
+        {},
+        {'countries': ["USA"]},
+        {'countries': ["USA", "Canada"], 'level': "Masters"},
+        {'level': "Master of Science"},
+        {'duration': "2 Years", 'intakes': ["Fall 2026", "Spring"]},
+        {'minDurationMonths': 20, 'maxDurationMonths': 30, 'maxBudgetUSD': 40000},
+        {'course': "Computer Engineering"},
+        {'course': "IT"},
+        {'countries': ["Atlantis"]},
+        {'intakes': ["2027"]},
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        usa = Country.objects.create(name="United States", code="US")
+        canada = Country.objects.create(name="Canada", code="CA")
+        mit = University.objects.create(name="Tech Institute", country=usa)
+        toronto = University.objects.create(name="Lakeside University", country=canada)
+        courses = [
+            ("US-1", "MS Computer Science", mit, "Masters", "2 Years", "Fall 2026", 42000),
+            ("US-2", "MS Data Science", mit, "Master of Science", "24 months", "September 2026", 38000),
+            ("US-3", "BSc Computer Science", mit, "Bachelors", "4 Years", "Fall 2026", 30000),
+            ("US-4", "MBA", mit, "Masters", "2 Years", "Spring 2027", 60000),
+            ("CA-1", "MSc Computer Engineering", toronto, "PG", "2 Years", "Fall 2026", 28000),
+            ("CA-2", "MEng Digital Systems", toronto, "Masters", "18 months", "Fall 2026", None),
+        ]
+        for course_id, title, university, level, duration, intake, fee in courses:
+            Course.objects.create(course_id=course_id, course_title=title, university=university,
+                                  level_name=level, duration=duration, intake=intake,
+                                  tuition_fees=fee, currency="USD" if fee else "")
+        cls.version = CourseCatalogVersion.bump().version
+
+    def tearDown(self):
+        cache.clear()
+        course_index.clear()
+
+    def test_filters_match_the_database_query(self):
+        index = CourseIndexHolder.build(self.version)
+        for filters in self.FILTERS:
+            with self.subTest(filters=filters):
+                expected = set(Course.objects.filter(build_course_filter(filters)).values_list('id', flat=True))
+                found = set(index.course_ids(index.positions(index.filter_mask(filters))))
+                self.assertEqual(found, expected)
+
+    def test_top_k_ranks_keyword_matches_then_budget_fit(self):
+        index = CourseIndexHolder.build(self.version)
+        ids = index.course_ids(index.top_k({}, 3, query="computer science", budget_usd=45000))
+        course_ids = dict(Course.objects.filter(id__in=ids).values_list('id', 'course_id'))
+
+        # Both keywords beat one; among equals, the cheaper fee fits the budget better
+        self.assertEqual([course_ids[pk] for pk in ids], ["US-3", "US-1", "CA-1"])
+
+    def test_index_is_rebuilt_when_the_catalog_version_changes(self):
+        self.assertEqual(course_index.get_index().count({'countries': ["Canada"]}), 2)
+
+        Course.objects.filter(course_id="CA-2").delete()
+        CourseCatalogVersion.bump()
+        self.assertEqual(course_index.get_index().count({'countries': ["Canada"]}), 1)
+
+
+@override_settings(CACHES=IN_MEMORY_CACHES)
+class CatalogIngestTests(TestCase):
+    """Partner catalogs are streamed in, normalized and upserted on course_id"""
+
+    CSV = (
+        "Course ID,Title,University,Country,Level,Duration,Intake,Tuition Fees,Currency\n"
+        "UK-1,MSc Data Science,Leeds University,UK,Masters,12 months,September 2026,\"£20,000\",\n"
+        "UK-2,BSc Economics,Leeds University,united kingdom,UG,3 yrs,Jan,18000,GBP\n"
+        "US-1,MBA,Austin College,USA,PG,two years,Fall 2026,$55000,\n"
+        "XX-1,,Nowhere University,Atlantis,Masters,1 year,Fall,1000,USD\n"
+        "KR-1,MEng Robotics,KAIST,South Korea,Masters,2 years,March 2027,9000000,KRW\n"
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        FxRate.objects.update_or_create(currency="GBP", defaults={"usd_per_unit": Decimal("1.25")})
+        Country.objects.create(name="United Kingdom")
+
+    def tearDown(self):
+        cache.clear()
+
+    def ingest(self, text, name, **kwargs):
+        return ingest_catalog(io.BytesIO(text.encode("utf-8")), name=name, **kwargs)
+
+    def test_csv_is_normalized_and_converted_to_usd(self):
+        result = self.ingest(self.CSV, "partner.csv", batch_size=2)
+
+        self.assertEqual((result.rows_read, result.upserted, result.rejected), (5, 4, 1))
+        self.assertEqual(result.unconverted_fees, 1)  # KRW has no stored rate
+        self.assertEqual(result.countries_created, 2)  # "UK" matched the existing United Kingdom
+        self.assertEqual(result.version, CourseCatalogVersion.objects.latest("version").version)
+
+        course = Course.objects.get(course_id="UK-1")
+        self.assertEqual(course.country.name, "United Kingdom")
+        self.assertEqual((course.level, course.duration, course.duration_months), ("Postgraduate", "1 Year", 12))
+        self.assertEqual((course.intake, course.intake_season, course.intake_year), ("Fall 2026", "fall", 2026))
+        self.assertEqual((course.tuition_fees, course.currency), (Decimal("20000.00"), "GBP"))
+        self.assertEqual(course.annual_fee_usd, Decimal("25000.00"))
+        self.assertEqual(Course.objects.get(course_id="US-1").annual_fee_usd, Decimal("55000.00"))
+        self.assertIsNone(Course.objects.get(course_id="KR-1").annual_fee_usd)
+
+    def test_reingest_updates_rows_in_place(self):
+        self.ingest(self.CSV, "partner.csv")
+        ids = dict(Course.objects.values_list("course_id", "id"))
+
+        lines = [{"course_id": "UK-1", "title": "MSc Data Science", "university": "Leeds University",
+                  "country": "United Kingdom", "level": "Masters", "duration": "18 months",
+                  "intake": ["January 2027", "September 2027"], "fees": 22000, "currency": "GBP"}]
+        result = self.ingest("\n".join(json.dumps(line) for line in lines), "update.ndjson")
+
+        self.assertEqual(result.upserted, 1)
+        course = Course.objects.get(course_id="UK-1")
+        self.assertEqual(course.id, ids["UK-1"])
+        self.assertEqual((course.duration, course.intake), ("1.5 Years", "Spring 2027"))
+        self.assertEqual(course.annual_fee_usd, Decimal("27500.00"))
+        self.assertEqual(Course.objects.count(), 4)
+
+    def test_json_catalog_is_decoded_incrementally(self):
+        courses = [{"id": f"C-{n}", "title": f"Course {n}", "university": "Uni", "country": "Canada",
+                    "fee": 1000.5 + n, "currency": "USD"} for n in range(50)]
+        payload = json.dumps({"source": "partner", "courses": courses}, indent=2)
+
+        decoded = list(iter_json_array(io.StringIO(payload), chunk_size=7))
+        self.assertEqual(decoded, courses)
+
+        result = ingest_catalog(io.BytesIO(gzip.compress(payload.encode("utf-8"))), name="feed.json.gz")
+        self.assertEqual(result.upserted, 50)
+        self.assertEqual(Course.objects.get(course_id="C-3").annual_fee_usd, Decimal("1003.50"))
+
+        with self.assertRaises(IngestError):
+            self.ingest('{"courses": [{"id": 1}', "broken.json")
+
+    def test_dry_run_writes_nothing(self):
+        result = self.ingest(self.CSV, "partner.csv", dry_run=True)
+
+        self.assertEqual((result.rows_read, result.rejected, result.upserted), (5, 1, 0))
+        self.assertFalse(Course.objects.exists())
+        self.assertIsNone(result.version)
+
+    def test_admin_upload_is_ingested_by_the_catalog_worker(self):
+        url = reverse("profiles:catalog_import")
+        upload = SimpleUploadedFile("partner.csv", self.CSV.encode("utf-8"), content_type="text/csv")
+        self.assertEqual(self.client.post(url, {"file": upload}).status_code, 403)
+
+        admin = get_user_model().objects.create_superuser("ops", "ops@example.com", "secret")
+        self.client.force_login(admin)
+        upload.seek(0)
+        # Small chunks, so the worker streams the upload back across several rows
+        with self.settings(CATALOG_IMPORT_CHUNK_BYTES=64):
+            response = self.client.post(url, {"file": upload})  # tasks run eagerly in tests
+        self.assertEqual(response.status_code, 202)
+
+        job = self.client.get(reverse("profiles:catalog_import_status", args=[response.json()["jobId"]])).json()
+        self.assertEqual(job["status"], "done")
+        self.assertEqual(job["result"]["upserted"], 4)
+        self.assertEqual(Course.objects.count(), 4)
+        self.assertFalse(CatalogImportChunk.objects.exists())
+
+
+@override_settings(CACHES=IN_MEMORY_CACHES)
+class FxRateTests(TestCase):
+    """Fees and budgets convert through the stored FX table, a whole column at a time"""
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_table_converts_columns_of_fees(self):
+        table = FxTable("test", {"GBP": 1.25, "INR": 0.012})
+
+        usd = table.to_usd([Decimal("20000"), 1000000, None, 500, 100], ["GBP", "inr", "GBP", "KRW", "USD"])
+
+        self.assertEqual(usd[[0, 1, 4]].tolist(), [25000.0, 12000.0, 100.0])
+        self.assertTrue(all(math.isnan(v) for v in usd[[2, 3]]))
+        self.assertAlmostEqual(table.convert(100, "GBP", "INR"), 125 / 0.012)
+        self.assertIsNone(table.convert(100, "KRW"))
+
+    def test_student_budget_uses_the_stored_rate(self):
+        self.assertAlmostEqual(CourseFilterAI.budget_to_usd(20), 2000000 / 83, places=2)  # seeded INR rate
+
+        call_command("update_fx_rates", "--set", "INR=0.0125", stdout=io.StringIO())
+        self.assertEqual(fx_table().rate("INR"), 0.0125)
+        self.assertAlmostEqual(CourseFilterAI.budget_to_usd(20), 25000.0)
+
+    def test_rate_update_reprices_courses_and_bumps_the_catalog(self):
+        country = Country.objects.create(name="United Kingdom")
+        university = University.objects.create(name="Leeds University", country=country)
+        Course.objects.create(course_id="UK-1", course_title="MSc Finance", university=university,
+                              tuition_fees=Decimal("20000"), currency="GBP")
+        Course.objects.create(course_id="UK-2", course_title="MBA", university=university,
+                              tuition_fees=Decimal("30000"), currency="USD")
+        before = CourseCatalogVersion.objects.count()
+
+        call_command("update_fx_rates", "--set", "GBP=1.30", stdout=io.StringIO())
+
+        self.assertEqual(Course.objects.get(course_id="UK-1").annual_fee_usd, Decimal("26000.00"))
+        self.assertEqual(Course.objects.get(course_id="UK-2").annual_fee_usd, Decimal("30000.00"))
+        self.assertEqual(CourseCatalogVersion.objects.count(), before + 1)
+
+    def test_edited_fee_and_university_update_the_derived_columns(self):
+        FxRate.objects.update_or_create(currency="GBP", defaults={"usd_per_unit": Decimal("1.25")})
+        uk = Country.objects.create(name="United Kingdom")
+        ireland = Country.objects.create(name="Ireland")
+        leeds = University.objects.create(name="Leeds University", country=uk)
+        dublin = University.objects.create(name="Dublin University", country=ireland)
+        course = Course.objects.create(course_id="UK-1", course_title="MSc Finance", university=leeds,
+                                       tuition_fees=Decimal("20000"), currency="USD")
+
+        course.tuition_fees, course.currency, course.university = Decimal("16000"), "GBP", dublin
+        course.save()
+
+        course.refresh_from_db()
+        self.assertEqual(course.annual_fee_usd, Decimal("20000.00"))
+        self.assertEqual(course.country_id, ireland.pk)
+
+    def test_facet_summary_is_rebuilt_when_rates_change(self):
+        sample = [{'course_title': "MSc Finance", 'tuition_fees': "20000", 'currency': "GBP"}]
+        FxRate.objects.update_or_create(currency="GBP", defaults={"usd_per_unit": Decimal("1.25")})
+        fx_rates.forget()
+        self.assertEqual(get_facet_summary(sample).prices, [25000.0])
+
+        call_command("update_fx_rates", "--set", "GBP=1.30", stdout=io.StringIO())
+        self.assertEqual(get_facet_summary(sample).prices, [26000.0])
+
+
+def stream_chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+class ScriptedStream:
+    """OpenAI stream stand-in yielding `texts` as chunks, then raising `error` if given"""
+
+    def __init__(self, texts, error=None):
+        self.texts, self.error, self.closed = texts, error, False
+
+    def __iter__(self):
+        for text in self.texts:
+            yield stream_chunk(text)
+        if self.error is not None:
+            raise self.error
+
+    async def __aiter__(self):
+        for chunk in self:
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+class AsyncScriptedStream(ScriptedStream):
+    async def close(self):
+        self.closed = True
+
+
+def sse_events(body: bytes):
+    """(event, data) pairs of a Server-Sent Events body"""
+    events = []
+    for block in body.decode('utf-8').strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+
+@override_settings(CACHES=AI_IN_MEMORY_CACHES, AI_ASYNC_VIEWS=False)
+class ChatbotStreamingTests(TestCase):
+    """Streaming chatbot replies are negotiated per request and framed as token/done/error events"""
+
+    MESSAGE = "Which course should I pick?"
+
+    def setUp(self):
+        self.url = reverse('profiles:chatbot-query')
+        patcher = mock.patch('profiles.services.chatbot_service.client')
+        self.openai = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, path=None, **extra):
+        return self.client.post(path or self.url, {'message': self.MESSAGE, **extra.pop('body', {})},
+                                content_type='application/json', **extra)
+
+    def stream(self, texts, error=None):
+        stream = ScriptedStream(texts, error)
+        self.openai.chat.completions.create.return_value = stream
+        return stream
+
+    def test_streams_token_events_then_done(self):
+        stream = self.stream(["Try ", "the MSc."])
+
+        response = self.post(body={'stream': True})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        self.assertEqual(sse_events(b"".join(response.streaming_content)), [
+            ('token', {'delta': "Try "}),
+            ('token', {'delta': "the MSc."}),
+            ('done', {'success': True, 'response': "Try the MSc.", 'suggestFilters': True}),
+        ])
+        self.assertTrue(stream.closed)
+        self.assertIs(self.openai.chat.completions.create.call_args.kwargs['stream'], True)
+
+    def test_accept_header_and_query_param_select_streaming(self):
+        self.stream(["Hi"])
+        self.assertTrue(self.post(HTTP_ACCEPT='text/event-stream').streaming)
+
+        self.stream(["Hi"])
+        self.assertTrue(self.post(path=f"{self.url}?stream=true").streaming)
+
+        self.openai.chat.completions.create.return_value = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="Hi"))])
+        response = self.post()
+        self.assertFalse(response.streaming)
+        self.assertEqual(response.json(), {'success': True, 'response': "Hi", 'suggestFilters': True})
+
+    def test_upstream_failure_mid_stream_ends_with_an_error_event(self):
+        stream = self.stream(["Try "], error=RuntimeError("connection reset"))
+
+        response = self.post(body={'stream': True})
+
+        self.assertEqual(sse_events(b"".join(response.streaming_content)), [
+            ('token', {'delta': "Try "}),
+            ('error', {'success': False, 'error': "Failed to process message"}),
+        ])
+        self.assertTrue(stream.closed)
+
+    async def test_async_view_streams_the_same_events(self):
+        stream = AsyncScriptedStream(["Try ", "the MSc."], error=RuntimeError("connection reset"))
+        async_client = mock.Mock()
+        async_client.chat.completions.create = mock.AsyncMock(return_value=stream)
+        request = AsyncRequestFactory().post(self.url, {'message': self.MESSAGE},
+                                             content_type='application/json',
+                                             headers={'Accept': 'text/event-stream'})
+
+        with mock.patch('profiles.services.chatbot_service.get_async_client', return_value=async_client):
+            response = await AsyncChatbotQueryView.as_view()(request)
+            body = b"".join([part async for part in response.streaming_content])
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual([event for event, _ in sse_events(body)], ['token', 'token', 'error'])
+        self.assertTrue(stream.closed)
+
+
+def llm_response(filters):
+    """Chat completion stand-in whose single choice carries `filters` as JSON"""
+    message = SimpleNamespace(content=json.dumps(filters))
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+FILTER_PROFILE = {
+    'countries': ["USA"],
+    'degree': "Postgraduate",
+    'fields': ["IT & Computer Science"],
+    'intakes': ["Fall 2026"],
+    'completedDegree': "BTech",
+    'cgpa': 8.2,
+    'budget': [40],
+}
+
+FILTER_COURSE_SAMPLE = [
+    {'course_title': "MS Computer Science", 'country_name': "United States", 'level': "Postgraduate",
+     'duration': "2 Years", 'intake': "Fall 2026", 'annual_fee_usd': 42000},
+    {'course_title': "MS Software Engineering", 'country_name': "United States", 'level': "Postgraduate",
+     'duration': "1 Year", 'intake': "Spring 2027", 'annual_fee_usd': 38000},
+    {'course_title': "BSc Computer Science", 'country_name': "Canada", 'level': "Undergraduate",
+     'duration': "4 Years", 'intake': "Fall 2026", 'annual_fee_usd': 30000},
+]
+
+LLM_FILTERS = {'countries': ["United States"], 'level': "Postgraduate", 'course': "Computer Software",
+               'duration': "2 Years", 'intakes': ["Fall 2026"], 'maxBudgetUSD': 40000,
+               'searchQuery': "Computer Science"}
+
+
+@override_settings(CACHES=AI_IN_MEMORY_CACHES, METRICS_FLUSH_SECONDS=0, AI_FILTER_SHADOW_MODE=False,
+                   AI_LOCAL_CONFIDENCE_THRESHOLD=0.85)
+class LocalFilterCompilerTests(TestCase):
+    """Confident rule-based filters skip the LLM; shadow mode always asks it and records disagreements"""
+
+    def setUp(self):
+        patcher = mock.patch('profiles.services.ai_service.client')
+        self.client_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client_mock.chat.completions.create.return_value = llm_response(LLM_FILTERS)
+        self.ai = CourseFilterAI()
+
+    def tearDown(self):
+        caches[settings.AI_FILTER_CACHE_ALIAS].clear()
+
+    def process(self, **profile):
+        return self.ai.process_student_profile({**FILTER_PROFILE, **profile}, FILTER_COURSE_SAMPLE)
+
+    def test_confidence_weighs_each_matched_filter(self):
+        context = self.ai._prepare_filter_request(FILTER_PROFILE, FILTER_COURSE_SAMPLE)
+        compiled = self.ai.compiler.compile(FILTER_PROFILE, context)
+
+        self.assertEqual(compiled['scores'], {'countries': 1.0, 'level': 1.0, 'course': 1.0,
+                                              'intakes': 1.0, 'duration': 1.0})
+        self.assertEqual(compiled['confidence'], 1.0)
+        self.assertEqual(compiled['filters']['countries'], ["United States"])
+
+        unknown = {**FILTER_PROFILE, 'countries': ["Atlantis"], 'fields': ["Underwater Basket Weaving"]}
+        self.assertEqual(self.ai.compiler.compile(unknown, context)['confidence'], 0.5)
+
+    def test_confident_profile_skips_the_llm(self):
+        result = self.process()
+
+        self.assertEqual((result['source'], result['confidence']), ('rules', 1.0))
+        self.client_mock.chat.completions.create.assert_not_called()
+
+    def test_unconfident_profile_calls_the_llm(self):
+        result = self.process(countries=["Atlantis"], fields=["Underwater Basket Weaving"])
+
+        self.assertEqual(result['source'], 'llm')
+        self.assertEqual(result['filters']['countries'], ["United States"])
+        self.client_mock.chat.completions.create.assert_called_once()
+
+    @override_settings(AI_FILTER_SHADOW_MODE=True)
+    def test_shadow_mode_records_the_diff_and_returns_the_llm_result(self):
+        with self.assertLogs('profiles.services.ai_service', level='WARNING') as logs:
+            result = self.process(countries=["USA", "Canada"])
+
+        self.assertEqual(result, {'success': True, 'filters': LLM_FILTERS, 'source': 'llm'})
+        self.client_mock.chat.completions.create.assert_called_once()
+        self.assertIn("Shadow mismatch", logs.output[0])
+        self.assertIn("'countries'", logs.output[0])
+        metrics = Metrics(settings.AI_FILTER_CACHE_ALIAS, prefix='filter_compiler')
+        self.assertEqual(metrics.get_many(['shadow_comparisons', 'shadow_disagreements']),
+                         {'shadow_comparisons': 1, 'shadow_disagreements': 1})
+
+
+@override_settings(CACHES=AI_IN_MEMORY_CACHES, METRICS_FLUSH_SECONDS=0, AI_FILTER_SHADOW_MODE=False,
+                   AI_LOCAL_CONFIDENCE_THRESHOLD=2.0)
+class FilterResultCacheTests(TestCase):
+    """Equivalent profiles share one cached LLM result per key version and facet vocabulary"""
+
+    VOCABULARY = {'countries': ["United States", "Canada"], 'levels': ["Postgraduate"]}
+
+    def setUp(self):
+        patcher = mock.patch('profiles.services.ai_service.client')
+        self.client_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client_mock.chat.completions.create.return_value = llm_response(LLM_FILTERS)
+        self.result_cache = FilterResultCache()
+        self.vocabulary_hash = FilterResultCache.vocabulary_hash(self.VOCABULARY)
+
+    def tearDown(self):
+        caches[settings.AI_FILTER_CACHE_ALIAS].clear()
+        cache.clear()
+
+    def key(self, budget_usd=40000, **profile):
+        return self.result_cache.make_key({**FILTER_PROFILE, **profile}, budget_usd, self.vocabulary_hash)
+
+    def test_equivalent_profiles_share_a_key(self):
+        reordered = self.key(countries=[" usa", "Canada "], fields=["it & computer science "], cgpa=8.4,
+                             degree="postgraduate ")
+
+        self.assertEqual(self.key(countries=["Canada", "USA"]), reordered)
+        self.assertNotEqual(self.key(), self.key(cgpa=8.6))
+        self.assertNotEqual(self.key(), self.key(budget_usd=41000))
+        self.assertNotEqual(self.key(), self.key(intakes=["Spring 2027"]))
+
+    def test_key_changes_with_version_and_vocabulary(self):
+        key = self.key()
+
+        with mock.patch.object(FilterResultCache, 'KEY_VERSION', FilterResultCache.KEY_VERSION + 1):
+            self.assertNotEqual(self.key(), key)
+
+        self.vocabulary_hash = FilterResultCache.vocabulary_hash({**self.VOCABULARY, 'levels': ["Undergraduate"]})
+        self.assertNotEqual(self.key(), key)
+
+        reordered = {'levels': ["Postgraduate"], 'countries': ["Canada", "United States"]}
+        self.assertEqual(FilterResultCache.vocabulary_hash(reordered), FilterResultCache.vocabulary_hash(self.VOCABULARY))
+
+    def test_hit_skips_openai(self):
+        ai = CourseFilterAI()
+        first = ai.process_student_profile(FILTER_PROFILE, FILTER_COURSE_SAMPLE)
+        second = ai.process_student_profile({**FILTER_PROFILE, 'countries': ["usa"], 'cgpa': 8.3},
+                                            FILTER_COURSE_SAMPLE)
+
+        self.assertEqual(second, first)
+        self.client_mock.chat.completions.create.assert_called_once()
+        self.assertEqual(self.result_cache.stats(), {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+    def test_entries_expire_after_the_timeout(self):
+        result_cache = FilterResultCache(timeout=60)
+        key = self.key()
+        result_cache.set(key, {'success': True, 'filters': LLM_FILTERS})
+
+        self.assertEqual(result_cache.get(key), {'success': True, 'filters': LLM_FILTERS})
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=time.time() + 61):
+            self.assertIsNone(result_cache.get(key))
+
+
+@override_settings(
+    CACHES=AI_IN_MEMORY_CACHES,
+    AI_LOCAL_CONFIDENCE_THRESHOLD=2.0,
+    OPENAI_BASE_URL='http://127.0.0.1:9/v1',
+    OPENAI_MAX_RETRIES=0,
+)
+class AsyncProcessFiltersViewTests(TestCase):
+    """The async filter endpoint reads the FX table off the event loop, on the LLM path and the fallback"""
+
+    PROFILE = {
+        'countries': ["USA"],
+        'degree': "Masters",
+        'fields': ["Computer Science"],
+        'intakes': ["Fall 2026"],
+        'completedDegree': "BTech",
+        'cgpa': 8.2,
+        'gradYear': "2023",
+        'budget': [20],
+        'courseSample': [
+            {'course_title': "MS Computer Science", 'country_name': "United States", 'level': "Postgraduate",
+             'duration': "2 Years", 'intake': "Fall 2026", 'annual_fee_usd': 42000},
+        ],
+    }
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    async def test_unreachable_llm_falls_back_to_basic_filters(self):
+        request = AsyncRequestFactory().post('/api/profile/process-filters/', self.PROFILE,
+                                             content_type='application/json')
+
+        response = await AsyncProcessFiltersView.as_view()(request)
+
+        self.assertEqual(response.status_code, 200, response.content)
+        filters = json.loads(response.content)['filters']
+        self.assertEqual(filters['countries'], ["United States"])
+        # 20 lakh INR at the seeded rate, rounded to $1000, plus 30%
+        self.assertEqual(filters['maxBudgetUSD'], 24000 * 1.3)
@@ -0,0 +1,97 @@
+# profiles/throttles.py
+
+import logging
+from typing import Optional
+
+from django.conf import settings
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import BaseThrottle
+
+from .services.rate_limit import SlidingWindowRateLimiter
+
+logger = logging.getLogger(__name__)
+
+HOUR = 60 * 60
+
+
+class OTPThrottled(Throttled):
+    """429 in the API's usual {success, message} shape; DRF adds Retry-After from wait"""
+
+    def __init__(self, wait=None):
+        super().__init__(wait)
+        self.detail = {
+            "success": False,
+            "message": "Too many OTP requests. Please try again later.",
+            "retryAfter": self.wait,
+        }
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """
+    DRF throttle on SlidingWindowRateLimiter. Unlike DRF's SimpleRateThrottle, the
+    counters live in the shared RATE_LIMIT_CACHE_ALIAS, so the budget holds across
+    every worker, and only allowed requests are counted.
+    """
+
+    scope = ''
+    window_seconds = HOUR
+
+    def __init__(self):
+        self.result = None
+
+    def get_limit(self) -> int:
+        raise NotImplementedError
+
+    def get_identity(self, request) -> Optional[str]:
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        limit = self.get_limit()
+        identity = self.get_identity(request)
+        if limit <= 0 or not identity:
+            return True
+
+        self.limiter = SlidingWindowRateLimiter(self.scope, limit, self.window_seconds)
+        self.result = self.limiter.hit(identity)
+        if not self.result.allowed:
+            logger.warning(f"Rate limit {self.scope} exceeded for {identity} "
+                           f"({self.result.count:.1f}/{limit}), retry in {self.result.retry_after}s")
+        return self.result.allowed
+
+    def release(self):
+        """Take back this request's hit, e.g. when another throttle rejected it"""
+        if self.result is not None:
+            self.limiter.release(self.result)
+
+    def wait(self):
+        return self.result.retry_after if self.result else None
+
+
+class OTPPhoneThrottle(SlidingWindowThrottle):
+    """OTP_RATE_LIMIT sends per phone number per hour"""
+
+    scope = 'otp_phone'
+
+    def get_limit(self) -> int:
+        return settings.OTP_RATE_LIMIT
+
+    def get_identity(self, request) -> Optional[str]:
+        try:
+            phone = request.data.get('phone')
+        except AttributeError:
+            return None
+        # Same normalisation as ProfileInitiateSerializer.validate_phone
+        return phone.strip() or None if isinstance(phone, str) else None
+
+
+class OTPClientIPThrottle(SlidingWindowThrottle):
+    """OTP_IP_RATE_LIMIT sends per client IP per hour, whatever the phone numbers"""
+
+    scope = 'otp_ip'
+
+    def get_limit(self) -> int:
+        return settings.OTP_IP_RATE_LIMIT
+
+    def get_identity(self, request) -> Optional[str]:
+        # Honours REST_FRAMEWORK['NUM_PROXIES'] when reading X-Forwarded-For
+        return self.get_ident(request)
@@ -1,12 +1,25 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
 app_name = 'profiles'
 
+# Under ASGI the AI endpoints can run as async views so slow LLM calls don't hold a worker
+if settings.AI_ASYNC_VIEWS:
+    process_filters_view = views.AsyncProcessFiltersView.as_view()
+    chatbot_query_view = views.AsyncChatbotQueryView.as_view()
+else:
+    process_filters_view = views.ProcessFiltersView.as_view()
+    chatbot_query_view = views.ChatbotQueryView.as_view()
+
 urlpatterns = [
     path('initiate/', views.ProfileInitiateView.as_view(), name='profile_initiate'),
+    path('otp-status/<str:delivery_id>/', views.OTPDeliveryStatusView.as_view(), name='otp_delivery_status'),
     path('verify/', views.ProfileVerifyView.as_view(), name='profile_verify'),
-    path('process-filters/', views.ProcessFiltersView.as_view(), name='process-filters'),
+    path('process-filters/', process_filters_view, name='process-filters'),
+    path('courses/search/', views.CourseSearchView.as_view(), name='course_search'),
+    path('catalog/import/', views.CatalogImportView.as_view(), name='catalog_import'),
+    path('catalog/import/<str:job_id>/', views.CatalogImportStatusView.as_view(), name='catalog_import_status'),
     path('detail/<str:phone>/', views.ProfileDetailView.as_view(), name='profile_detail'),
-    path('chatbot/query/', views.ChatbotQueryView.as_view(), name='chatbot-query'),
+    path('chatbot/query/', chatbot_query_view, name='chatbot-query'),
 ]
\ No newline at end of file
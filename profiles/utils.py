@@ -1,7 +1,43 @@
 import logging
+import os
+import threading
+import time
+import uuid
 
 logger = logging.getLogger(__name__)
 
+_uuid7_lock = threading.Lock()
+_uuid7_last_ms = 0
+_uuid7_counter = 0
+
+
+def uuid7():
+    """
+    Time-ordered UUID (RFC 9562 version 7): 48-bit Unix milliseconds, then a 12-bit
+    counter seeded randomly each millisecond, then 62 random bits. New ids sort
+    after older ones, so primary-key inserts append to the end of the index
+    instead of landing on random pages; they stay unique and unguessable.
+    """
+    global _uuid7_last_ms, _uuid7_counter
+
+    with _uuid7_lock:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms > _uuid7_last_ms:
+            _uuid7_last_ms = now_ms
+            # Top bit clear leaves room for >2048 ids in the same millisecond
+            _uuid7_counter = int.from_bytes(os.urandom(2), 'big') & 0x7FF
+        else:
+            # Same millisecond (or the clock stepped back): stay monotonic
+            _uuid7_counter += 1
+            if _uuid7_counter > 0xFFF:
+                _uuid7_last_ms += 1
+                _uuid7_counter = int.from_bytes(os.urandom(2), 'big') & 0x7FF
+        timestamp_ms, counter = _uuid7_last_ms, _uuid7_counter
+
+    rand_b = int.from_bytes(os.urandom(8), 'big') & ((1 << 62) - 1)
+    value = (timestamp_ms & ((1 << 48) - 1)) << 80 | 0x7 << 76 | counter << 64 | 0b10 << 62 | rand_b
+    return uuid.UUID(int=value)
+
 
 def validate_phone_number(phone):
     """Validate and normalize phone number"""
@@ -1,24 +1,39 @@
+import json
 import logging
-from datetime import timezone
 from rest_framework import status
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.db import transaction
 from django.core.cache import cache
-from django.conf import settings
-
-from .models import StudentProfile
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from .models import Course, StudentProfile
+from .renderers import EventStreamRenderer
 from .serializers import (
     ProfileInitiateSerializer,
     ProfileVerifySerializer,
-    StudentProfileSerializer,
     ProcessFiltersSerializer,
-    CourseSuggestionSerializer
+    CourseSuggestionSerializer,
+    CourseSearchSerializer,
+    CatalogImportSerializer
 )
+from .services.otp_delivery import FAILED, delivery_status, enqueue_otp_delivery
 from .services.otp_service import OTPService
-from .services.sms_service import SMSService
+from .services.profile_cache import get_profile_entry, last_modified_header
 from .services.ai_service import CourseFilterAI
+from .services.catalog_ingest import IngestError, enqueue_catalog_import, get_import_job
+from .services.catalog_sampling import sample_courses
+from .services.chatbot_service import ChatbotService
+from .services.course_search import InvalidCursor, search_courses
 from .services.whatsapp_service import WhatsAppService
+from .throttles import OTPClientIPThrottle, OTPPhoneThrottle, OTPThrottled
 
 
 logger = logging.getLogger(__name__)
@@ -28,6 +43,26 @@ class ProfileInitiateView(APIView):
     """
     Initiate profile creation and send OTP
     """
+    # Checked after validation but before any DB write or Twilio call
+    throttle_classes = [OTPPhoneThrottle, OTPClientIPThrottle]
+
+    def throttled(self, request, wait):
+        raise OTPThrottled(wait)
+
+    def check_throttles(self, request):
+        # DRF calls this before the handler; the budget is spent in post() instead, so
+        # invalid requests (or a stranger's typos of a number) never count against it
+        pass
+
+    def spend_otp_budget(self, request):
+        """Count this send against every throttle, or count it nowhere and answer 429"""
+        allowed = []
+        for throttle in self.get_throttles():
+            if not throttle.allow_request(request, self):
+                for earlier in allowed:
+                    earlier.release()
+                self.throttled(request, throttle.wait())
+            allowed.append(throttle)
 
     def post(self, request):
         serializer = ProfileInitiateSerializer(data=request.data)
@@ -41,42 +76,50 @@ class ProfileInitiateView(APIView):
 
         data = serializer.validated_data
         phone = data["phone"]
+        self.spend_otp_budget(request)
 
         logger.info(f"Initiating profile for phone: {phone}")
 
         otp_service = OTPService()
         otp_code = otp_service.generate_otp(phone)
 
-        sms_service = SMSService()
-        sms_result = sms_service.send_otp(phone, otp_code)
-
-        # Try WhatsApp first
-        # whatsapp_service = WhatsAppService()
-        # whatsapp_result = whatsapp_service.send_otp(phone, otp_code)
-        # logger.info(f"WhatsApp result: {whatsapp_result}")
-
-        # if whatsapp_result["success"]:
-        #     logger.info("OTP sent via WhatsApp")
-        # else:
-        #     logger.warning("WhatsApp failed. Falling back to SMS")
-        #     sms_service = SMSService()
-        #     sms_result = sms_service.send_otp(phone, otp_code)
-        #
-        #     if not sms_result["success"]:
-        #         logger.error("Both WhatsApp and SMS failed")
-        #         return Response({
-        #             "success": False,
-        #             "message": "Failed to send OTP"
-        #         }, status=500)
-
         # Store full data in cache
         cache_key = f"profile_data_{phone}"
         cache.set(cache_key, data, timeout=600)  # 10 minutes
         logger.info(f"Stored profile data in cache: {cache_key}")
 
+        # The SMS goes out from the task queue; the client polls deliveryId for the outcome
+        delivery_id = enqueue_otp_delivery(phone, otp_code)
+
         return Response({
             "success": True,
-            "message": "OTP sent successfully"
+            "message": "OTP sent successfully",
+            "deliveryId": delivery_id
+        }, status=200)
+
+
+class OTPDeliveryStatusView(APIView):
+    """
+    Poll the delivery of an OTP sent by ProfileInitiateView
+    """
+
+    def get(self, request, delivery_id):
+        record = delivery_status.get(delivery_id)
+        if record is None:
+            return Response({
+                "success": False,
+                "message": "Unknown or expired delivery"
+            }, status=404)
+
+        return Response({
+            "success": True,
+            "deliveryId": delivery_id,
+            "status": record["status"],
+            "attempts": record["attempts"],
+            "channel": record["channel"],
+            "confirmed": record.get("confirmed"),
+            "error": record["error"] if record["status"] == FAILED else None,
+            "updatedAt": record["updatedAt"]
         }, status=200)
 
 
@@ -121,31 +164,27 @@ class ProfileVerifyView(APIView):
             }, status=400)
 
         try:
-            with transaction.atomic():
-                # Save ONLY CONTACT INFO
-                student_profile, created = StudentProfile.objects.update_or_create(
-                    phone=phone,
-                    defaults={
-                        "name": profile_data["name"],
-                        "email": profile_data["email"],
-                        "is_verified": True
-                    }
-                )
+            # Save ONLY CONTACT INFO, as a single upsert statement
+            student_profile = StudentProfile.upsert_verified(
+                phone=phone,
+                name=profile_data["name"],
+                email=profile_data["email"]
+            )
 
-                logger.info(f"Profile {'created' if created else 'updated'} for {phone}")
+            logger.info(f"Profile saved for {phone}")
 
-                # Clear cache
-                cache.delete(cache_key)
-                logger.info(f"Cleared cache: {cache_key}")
+            # Clear cache
+            cache.delete(cache_key)
+            logger.info(f"Cleared cache: {cache_key}")
 
-                return Response({
-                    "success": True,
-                    "profile": {
-                        "name": student_profile.name,
-                        "email": student_profile.email,
-                        "phone": student_profile.phone,
-                    },
-                }, status=201)
+            return Response({
+                "success": True,
+                "profile": {
+                    "name": student_profile.name,
+                    "email": student_profile.email,
+                    "phone": student_profile.phone,
+                },
+            }, status=201)
 
         except Exception as e:
             logger.error(f"Error creating profile: {str(e)}")
@@ -158,21 +197,29 @@ class ProfileVerifyView(APIView):
 
 
 class ProfileDetailView(APIView):
-    """Get profile details"""
+    """Get profile details (cached; supports If-None-Match / If-Modified-Since)"""
 
     def get(self, request, phone):
         try:
-            profile = StudentProfile.objects.get(phone=phone, is_verified=True)
-            serializer = StudentProfileSerializer(profile)
-            return Response({
+            entry = get_profile_entry(phone)
+            if entry is None:
+                return Response({
+                    'success': False,
+                    'message': 'Profile not found'
+                }, status=status.HTTP_404_NOT_FOUND)
+
+            # 304 when If-None-Match / If-Modified-Since still match the current version
+            response = get_conditional_response(
+                request, etag=entry['etag'], last_modified=entry['last_modified']
+            ) or Response({
                 'success': True,
-                'profile': serializer.data
+                'profile': entry['profile']
             }, status=status.HTTP_200_OK)
-        except StudentProfile.DoesNotExist:
-            return Response({
-                'success': False,
-                'message': 'Profile not found'
-            }, status=status.HTTP_404_NOT_FOUND)
+            response['ETag'] = entry['etag']
+            response['Last-Modified'] = last_modified_header(entry)
+            # Clients may keep a copy but must revalidate it on every poll
+            response['Cache-Control'] = 'private, no-cache'
+            return response
         except Exception as e:
             logger.error(f"Profile detail error: {str(e)}")
             return Response({
@@ -237,6 +284,101 @@ class ProcessFiltersView(APIView):
             )
 
 
+class CourseSearchView(APIView):
+    """
+    Search the course catalog server-side with the filters returned by process-filters
+    """
+
+    def post(self, request):
+        serializer = CourseSearchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {
+                    'success': False,
+                    'error': 'Invalid input data',
+                    'details': serializer.errors
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        data = serializer.validated_data
+        try:
+            page = search_courses(data['filters'], limit=data['limit'], cursor=data.get('cursor') or None)
+        except InvalidCursor as e:
+            return Response({'success': False, 'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error(f"Unexpected error in CourseSearchView: {str(e)}")
+            import traceback
+            logger.error(traceback.format_exc())
+            return Response(
+                {
+                    'success': False,
+                    'error': 'Server error occurred'
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        return Response({'success': True, **page}, status=status.HTTP_200_OK)
+
+
+
+class CatalogImportView(APIView):
+    """
+    Upload a partner course catalog (staff only). The file is ingested by the
+    catalog worker; poll CatalogImportStatusView with the returned jobId.
+    """
+    permission_classes = [IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        serializer = CatalogImportSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {
+                    'success': False,
+                    'error': 'Invalid input data',
+                    'details': serializer.errors
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        data = serializer.validated_data
+        try:
+            job_id = enqueue_catalog_import(data['file'], fmt=data.get('format'))
+        except IngestError as e:
+            return Response({'success': False, 'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error(f"Unexpected error in CatalogImportView: {str(e)}")
+            import traceback
+            logger.error(traceback.format_exc())
+            return Response(
+                {
+                    'success': False,
+                    'error': 'Server error occurred'
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        logger.info(f"Catalog import {job_id} queued by {request.user}")
+        return Response({'success': True, 'jobId': job_id}, status=status.HTTP_202_ACCEPTED)
+
+
+class CatalogImportStatusView(APIView):
+    """
+    Poll a catalog import started with CatalogImportView
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, job_id):
+        job = get_import_job(job_id)
+        if job is None:
+            return Response({
+                'success': False,
+                'error': 'Unknown or expired import'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        return Response({'success': True, 'jobId': job_id, **job}, status=status.HTTP_200_OK)
+
 class CourseSuggestionView(APIView):
     """
     Get AI-powered course suggestions based on search query
@@ -270,21 +412,8 @@ class CourseSuggestionView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Get course sample
-            from .models import Course
-            course_sample = list(
-                Course.objects.all().values(
-                    'course_id',
-                    'course_title',
-                    'university_name',
-                    'country_name',
-                    'level',
-                    'duration',
-                    'tuition_fees',
-                    'currency',
-                    'intake'
-                )
-            )[:100]
+            # Best query matches from the in-memory course index, topped up with the stratified sample
+            course_sample = sample_courses(query=query)
 
             # Get user profile (optional)
             user_profile_data = None
@@ -390,8 +519,7 @@ class CourseSelectionView(APIView):
 
             # Get course details
             try:
-                from .models import Course
-                selected_course = Course.objects.get(course_id=course_id)
+                selected_course = Course.objects.select_related('university', 'country').get(course_id=course_id)
 
                 # Prepare selected course data
                 selected_course_data = {
@@ -399,10 +527,11 @@ class CourseSelectionView(APIView):
                     'course_title': selected_course.course_title,
                     'university_name': selected_course.university_name,
                     'country_name': selected_course.country_name,
-                    'level': selected_course.level,
+                    'level': selected_course.level_name,
                     'duration': selected_course.duration,
                     'tuition_fees': selected_course.tuition_fees,
                     'currency': selected_course.currency,
+                    'annual_fee_usd': selected_course.annual_fee_usd,
                     'intake': selected_course.intake,
                     'selected_at': timezone.now().isoformat(),
                     'user_phone': phone
@@ -473,12 +602,8 @@ class AICourseRecommendationView(APIView):
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-            # Get course sample
-            from .models import Course
-            course_sample = list(Course.objects.all().values(
-                'course_id', 'course_title', 'university_name', 'country_name',
-                'level', 'duration', 'tuition_fees', 'currency', 'intake'
-            ))[:100]
+            # Stratified sample drawn from the in-memory course index and cached per catalog version
+            course_sample = sample_courses()
 
             # Get AI recommendations
             ai_service = CourseFilterAI()
@@ -515,10 +640,34 @@ class AICourseRecommendationView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+def _wants_stream(request, data):
+    """
+    Streaming is opt-in: `"stream": true` in the body, `?stream=true` (or DRF's
+    `?format=sse`) in the query string, or an event-stream Accept header
+    """
+    return (data.get('stream') is True
+            or request.GET.get('stream', '').lower() in ('1', 'true')
+            or request.GET.get('format') == EventStreamRenderer.format
+            or 'text/event-stream' in request.headers.get('Accept', ''))
+
+
+def _event_stream_response(events):
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx and similar proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 class ChatbotQueryView(APIView):
     """
     Handle chatbot queries with AI
+
+    Returns JSON by default; with `"stream": true` (or `?stream=true`, or
+    `Accept: text/event-stream`) tokens are relayed as Server-Sent Events followed
+    by a final `done` event.
     """
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
 
     def post(self, request):
         try:
@@ -534,137 +683,137 @@ class ChatbotQueryView(APIView):
 
             logger.info(f"Chatbot query: {message[:50]}...")
 
-            from openai import OpenAI
-            client = OpenAI(api_key=settings.OPENAI_API_KEY)
-
-            countries    = context.get('countries', [])
-            universities = context.get('universities', [])
-            courses      = context.get('courses', [])
-            user_name    = context.get('userName', 'there')
-
-            # ── Build rich data summaries for the prompt ───────────────────
-
-            # Countries: full detail
-            country_lines = []
-            for c in countries[:30]:
-                name     = c.get('country_name', '')
-                avg_fee  = c.get('average_tuition_fees', '')
-                living   = c.get('annual_cost_of_living', '')
-                employ   = c.get('employability', '')
-                uni_cnt  = c.get('universities_count', '')
-                if name:
-                    country_lines.append(
-                        f"- {name}: avg tuition {avg_fee}, living cost {living}, "
-                        f"employability {employ}, {uni_cnt} universities"
-                    )
-            countries_text = "\n".join(country_lines) if country_lines else "No country data available"
-
-            # Universities: full detail
-            uni_lines = []
-            for u in universities[:30]:
-                name     = u.get('university_name', '')
-                country  = u.get('country_name', '')
-                location = u.get('location', '')
-                avg_fee  = u.get('average_tuition_fees', '')
-                employ   = u.get('employability', '')
-                rankings = u.get('rankings', {})
-                world_r  = rankings.get('world', '') if isinstance(rankings, dict) else ''
-                schol    = u.get('scholarships_available', '')
-                programs = u.get('programs_count', '')
-                if name:
-                    uni_lines.append(
-                        f"- {name} ({country}, {location}): avg fee {avg_fee}, "
-                        f"employability {employ}, world rank #{world_r}, "
-                        f"{programs} programs, scholarships: {schol}"
-                    )
-            universities_text = "\n".join(uni_lines) if uni_lines else "No university data available"
-
-            # Courses: full detail
-            course_lines = []
-            for c in courses[:50]:
-                title    = c.get('course_title', '')
-                uni      = c.get('university_name', '')
-                country  = c.get('country_name', '')
-                level    = c.get('level', '')
-                duration = c.get('duration', '')
-                fee      = c.get('tuition_fees', '')
-                currency = c.get('currency', '')
-                intake   = c.get('intake', '')
-                ielts    = c.get('ielts_score', '')
-                if title:
-                    course_lines.append(
-                        f"- {title} | {uni}, {country} | {level} | {duration} | "
-                        f"{currency} {fee} | Intake: {intake} | IELTS: {ielts}"
-                    )
-            courses_text = "\n".join(course_lines) if course_lines else "No course data available"
+            if _wants_stream(request, request.data):
+                return _event_stream_response(ChatbotService().stream_events(message, context, history))
 
-            # ── System prompt with full data ───────────────────────────────
+            result = ChatbotService().reply(message, context, history)
+            return Response(result, status=status.HTTP_200_OK)
 
-            system_prompt = f"""You are AIGLE, a friendly study abroad assistant chatbot for EdMaster.
+        except Exception as e:
+            logger.error(f"Chatbot error: {str(e)}")
+            import traceback
+            logger.error(traceback.format_exc())
+            return Response({
+                'success': False,
+                'error': 'Failed to process message'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-AVAILABLE COUNTRIES IN OUR DATABASE:
-{countries_text}
 
-AVAILABLE UNIVERSITIES IN OUR DATABASE:
-{universities_text}
+# ── Async views (served when AI_ASYNC_VIEWS is enabled under ASGI) ─────────
+#
+# DRF's APIView dispatch is synchronous, so these are plain Django views that
+# reuse the DRF serializers for validation and keep the same response payloads.
+
+def _parse_json_body(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncProcessFiltersView(View):
+    """
+    Async variant of ProcessFiltersView using AsyncOpenAI
+    """
 
-AVAILABLE COURSES IN OUR DATABASE:
-{courses_text}
+    async def post(self, request):
+        try:
+            data = _parse_json_body(request)
+            if data is None:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Invalid JSON body'
+                }, status=status.HTTP_400_BAD_REQUEST)
 
-Student's name: {user_name}
+            serializer = ProcessFiltersSerializer(data=data)
 
-IMPORTANT RULES:
-1. ONLY recommend countries, universities, and courses that are listed above in the database
-2. If a student asks about a country (e.g. UK, Denmark, USA), check the countries list above and give details from it
-3. Never say "I don't have data" if the country/university IS in the list above
-4. Be friendly, warm, and conversational
-5. Keep responses concise — under 150 words
-6. Use emojis sparingly (1–2 max)
-7. When recommending specific courses, include the university name, fee, and intake
-8. For personalized course matching, suggest the AI Profile Evaluator"""
+            if not serializer.is_valid():
+                logger.error(f"Filter validation errors: {serializer.errors}")
+                return JsonResponse(
+                    {
+                        'success': False,
+                        'error': 'Invalid input data',
+                        'details': serializer.errors
+                    },
+                    status=status.HTTP_400_BAD_REQUEST
+                )
 
-            # ── Build messages ─────────────────────────────────────────────
+            profile_data = serializer.validated_data
+            course_sample = profile_data.pop('courseSample')
 
-            messages_list = [{"role": "system", "content": system_prompt}]
+            logger.info(f"Processing filters (async) for profile: {profile_data}")
 
-            for msg in history[-4:]:
-                role = msg.get('role', 'user')
-                if role == 'system':
-                    role = 'assistant'
-                messages_list.append({"role": role, "content": msg.get('content', '')})
+            ai_service = CourseFilterAI()
+            result = await ai_service.aprocess_student_profile(profile_data, course_sample)
 
-            messages_list.append({"role": "user", "content": message})
+            if not result['success']:
+                logger.error(f"AI processing failed: {result.get('error')}")
+                return JsonResponse(
+                    {
+                        'success': False,
+                        'error': result.get('error', 'AI processing failed')
+                    },
+                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                )
 
-            logger.info(f"Sending {len(messages_list)} messages to OpenAI")
+            logger.info(f"Successfully generated filters: {result['filters']}")
+            return JsonResponse(result, status=status.HTTP_200_OK)
 
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages_list,
-                temperature=0.7,
-                max_tokens=300
+        except Exception as e:
+            logger.error(f"Unexpected error in AsyncProcessFiltersView: {str(e)}")
+            import traceback
+            logger.error(traceback.format_exc())
+            return JsonResponse(
+                {
+                    'success': False,
+                    'error': 'Server error occurred'
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-            ai_response = response.choices[0].message.content.strip()
-            logger.info(f"AI response: {ai_response[:100]}...")
 
-            suggest_keywords = [
-                'find course', 'recommend course', 'which course', 'suggest course',
-                'want to study', 'looking for', 'search for', 'help me find',
-                'show me course', 'best course', 'match my profile'
-            ]
-            suggest_filters = any(keyword in message.lower() for keyword in suggest_keywords)
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncChatbotQueryView(View):
+    """
+    Async variant of ChatbotQueryView using AsyncOpenAI
+    """
 
-            return Response({
-                'success': True,
-                'response': ai_response,
-                'suggestFilters': suggest_filters
-            }, status=status.HTTP_200_OK)
+    async def post(self, request):
+        try:
+            data = _parse_json_body(request)
+            if data is None:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Invalid JSON body'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            message = data.get('message', '')
+            context = data.get('context', {})
+            history = data.get('conversationHistory', [])
+
+            if not message:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Message is required'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            logger.info(f"Chatbot query (async): {message[:50]}...")
+
+            if _wants_stream(request, data):
+                # Async generator, so ASGI streams it without buffering and a client
+                # disconnect cancels it (and the upstream OpenAI stream)
+                return _event_stream_response(ChatbotService().astream_events(message, context, history))
+
+            result = await ChatbotService().areply(message, context, history)
+            return JsonResponse(result, status=status.HTTP_200_OK)
 
         except Exception as e:
             logger.error(f"Chatbot error: {str(e)}")
             import traceback
             logger.error(traceback.format_exc())
-            return Response({
+            return JsonResponse({
                 'success': False,
                 'error': 'Failed to process message'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)